@@ -2,53 +2,35 @@
 
 #define CYCLE_SIZE 64
 
-basic_dsp_runner::basic_dsp_runner(int sample_rate, int buffer_size)
-    : sample_rate(sample_rate), buffer_size(buffer_size)
+cycle_buffers::cycle_buffers(int num_inputs, int num_outputs, int buffer_size,
+                             const input_signal& signal)
+    : num_inputs(num_inputs), num_outputs(num_outputs), buffer_size(buffer_size)
 {
-}
-
-void basic_dsp_runner::run(self_measuring_dsp& d)
-{
-    d.init(44100);
-
-    srand(0);
-
-    // Create the input and output buffers
-    float*** inputs  = new float**[CYCLE_SIZE];
-    float*** outputs = new float**[CYCLE_SIZE];
+    inputs  = new float**[CYCLE_SIZE];
+    outputs = new float**[CYCLE_SIZE];
 
     for (int i = 0; i < CYCLE_SIZE; i++) {
-        inputs[i] = new float*[d.getNumInputs()];
-        for (int ch = 0; ch < d.getNumInputs(); ch++) {
+        inputs[i] = new float*[num_inputs];
+        for (int ch = 0; ch < num_inputs; ch++) {
             inputs[i][ch] = new float[buffer_size];
+            signal.fill(inputs[i][ch], ch, (int64_t)i * buffer_size, buffer_size,
+                        (int64_t)CYCLE_SIZE * buffer_size);
         }
 
-        outputs[i] = new float*[d.getNumOutputs()];
-        for (int ch = 0; ch < d.getNumOutputs(); ch++) {
+        outputs[i] = new float*[num_outputs];
+        for (int ch = 0; ch < num_outputs; ch++) {
             outputs[i][ch] = new float[buffer_size];
         }
     }
+}
 
-    while (!d.end_reached()) {
-        int it = d.get_current_iteration();
-
-        float** input  = inputs[it % CYCLE_SIZE];
-        float** output = outputs[it % CYCLE_SIZE];
-        // Fill the input buffers with white noise
-        for (int ch = 0; ch < d.getNumInputs(); ch++) {
-            for (int s = 0; s < buffer_size; s++) {
-                input[ch][s] = -1 + 2 * (rand() / (float)RAND_MAX);
-            }
-        }
-
-        d.compute(buffer_size, input, output);
-    }
-
+cycle_buffers::~cycle_buffers()
+{
     for (int i = 0; i < CYCLE_SIZE; i++) {
-        for (int ch = 0; ch < d.getNumInputs(); ch++) {
+        for (int ch = 0; ch < num_inputs; ch++) {
             delete[] inputs[i][ch];
         }
-        for (int ch = 0; ch < d.getNumOutputs(); ch++) {
+        for (int ch = 0; ch < num_outputs; ch++) {
             delete[] outputs[i][ch];
         }
         delete[] inputs[i];
@@ -57,3 +39,32 @@ void basic_dsp_runner::run(self_measuring_dsp& d)
     delete[] inputs;
     delete[] outputs;
 }
+
+float** cycle_buffers::get_inputs(int iteration)
+{
+    return inputs[iteration % CYCLE_SIZE];
+}
+
+float** cycle_buffers::get_outputs(int iteration)
+{
+    return outputs[iteration % CYCLE_SIZE];
+}
+
+basic_dsp_runner::basic_dsp_runner(int sample_rate, int buffer_size,
+                                   const std::string& signal_spec)
+    : sample_rate(sample_rate), buffer_size(buffer_size), signal(signal_spec, sample_rate)
+{
+}
+
+void basic_dsp_runner::run(self_measuring_dsp& d)
+{
+    d.init(sample_rate);
+
+    // Create the input and output buffers
+    cycle_buffers buffers(d.getNumInputs(), d.getNumOutputs(), buffer_size, signal);
+
+    while (!d.end_reached()) {
+        int it = d.get_current_iteration();
+        d.compute(buffer_size, buffers.get_inputs(it), buffers.get_outputs(it));
+    }
+}
@@ -2,13 +2,35 @@
 #define __FCSCHEDTOOL_BASIC_H__
 
 #include "dsp_measuring.h"
+#include "signals.h"
+
+/*
+ * Input and output buffers of a DSP, cycled through from one loop to the next. Inputs are filled
+ * with an input signal once and for all, so that no time is spent generating them between loops.
+ */
+class cycle_buffers {
+    int      num_inputs;
+    int      num_outputs;
+    int      buffer_size;
+    float*** inputs;
+    float*** outputs;
+
+   public:
+    cycle_buffers(int num_inputs, int num_outputs, int buffer_size, const input_signal& signal);
+    ~cycle_buffers();
+
+    float** get_inputs(int iteration);
+    float** get_outputs(int iteration);
+};
 
 class basic_dsp_runner : public dsp_runner {
    public:
-    const int sample_rate;
-    const int buffer_size;
+    const int    sample_rate;
+    const int    buffer_size;
+    input_signal signal;
 
-    basic_dsp_runner(int sample_rate, int buffer_size);
+    basic_dsp_runner(int sample_rate, int buffer_size,
+                     const std::string& signal_spec = DEFAULT_SIGNAL);
     virtual ~basic_dsp_runner() = default;
 
     virtual void run(self_measuring_dsp& d) override;
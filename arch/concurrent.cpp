@@ -0,0 +1,90 @@
+#include <barrier>
+#include <chrono>
+#include <thread>
+
+#include <sched.h>
+
+#include "basic.h"
+#include "concurrent.h"
+
+static std::vector<int> affinity_cpus()
+{
+    std::vector<int> cpus;
+    cpu_set_t        set;
+    if (sched_getaffinity(0, sizeof(set), &set) == 0) {
+        for (int cpu = 0; cpu < CPU_SETSIZE; cpu++) {
+            if (CPU_ISSET(cpu, &set)) {
+                cpus.push_back(cpu);
+            }
+        }
+    }
+    return cpus;
+}
+
+concurrent_dsp_runner::concurrent_dsp_runner(int sample_rate, int buffer_size, int warmup_loops,
+                                             std::vector<int> cpus, const std::string& signal_spec)
+    : sample_rate(sample_rate),
+      buffer_size(buffer_size),
+      warmup_loops(warmup_loops),
+      cpus(cpus.empty() ? affinity_cpus() : cpus),
+      signal(signal_spec, sample_rate)
+{
+}
+
+int concurrent_dsp_runner::get_cpu(int instance) const
+{
+    return cpus.empty() ? -1 : cpus[instance % cpus.size()];
+}
+
+long long concurrent_dsp_runner::run(const std::vector<self_measuring_dsp*>& dsps)
+{
+    std::chrono::steady_clock::time_point start;
+    bool                                  started = false;
+
+    auto on_cycle = [&]() noexcept {
+        if (!started) {
+            start   = std::chrono::steady_clock::now();
+            started = true;
+        }
+    };
+    std::barrier cycle(dsps.size(), on_cycle);
+
+    auto run_instance = [&](int instance) {
+        self_measuring_dsp& d = *dsps[instance];
+
+        int cpu = get_cpu(instance);
+        if (cpu >= 0) {
+            cpu_set_t set;
+            CPU_ZERO(&set);
+            CPU_SET(cpu, &set);
+            sched_setaffinity(0, sizeof(set), &set);
+        }
+
+        // Warm up the caches of the CPU of the instance, rather than the ones of the main thread
+        d.warmup(buffer_size, warmup_loops);
+        d.init(sample_rate);
+        cycle_buffers buffers(d.getNumInputs(), d.getNumOutputs(), buffer_size, signal);
+
+        while (!d.end_reached()) {
+            int     it     = d.get_current_iteration();
+            float** inputs = buffers.get_inputs(it);
+
+            cycle.arrive_and_wait();
+            d.compute(buffer_size, inputs, buffers.get_outputs(it));
+        }
+
+        // Do not hold the other instances back once this one has ended
+        cycle.arrive_and_drop();
+    };
+
+    std::vector<std::thread> threads;
+    for (int i = 0; i < dsps.size(); i++) {
+        threads.emplace_back(run_instance, i);
+    }
+    for (auto& thread : threads) {
+        thread.join();
+    }
+
+    auto end = std::chrono::steady_clock::now();
+    return std::chrono::duration_cast<std::chrono::nanoseconds>(end - start).count();
+}
@@ -0,0 +1,35 @@
+#ifndef __FCSCHEDTOOL_CONCURRENT_H__
+#define __FCSCHEDTOOL_CONCURRENT_H__
+
+#include <vector>
+
+#include "dsp_measuring.h"
+#include "signals.h"
+
+/*
+ * Runs several DSP instances at the same time, each on its own thread pinned to a CPU, like a host
+ * running many instances at once. Threads wait for each other before every cycle, so that all
+ * instances compete for the shared caches and memory bandwidth during the whole run.
+ */
+class concurrent_dsp_runner {
+   public:
+    const int        sample_rate;
+    const int        buffer_size;
+    const int        warmup_loops;
+    std::vector<int> cpus;
+    input_signal     signal;
+
+    // Instances are pinned round-robin to the given CPUs, or to the CPUs the process may run on,
+    // and warm up on their own thread for warmup_loops before the run
+    concurrent_dsp_runner(int sample_rate, int buffer_size, int warmup_loops,
+                          std::vector<int> cpus = {},
+                          const std::string& signal_spec = DEFAULT_SIGNAL);
+
+    int get_cpu(int instance) const;
+
+    // Returns the wall time of the run, from the first cycle until every instance ended, in
+    // nanoseconds
+    long long run(const std::vector<self_measuring_dsp*>& dsps);
+};
+
+#endif
@@ -0,0 +1,116 @@
+#include <algorithm>
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <stdexcept>
+
+#include "controls.h"
+
+dsp_controls::dsp_controls(const UI& ui)
+{
+    for (const auto& p : ui.get_parameters()) {
+        if (p.is_pressed) {
+            fixed.emplace_back(p.zone, 1);
+        }
+    }
+}
+
+const parameter& dsp_controls::set(const UI& ui, const std::string& assignment)
+{
+    size_t           equal = assignment.rfind('=');
+    const parameter* p     = equal != std::string::npos ? ui.find(assignment.substr(0, equal))
+                                                        : nullptr;
+    if (p == nullptr) {
+        std::cerr << "Unknown or ambiguous control: " << assignment << std::endl;
+        exit(1);
+    }
+
+    std::string value = assignment.substr(equal + 1);
+    size_t      end   = 0;
+    try {
+        fixed.emplace_back(p->zone, std::stof(value, &end));
+    } catch (const std::logic_error&) {
+        end = 0;
+    }
+    if (end == 0 || end != value.size()) {
+        std::cerr << "Invalid value of control " << p->path << ": " << value << std::endl;
+        exit(1);
+    }
+    return *p;
+}
+
+void dsp_controls::load_script(const UI& ui, const std::string& path)
+{
+    std::ifstream script(path);
+    if (!script) {
+        perror(path.c_str());
+        exit(1);
+    }
+
+    std::string line;
+    int         line_number = 0;
+    int         length      = 0;
+    while (std::getline(script, line)) {
+        line_number++;
+        line = line.substr(0, line.find('#'));
+
+        std::istringstream words(line);
+        std::string        first;
+        if (!(words >> first)) {
+            continue;
+        }
+
+        std::string name;
+        FAUSTFLOAT  value;
+        if (first == "loop" && words >> length && length > 0) {
+            continue;
+        }
+        bool is_loop = first.find_first_not_of("0123456789") == std::string::npos;
+        if (!is_loop || !(words >> name >> value)) {
+            std::cerr << path << ":" << line_number << ": expected a loop, a control and a value"
+                      << std::endl;
+            exit(1);
+        }
+
+        const parameter* p = ui.find(name);
+        if (p == nullptr) {
+            std::cerr << path << ":" << line_number << ": unknown or ambiguous control " << name
+                      << std::endl;
+            exit(1);
+        }
+        int loop;
+        try {
+            loop = std::stoi(first);
+        } catch (const std::out_of_range&) {
+            std::cerr << path << ":" << line_number << ": loop out of range for control " << name
+                      << ": " << first << std::endl;
+            exit(1);
+        }
+        changes.push_back({loop, p->zone, value});
+    }
+
+    std::stable_sort(changes.begin(), changes.end(),
+                     [](const change& a, const change& b) { return a.loop < b.loop; });
+
+    loop_length = changes.empty() ? 1 : changes.back().loop + 1;
+    if (length > 0) {
+        loop_length = length;
+    }
+}
+
+void dsp_controls::reset() const
+{
+    for (const auto& [zone, value] : fixed) {
+        *zone = value;
+    }
+}
+
+void dsp_controls::apply(int iteration) const
+{
+    int  loop  = iteration % loop_length;
+    auto first = std::lower_bound(changes.begin(), changes.end(), loop,
+                                  [](const change& c, int loop) { return c.loop < loop; });
+    for (auto it = first; it != changes.end() && it->loop == loop; it++) {
+        *it->zone = it->value;
+    }
+}
@@ -0,0 +1,55 @@
+#ifndef __FCSCHEDTOOL_CONTROLS_H__
+#define __FCSCHEDTOOL_CONTROLS_H__
+
+#include <string>
+#include <utility>
+#include <vector>
+
+#include "ui.h"
+
+/*
+ * Values of the controls of a DSP during a run: controls set for the whole run, and changes at
+ * given loops read from a control script with one change per line:
+ *
+ *     # loop  control  value
+ *     0       freq     220
+ *     100     freq     880
+ *     loop 400
+ *
+ * Controls are found by path or name, as with UI::find. The script repeats every loop_length
+ * loops: one more than its last change, unless a "loop" line gives it. Changes are applied between
+ * the measures of two loops, so that they are not measured.
+ */
+class dsp_controls {
+    struct change {
+        int         loop;
+        FAUSTFLOAT* zone;
+        FAUSTFLOAT  value;
+    };
+
+    std::vector<std::pair<FAUSTFLOAT*, FAUSTFLOAT>> fixed;
+    std::vector<change>                             changes;  // Sorted by loop
+    int                                             loop_length = 1;
+
+   public:
+    // Buttons the UI pressed stay pressed. The UI is only used to find controls, and need not
+    // outlive the controls.
+    explicit dsp_controls(const UI& ui);
+
+    // Sets a control for the whole run, given as control=value, and returns the control set
+    const parameter& set(const UI& ui, const std::string& assignment);
+
+    void load_script(const UI& ui, const std::string& path);
+
+    bool has_changes() const { return !changes.empty(); }
+    int  get_loop_length() const { return loop_length; }
+
+    // Sets the controls set for the whole run again, once the DSP has reset them to their
+    // initial values
+    void reset() const;
+
+    // Sets the controls that change at the given loop
+    void apply(int iteration) const;
+};
+
+#endif
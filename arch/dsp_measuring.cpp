@@ -1,52 +1,18 @@
-#include <chrono>
+#include <algorithm>
 #include <cmath>
+#include <cstdint>
 #include <cstring>
 #include <functional>
 #include <iostream>
 
 #include <perfmon/pfmlib_perf_event.h>
 
+#include "controls.h"
 #include "load.h"
 #include "pfm_utils.h"
 
 #include "dsp_measuring.h"
 
-struct event_stat {
-    long long avg;
-    long long stddev;
-    long long min;
-    long long max;
-};
-
-event_stat event_statistics(const std::vector<long long>& array)
-{
-    event_stat s;
-
-    s.min = array[0];
-    s.max = array[0];
-
-    long long total = 0;
-    for (long long sample : array) {
-        total += sample;
-
-        if (s.min > sample) {
-            s.min = sample;
-        }
-        if (s.max < sample) {
-            s.max = sample;
-        }
-    }
-    s.avg = (double)total / array.size();
-
-    double deviation = 0;
-    for (long long sample : array) {
-        deviation += pow(sample - s.avg, 2);
-    }
-    s.stddev = sqrt(deviation / array.size());
-
-    return s;
-}
-
 std::string format_hr_nanoseconds(long long n)
 {
     if (n / 1000 == 0) {
@@ -73,35 +39,58 @@ std::string format_hr(long long n)
     }
 }
 
+void print_statistics(std::ostream& output, const running_stats& stats, const std::string& name,
+                      const std::function<std::string(long long)>& fmt = format_hr)
+{
+    output << "\033[0m" << std::format("{:<32} ", name) << "\033[0m"
+           << "\033[93maverage: " << fmt(stats.get_mean()) << ", "
+           << "\033[94mstd. dev.: "
+           << std::format("{:6.02f}%", stats.get_stddev() * 100.0 / stats.get_mean()) << ", "
+           << "\033[92mmin: " << fmt(stats.get_min()) << ", "
+           << "\033[91mmax: " << fmt(stats.get_max()) << "\033[0m\n";
+}
+
 void print_statistics(std::ostream& output, const std::vector<long long>& array,
                       const std::string& name,
                       const std::function<std::string(long long)>& fmt = format_hr)
 {
-    struct event_stat stat = event_statistics(array);
-    output << "\033[0m" << std::format("{:<32} ", name) << "\033[0m"
-           << "\033[93maverage: " << fmt(stat.avg) << ", "
-           << "\033[94mstd. dev.: " << std::format("{:6.02f}%", stat.stddev * 100.0 / stat.avg)
-           << ", "
-           << "\033[92mmin: " << fmt(stat.min) << ", "
-           << "\033[91mmax: " << fmt(stat.max) << "\033[0m\n";
+    running_stats stats;
+    for (long long sample : array) {
+        stats.add(sample);
+    }
+    print_statistics(output, stats, name, fmt);
+}
+
+static const cycle_timer& shared_timer()
+{
+    // Calibrating the timer takes a few milliseconds: do it once for all programs
+    static const cycle_timer timer;
+    return timer;
 }
 
 self_measuring_dsp::self_measuring_dsp(dsp* dsp, int nb_iterations)
-    : decorator_dsp(dsp), nb_iterations(nb_iterations), durations(nb_iterations)
+    : decorator_dsp(dsp),
+      nb_iterations(nb_iterations),
+      timer(shared_timer())
 {
 }
 
 self_measuring_dsp::self_measuring_dsp(const std::string& path, int nb_iterations)
-    : decorator_dsp(new foreign_dsp(path)), nb_iterations(nb_iterations), durations(nb_iterations)
+    : decorator_dsp(new foreign_dsp(path)),
+      nb_iterations(nb_iterations),
+      timer(shared_timer())
+{
+}
+
+self_measuring_dsp::~self_measuring_dsp()
 {
+    close_events();
 }
 
 void self_measuring_dsp::observe_event(const std::string& event_name)
 {
     events.emplace_back(event_name);
-
-    // Pre-allocate measures buffer
-    perf_measures.emplace_back(nb_iterations);
+    perf_measures.emplace_back();
 }
 
 void self_measuring_dsp::observe_events(const std::vector<std::string>& event_names)
@@ -109,23 +98,304 @@ void self_measuring_dsp::observe_events(const std::vector<std::string>& event_na
     for (auto event_name : event_names) {
         observe_event(event_name);
     }
-
-    int groups_size = std::max((events.size() - 1) / MAX_COUNTERS + 1, (size_t)0);
-    perf_groups.assign(groups_size, {-1});
 }
 
 void self_measuring_dsp::open_events()
 {
+    // Allocate the measures before the first measure
+    if (streaming) {
+        summaries.resize(events.size() + 1);
+        trace.assign(trace_rows > 0 ? events.size() + 1 : 0, std::vector<long long>(trace_rows));
+    } else {
+        durations.resize(nb_iterations);
+        for (auto& measures : perf_measures) {
+            measures.resize(nb_iterations);
+        }
+    }
+
+    // Pack the events into groups in their order, on fixed counters when they allow it
+    pfm_utils_counters            counters = pfm_utils_get_counters();
+    std::vector<std::vector<int>> packing;
+    int                           general = 0;
+    int                           fixed   = 0;
+
     for (int i = 0; i < events.size(); i++) {
-        auto& group = perf_groups[i / MAX_COUNTERS];
-        int   pos   = i % MAX_COUNTERS;
-        int   fd    = pfm_utils_open_named_event(events[i].c_str(), group[0]);
-        group[pos]  = fd;
+        bool can_be_fixed = counters.fixed > 0 && pfm_utils_is_fixed_event(events[i].c_str());
+        bool fits = (can_be_fixed && fixed < counters.fixed) || general < counters.general;
+        if (packing.empty() || !fits) {
+            packing.emplace_back();
+            general = 0;
+            fixed   = 0;
+        }
+
+        if (can_be_fixed && fixed < counters.fixed) {
+            fixed++;
+        } else {
+            general++;
+        }
+        packing.back().push_back(i);
+    }
+
+    // The kernel may still not schedule a whole group, e.g. when the NMI watchdog takes a counter:
+    // move its last events to the next group until it fits.
+    perf_groups.clear();
+    for (int g = 0; g < packing.size(); g++) {
+        perf_group group;
+        group.events = packing[g];
+        open_group(group);
+
+        while (group.events.size() > 1 && !pfm_utils_group_fits(group.fds[0], group.fds.size())) {
+            close_group(group);
+            if (g + 1 == packing.size()) {
+                packing.emplace_back();
+            }
+            packing[g + 1].insert(packing[g + 1].begin(), group.events.back());
+            group.events.pop_back();
+            open_group(group);
+        }
+
+        perf_groups.push_back(std::move(group));
+    }
+
+    size_t max_group_size = 0;
+    for (const auto& group : perf_groups) {
+        max_group_size = std::max(max_group_size, group.fds.size());
+    }
+    read_buffer.resize(PFM_UTILS_READ_HEADER + max_group_size);
+    start_counts.resize(max_group_size);
+    end_counts.resize(max_group_size);
+
+    for (auto& group : perf_groups) {
+        // Tell multiplexing from the times of the fitting test
+        uint64_t time_enabled, time_running;
+        read_counts(group, nullptr, time_enabled, time_running);
+    }
+
+    // Read the counters with rdpmc only if every event allows it
+    user_reads = allow_user_reads && !perf_groups.empty();
+    for (const auto& group : perf_groups) {
+        for (perf_event_mmap_page* page : group.pages) {
+            user_reads = user_reads && page != nullptr;
+        }
+    }
+
+    if (user_reads) {
+        ioctl(perf_groups[0].fds[0], PERF_EVENT_IOC_RESET, PERF_IOC_FLAG_GROUP);
+        ioctl(perf_groups[0].fds[0], PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
     }
 
     events_opened = true;
 }
 
+void self_measuring_dsp::open_group(perf_group& group)
+{
+    for (int event : group.events) {
+        int leader = group.fds.empty() ? -1 : group.fds[0];
+        int fd     = pfm_utils_open_named_event(events[event].c_str(), leader);
+        group.fds.push_back(fd);
+        group.pages.push_back(allow_user_reads ? perf_user_map(fd) : nullptr);
+    }
+}
+
+void self_measuring_dsp::close_group(perf_group& group)
+{
+    for (perf_event_mmap_page* page : group.pages) {
+        if (page != nullptr) {
+            perf_user_unmap(page);
+        }
+    }
+    // Close the leader last
+    for (int i = group.fds.size() - 1; i >= 0; i--) {
+        close(group.fds[i]);
+    }
+    group.pages.clear();
+    group.fds.clear();
+}
+
+void self_measuring_dsp::close_events()
+{
+    for (auto& group : perf_groups) {
+        close_group(group);
+    }
+    user_reads = false;
+}
+
+void self_measuring_dsp::suspend_events()
+{
+    if (user_reads) {
+        ioctl(perf_groups[current_group].fds[0], PERF_EVENT_IOC_DISABLE, PERF_IOC_FLAG_GROUP);
+    }
+}
+
+void self_measuring_dsp::resume_events()
+{
+    if (user_reads) {
+        ioctl(perf_groups[current_group].fds[0], PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
+    }
+}
+
+bool self_measuring_dsp::read_user_counts(perf_group& group, long long* counts)
+{
+    for (int i = 0; i < group.fds.size(); i++) {
+        if (!perf_user_read(group.pages[i], &counts[i])) {
+            // The group is not scheduled on the PMU right now
+            uint64_t time_enabled, time_running;
+            read_counts(group, counts, time_enabled, time_running);
+            return false;
+        }
+    }
+    return true;
+}
+
+void self_measuring_dsp::read_counts(perf_group& group, long long* counts, uint64_t& time_enabled,
+                                     uint64_t& time_running)
+{
+    read(group.fds[0], read_buffer.data(),
+         (PFM_UTILS_READ_HEADER + group.fds.size()) * sizeof(uint64_t));
+
+    // Times are totals since the events were opened
+    time_enabled       = read_buffer[1] - group.time_enabled;
+    time_running       = read_buffer[2] - group.time_running;
+    group.time_enabled = read_buffer[1];
+    group.time_running = read_buffer[2];
+
+    if (counts != nullptr) {
+        for (int i = 0; i < group.fds.size(); i++) {
+            counts[i] = read_buffer[PFM_UTILS_READ_HEADER + i];
+        }
+    }
+}
+
+bool self_measuring_dsp::store_counts(const perf_group& group, const long long* counts,
+                                      uint64_t time_enabled, uint64_t time_running)
+{
+    double scale = 1;
+    if (time_running < time_enabled) {
+        multiplexed++;
+
+        // Measure again, unless the group never gets to count all along
+        bool can_scale = time_running > 0;
+        if ((reject_multiplexed || !can_scale) && multiplexed <= nb_iterations) {
+            return false;
+        }
+        if (can_scale) {
+            scale = (double)time_enabled / time_running;
+        }
+    }
+
+    for (int i = 0; i < group.events.size(); i++) {
+        record(group.events[i] + 1, counts[i] * scale);
+    }
+    return true;
+}
+
+void self_measuring_dsp::record(int column, long long value)
+{
+    if (!streaming) {
+        (column == 0 ? durations : perf_measures[column - 1])[current_iteration] = value;
+        return;
+    }
+
+    summaries[column].add(value);
+    if (!trace.empty() && current_iteration % trace_step == 0) {
+        trace[column][current_iteration / trace_step] = value;
+    }
+}
+
+void self_measuring_dsp::compact_trace()
+{
+    // Keep the even rows, i.e. one iteration out of 2 * trace_step
+    for (auto& column : trace) {
+        for (int row = 0; 2 * row < trace_rows; row++) {
+            column[row] = column[2 * row];
+        }
+    }
+    trace_step *= 2;
+}
+
+void self_measuring_dsp::set_streaming(bool streaming, int trace_rows)
+{
+    this->streaming  = streaming;
+    this->trace_rows = trace_rows;
+}
+
+bool self_measuring_dsp::is_streaming() const
+{
+    return streaming;
+}
+
+void self_measuring_dsp::set_controls(std::unique_ptr<dsp_controls> controls)
+{
+    this->controls = std::move(controls);
+    this->controls->reset();
+}
+
+void self_measuring_dsp::init(int sample_rate)
+{
+    fDSP->init(sample_rate);
+    if (controls) {
+        controls->reset();
+    }
+}
+
+void self_measuring_dsp::instanceInit(int sample_rate)
+{
+    fDSP->instanceInit(sample_rate);
+    if (controls) {
+        controls->reset();
+    }
+}
+
+const std::vector<long long>& self_measuring_dsp::stored_column(int column) const
+{
+    if (streaming) {
+        return trace[column];
+    }
+    return column == 0 ? durations : perf_measures[column - 1];
+}
+
+size_t self_measuring_dsp::stored_rows() const
+{
+    if (!streaming) {
+        return durations.size();
+    }
+    if (trace.empty()) {
+        return 0;
+    }
+    int n = std::min(current_iteration, nb_iterations);
+    return (n + trace_step - 1) / trace_step;
+}
+
+void self_measuring_dsp::set_reject_multiplexed(bool reject)
+{
+    reject_multiplexed = reject;
+}
+
+int self_measuring_dsp::get_multiplexed_count() const
+{
+    return multiplexed;
+}
+
+int self_measuring_dsp::get_group_count() const
+{
+    return perf_groups.size();
+}
+
+void self_measuring_dsp::set_user_reads(bool allowed)
+{
+    allow_user_reads = allowed;
+}
+
+bool self_measuring_dsp::has_user_reads() const
+{
+    return user_reads;
+}
+
+bool self_measuring_dsp::has_tsc_timer() const
+{
+    return timer.is_tsc();
+}
+
 void self_measuring_dsp::compute(int count, float** inputs, float** outputs)
 {
     // We need to open perf events in the thread that will run them
@@ -133,43 +403,106 @@ void self_measuring_dsp::compute(int count, float** inputs, float** outputs)
         open_events();
     }
 
-    std::optional<std::array<float, MAX_COUNTERS>> group;
-    if (perf_groups.size() > 0) {
-        group.emplace(perf_groups[current_group]);
+    bool measured = current_iteration >= 0 && current_iteration < nb_iterations;
+    bool stored   = true;
+
+    if (controls && controls->has_changes()) {
+        controls->apply(current_iteration);
     }
 
-    if (group.has_value()) {
-        ioctl((*group)[0], PERF_EVENT_IOC_RESET, PERF_IOC_FLAG_GROUP);
-        ioctl((*group)[0], PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
+    if (settling) {
+        // Not measured, after a precision check: the iteration is measured on the next call
+        settling = false;
+        fDSP->compute(count, inputs, outputs);
+        return;
     }
 
-    auto start = std::chrono::high_resolution_clock::now();
-    fDSP->compute(count, inputs, outputs);
-    auto end = std::chrono::high_resolution_clock::now();
+    if (perf_groups.empty()) {
+        uint64_t start = timer.now();
+        fDSP->compute(count, inputs, outputs);
+        uint64_t end = timer.now();
 
-    if (group.has_value()) {
-        ioctl((*group)[0], PERF_EVENT_IOC_DISABLE, PERF_IOC_FLAG_GROUP);
-    }
+        if (measured) {
+            record(0, timer.nanoseconds(start, end));
+        }
+    } else if (user_reads) {
+        perf_group& group = perf_groups[current_group];
+
+        // The group is already enabled: read the counters before and after without syscalls
+        bool     start_scheduled = read_user_counts(group, start_counts.data());
+        uint64_t start_lost      = perf_user_lost_time(group.pages[0]);
+        uint64_t start           = timer.now();
+        fDSP->compute(count, inputs, outputs);
+        uint64_t end           = timer.now();
+        uint64_t end_lost      = perf_user_lost_time(group.pages[0]);
+        bool     end_scheduled = read_user_counts(group, end_counts.data());
+
+        if (measured) {
+            uint64_t duration = timer.nanoseconds(start, end);
+            uint64_t lost     = std::min(end_lost - start_lost, duration);
+            uint64_t running  = start_scheduled && end_scheduled ? duration - lost : 0;
+
+            for (int i = 0; i < group.fds.size(); i++) {
+                end_counts[i] -= start_counts[i];
+            }
+            stored = store_counts(group, end_counts.data(), duration, running);
+            if (stored && current_group + 1 == perf_groups.size()) {
+                record(0, duration);
+            }
+        }
+
+        if (stored && perf_groups.size() > 1) {
+            int next = (current_group + 1) % perf_groups.size();
+            ioctl(group.fds[0], PERF_EVENT_IOC_DISABLE, PERF_IOC_FLAG_GROUP);
+            ioctl(perf_groups[next].fds[0], PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
+        }
+    } else {
+        perf_group& group = perf_groups[current_group];
 
-    if (current_iteration >= 0 && current_iteration < nb_iterations) {
-        std::chrono::nanoseconds duration = end - start;
-        durations[current_iteration]      = duration.count();
+        ioctl(group.fds[0], PERF_EVENT_IOC_RESET, PERF_IOC_FLAG_GROUP);
+        ioctl(group.fds[0], PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
 
-        if (group.has_value()) {
-            int offset = current_group * MAX_COUNTERS;
-            for (int i = 0; i < MAX_COUNTERS; i++) {
-                if ((*group)[i] <= 0) {
-                    break;
-                }
-                long long* read_addr = &perf_measures[offset + i][current_iteration];
-                read((*group)[i], read_addr, sizeof(long long));
+        uint64_t start = timer.now();
+        fDSP->compute(count, inputs, outputs);
+        uint64_t end = timer.now();
+
+        ioctl(group.fds[0], PERF_EVENT_IOC_DISABLE, PERF_IOC_FLAG_GROUP);
+
+        if (measured) {
+            // A single read for the whole group
+            uint64_t time_enabled, time_running;
+            read_counts(group, end_counts.data(), time_enabled, time_running);
+
+            stored = store_counts(group, end_counts.data(), time_enabled, time_running);
+            if (stored && current_group + 1 == perf_groups.size()) {
+                record(0, timer.nanoseconds(start, end));
             }
         }
     }
 
+    if (!stored) {
+        // Measure this group again
+        return;
+    }
+
     if (++current_group >= perf_groups.size()) {
         current_group = 0;
         current_iteration++;
+
+        if (streaming && !trace.empty() && current_iteration == trace_step * trace_rows) {
+            compact_trace();
+        }
+
+        if (current_iteration == next_check && precision_reached()) {
+            // Drop the unused measures
+            nb_iterations = current_iteration;
+            if (!streaming) {
+                durations.resize(nb_iterations);
+                for (auto& measures : perf_measures) {
+                    measures.resize(nb_iterations);
+                }
+            }
+        }
     }
 
     if (current_iteration == nb_iterations) {
@@ -177,6 +510,63 @@ void self_measuring_dsp::compute(int count, float** inputs, float** outputs)
     }
 }
 
+void self_measuring_dsp::set_target_precision(double precision, int min_iterations)
+{
+    this->target_precision = precision;
+    this->min_iterations   = std::max(min_iterations, 2);
+    next_check             = std::min(this->min_iterations, nb_iterations);
+
+    // Allocate now, not while measuring. Streaming runs use the histogram of durations instead.
+    if (!streaming) {
+        sorted_durations.reserve(nb_iterations);
+    }
+}
+
+double self_measuring_dsp::get_precision()
+{
+    int n = std::min(current_iteration, nb_iterations);
+    if (n < 2) {
+        return INFINITY;
+    }
+
+    // Distribution-free confidence interval of the quantile: the order statistics whose ranks
+    // are z standard deviations of the binomial distribution away from n * q.
+    double q         = PRECISION_QUANTILE;
+    double deviation = PRECISION_Z * sqrt(n * q * (1 - q));
+    int    rank      = std::clamp((int)(n * q), 0, n - 1);
+    int    lower     = std::clamp((int)floor(n * q - deviation), 0, n - 1);
+    int    upper     = std::clamp((int)ceil(n * q + deviation), 0, n - 1);
+
+    if (!streaming) {
+        sorted_durations.assign(durations.begin(), durations.begin() + n);
+    }
+    auto order_statistic = [&](int k) {
+        if (streaming) {
+            return (double)summaries[0].histogram.value_at_rank(k);
+        }
+        std::nth_element(sorted_durations.begin(), sorted_durations.begin() + k,
+                         sorted_durations.end());
+        return (double)sorted_durations[k];
+    };
+
+    double quantile = order_statistic(rank);
+    double width    = order_statistic(upper) - order_statistic(lower);
+    return quantile > 0 ? width / (2 * quantile) : INFINITY;
+}
+
+bool self_measuring_dsp::precision_reached()
+{
+    if (target_precision <= 0) {
+        return false;
+    }
+
+    next_check = std::min(current_iteration + std::max(current_iteration / PRECISION_CHECKS, 1),
+                          nb_iterations);
+    bool reached = get_precision() <= target_precision;
+    settling     = !reached;
+    return reached;
+}
+
 void self_measuring_dsp::warmup(int buffer_size, int nb_iterations)
 {
     float** inputs  = new float*[fDSP->getNumInputs()];
@@ -228,8 +618,47 @@ void self_measuring_dsp::wait()
     end_cv.wait(lock);
 }
 
+std::vector<std::pair<std::string, long long>> self_measuring_dsp::get_quantiles(double q) const
+{
+    std::vector<std::pair<std::string, long long>> quantiles;
+    std::vector<long long>                         sorted;
+
+    auto quantile = [&](const std::vector<long long>& measures) {
+        int n = std::min((int)measures.size(), nb_iterations);
+        if (n == 0) {
+            return 0LL;
+        }
+        sorted.assign(measures.begin(), measures.begin() + n);
+        auto nth = sorted.begin() + std::clamp((int)(n * q), 0, n - 1);
+        std::nth_element(sorted.begin(), nth, sorted.end());
+        return *nth;
+    };
+
+    if (streaming) {
+        quantiles.emplace_back("time(ns)", summaries[0].quantile(q));
+        for (int i = 0; i < events.size(); i++) {
+            quantiles.emplace_back(events[i], summaries[i + 1].quantile(q));
+        }
+        return quantiles;
+    }
+
+    quantiles.emplace_back("time(ns)", quantile(durations));
+    for (int i = 0; i < events.size(); i++) {
+        quantiles.emplace_back(events[i], quantile(perf_measures[i]));
+    }
+    return quantiles;
+}
+
 void self_measuring_dsp::print_measures_pretty(std::ostream& output) const
 {
+    if (streaming) {
+        print_statistics(output, summaries[0].stats, "time(ns)", format_hr_nanoseconds);
+        for (int i = 0; i < events.size(); i++) {
+            print_statistics(output, summaries[i + 1].stats, events[i]);
+        }
+        return;
+    }
+
     print_statistics(output, durations, "time(ns)", format_hr_nanoseconds);
     for (int i = 0; i < events.size(); i++) {
         print_statistics(output, perf_measures[i], events[i]);
@@ -246,11 +675,86 @@ void self_measuring_dsp::print_measures_raw(std::ostream& output) const
     output << std::endl;
 
     // counts
-    for (int i = 0; i < nb_iterations; i++) {
-        output << durations[i] << ";";
-        for (int e = 0; e < events.size(); e++) {
-            output << perf_measures[e][i] << ";";
+    for (int i = 0; i < stored_rows(); i++) {
+        for (int c = 0; c <= events.size(); c++) {
+            output << stored_column(c)[i] << ";";
         }
-        output << std::endl;
+        output << '\n';
+    }
+    output.flush();
+}
+
+static size_t write_u32(std::ostream& output, uint32_t value)
+{
+    output.write(reinterpret_cast<const char*>(&value), sizeof(value));
+    return sizeof(value);
+}
+
+static size_t write_string(std::ostream& output, const std::string& str)
+{
+    size_t size = write_u32(output, str.size());
+    output.write(str.data(), str.size());
+    return size + str.size();
+}
+
+void self_measuring_dsp::set_metadata(const std::string& key, const std::string& value)
+{
+    metadata.emplace_back(key, value);
+}
+
+void self_measuring_dsp::print_measures_binary(std::ostream& output) const
+{
+    static_assert(sizeof(long long) == sizeof(int64_t));
+
+    uint64_t nrows       = stored_rows();
+    size_t   header_size = sizeof(MEASURES_MAGIC);
+
+    auto all_metadata = metadata;
+    if (streaming) {
+        all_metadata.emplace_back("trace_step", std::to_string(trace_step));
+        for (int c = 0; c <= events.size(); c++) {
+            const std::string& name    = c == 0 ? "time(ns)" : events[c - 1];
+            const auto&        summary = summaries[c];
+            auto stat = [&](const std::string& key, const std::string& value) {
+                all_metadata.emplace_back("summary:" + key + ":" + name, value);
+            };
+
+            stat("count", std::to_string(summary.stats.get_count()));
+            stat("mean", std::to_string(summary.stats.get_mean()));
+            stat("stddev", std::to_string(summary.stats.get_stddev()));
+            stat("min", std::to_string(summary.stats.get_min()));
+            stat("max", std::to_string(summary.stats.get_max()));
+            for (const auto& quantile : summary.quantiles) {
+                std::string key = std::format("p{:g}", quantile.get_p() * 100);
+                stat(key, std::to_string(quantile.value()));
+            }
+            stat("histogram", summary.histogram.to_string());
+        }
+    }
+
+    output.write(MEASURES_MAGIC, sizeof(MEASURES_MAGIC));
+    header_size += write_u32(output, MEASURES_VERSION);
+    header_size += write_u32(output, events.size() + 1);
+    output.write(reinterpret_cast<const char*>(&nrows), sizeof(nrows));
+    header_size += sizeof(nrows);
+    header_size += write_u32(output, all_metadata.size());
+
+    header_size += write_string(output, "time(ns)");
+    for (const auto& event : events) {
+        header_size += write_string(output, event);
+    }
+
+    for (const auto& [key, value] : all_metadata) {
+        header_size += write_string(output, key);
+        header_size += write_string(output, value);
+    }
+
+    static const char padding[sizeof(int64_t)] = {0};
+    output.write(padding, (sizeof(int64_t) - header_size % sizeof(int64_t)) % sizeof(int64_t));
+
+    for (int c = 0; c <= events.size(); c++) {
+        output.write(reinterpret_cast<const char*>(stored_column(c).data()),
+                     nrows * sizeof(int64_t));
     }
+    output.flush();
 }
@@ -1,47 +1,169 @@
 #ifndef __FCSCHEDTOOL_DSP_MEASURING_H__
 #define __FCSCHEDTOOL_DSP_MEASURING_H__
 
-#include <array>
 #include <condition_variable>
+#include <cstdint>
+#include <memory>
 #include <mutex>
+#include <string>
+#include <utility>
+#include <vector>
 
 #include <faust/dsp/dsp.h>
 
+#include "perf_user.h"
+#include "streaming_stats.h"
+
+/*
+ * PMU counters are in limited number. Events are packed into groups that fit on the PMU, and each
+ * loop measures every group in turn, running the DSP once per group.
+ */
+struct perf_group {
+    std::vector<int> events;  // Indices of the events of the group
+    std::vector<int> fds;     // The group leader first
+
+    // User pages of the events, to read them with rdpmc when the kernel allows it
+    std::vector<perf_event_mmap_page*> pages;
+
+    // Times of the last read, to tell whether the group was multiplexed since
+    uint64_t time_enabled = 0;
+    uint64_t time_running = 0;
+};
+
+/*
+ * Binary measures format: a header holding the column names and key/value metadata, followed by
+ * one contiguous column of int64 values per measure. Columns start at an 8-byte aligned offset.
+ *
+ *     char     magic[8] = MEASURES_MAGIC
+ *     uint32_t version
+ *     uint32_t ncolumns
+ *     uint64_t nrows
+ *     uint32_t nmetadata
+ *     string   column_names[ncolumns]     (uint32_t length, then the characters)
+ *     string   metadata[nmetadata][2]     (key, value)
+ *     char     padding[]
+ *     int64_t  columns[ncolumns][nrows]
+ */
+#define MEASURES_MAGIC "FCSCHED"
+#define MEASURES_VERSION 1
+
 /*
- * PFM units are in limited number. If we're measuring more than MAX_COUNTERS events, we will group
- * them by this number and run more loops to get the requested number of measures.
+ * Adaptive runs stop as soon as the 95% confidence interval of the PRECISION_QUANTILE quantile of
+ * durations is narrower than the target precision, relative to the quantile itself. The
+ * confidence interval is checked every time the number of iterations grows by 1/PRECISION_CHECKS.
+ * Checks sort the durations, so the compute call following a check is not measured: it only
+ * brings the caches and branch predictors of the DSP back before the next measured iteration.
  */
-#define MAX_COUNTERS 4
+#define PRECISION_QUANTILE 0.2
+#define PRECISION_Z 1.96
+#define PRECISION_CHECKS 16
+
+/*
+ * Streaming runs do not store every measure: they keep a stream_summary per column, and a trace of
+ * at most trace_rows measures. When the trace is full, every other row is dropped and the trace
+ * then keeps one iteration out of twice as many, so memory does not grow with the run length.
+ */
+#define DEFAULT_TRACE_ROWS 4096
+
+class dsp_controls;
 
 class self_measuring_dsp : public decorator_dsp {
     int nb_iterations;
     int current_iteration = 0;
 
+    // Adaptive runs only: relative precision to reach, and iterations to run at least
+    double target_precision = 0;
+    int    min_iterations   = 0;
+    int    next_check       = 0;
+    bool   settling         = false;
+
+    std::vector<long long> sorted_durations;
+
     std::vector<std::string> events;
 
-    std::vector<std::array<float, MAX_COUNTERS>> perf_groups;
+    std::vector<perf_group> perf_groups;
+
+    bool events_opened    = false;
+    bool allow_user_reads = true;
+    bool user_reads       = false;
+    int  current_group    = 0;
+
+    // Measures taken while their group was not counting all along. They are scaled by the ratio
+    // of enabled to running time, or measured again when rejected.
+    bool reject_multiplexed = false;
+    int  multiplexed        = 0;
 
-    bool events_opened = false;
-    int  current_group = 0;
+    // Scratch buffers for counter reads, allocated when events are opened
+    std::vector<uint64_t>  read_buffer;
+    std::vector<long long> start_counts;
+    std::vector<long long> end_counts;
 
-    // FIXME: Use a fixed-length array to control allocations
+    const cycle_timer& timer;
+
+    // Allocated when events are opened, one value per iteration
     std::vector<long long>              durations;
     std::vector<std::vector<long long>> perf_measures;
 
+    // Streaming runs only: summaries and decimated trace of each column, durations first
+    bool                                streaming  = false;
+    int                                 trace_rows = 0;
+    int                                 trace_step = 1;
+    std::vector<stream_summary>         summaries;
+    std::vector<std::vector<long long>> trace;
+
+    std::vector<std::pair<std::string, std::string>> metadata;
+
+    // Control values set after initialization, and changed before each loop, if any
+    std::unique_ptr<dsp_controls> controls;
+
     std::mutex              end_mutex;
     std::condition_variable end_cv;
 
    public:
     explicit self_measuring_dsp(dsp* dsp, int nb_iterations = 1000);
     explicit self_measuring_dsp(const std::string& path, int nb_iterations = 1000);
+    ~self_measuring_dsp();
 
+    void init(int sample_rate) override;
+    void instanceInit(int sample_rate) override;
     void compute(int count, float** inputs, float** outputs) override;
 
     void observe_events(const std::vector<std::string>& event_names);
 
+    // Stop before nb_iterations once the given relative precision is reached
+    void set_target_precision(double precision, int min_iterations);
+
+    // Relative half-width of the confidence interval of the measured durations quantile
+    double get_precision();
+
+    // Keep summaries and a trace of at most trace_rows measures rather than every measure. Must be
+    // called before the first compute.
+    void set_streaming(bool streaming, int trace_rows = DEFAULT_TRACE_ROWS);
+    bool is_streaming() const;
+
+    // Sets the controls of the DSP now, after every initialization, and between loops
+    void set_controls(std::unique_ptr<dsp_controls> controls);
+
     // Run the DSP for a few hundred loops to ignore initialization effects
     void warmup(int buffer_size, int nb_iterations = 200);
 
+    // Measure again rather than scale the counts of groups that were multiplexed
+    void set_reject_multiplexed(bool reject);
+
+    int get_multiplexed_count() const;
+    int get_group_count() const;
+
+    // Counters are read with rdpmc, unless disallowed here or by the kernel
+    void set_user_reads(bool allowed);
+
+    // True if counters are read with rdpmc rather than with syscalls
+    bool has_user_reads() const;
+    bool has_tsc_timer() const;
+
+    // The measured program, and the timer of its measures
+    dsp*               get_program() const { return fDSP; }
+    const cycle_timer& get_timer() const { return timer; }
+
     // Returns true if the measuring vectors have been filled
     bool end_reached() const;
 
@@ -50,12 +172,41 @@ class self_measuring_dsp : public decorator_dsp {
 
     void wait();
 
+    // Stop observing events, and release their counters for other measures
+    void close_events();
+
+    // Stop and start counting events between loops, while other DSPs run. Counters read with
+    // syscalls only count during loops anyway.
+    void suspend_events();
+    void resume_events();
+
+    // The q-quantile of each column of measures, with its name
+    std::vector<std::pair<std::string, long long>> get_quantiles(double q) const;
+
+    // Metadata written in the header of binary measures
+    void set_metadata(const std::string& key, const std::string& value);
+
     void print_measures_pretty(std::ostream& output) const;
     void print_measures_raw(std::ostream& output) const;
+    void print_measures_binary(std::ostream& output) const;
 
    private:
     void observe_event(const std::string& event_name);
     void open_events();
+    void open_group(perf_group& group);
+    void close_group(perf_group& group);
+    bool read_user_counts(perf_group& group, long long* counts);
+    void read_counts(perf_group& group, long long* counts, uint64_t& time_enabled,
+                     uint64_t& time_running);
+    bool store_counts(const perf_group& group, const long long* counts, uint64_t time_enabled,
+                      uint64_t time_running);
+    bool precision_reached();
+    void record(int column, long long value);
+    void compact_trace();
+
+    // Measures of a column, durations first: the trace of streaming runs
+    const std::vector<long long>& stored_column(int column) const;
+    size_t                        stored_rows() const;
 };
 
 class dsp_runner {
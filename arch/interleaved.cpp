@@ -0,0 +1,59 @@
+#include <algorithm>
+#include <memory>
+#include <random>
+
+#include "basic.h"
+#include "interleaved.h"
+
+interleaved_dsp_runner::interleaved_dsp_runner(int sample_rate, int buffer_size, int block_size,
+                                               unsigned seed, const std::string& signal_spec)
+    : sample_rate(sample_rate),
+      buffer_size(buffer_size),
+      block_size(block_size),
+      seed(seed),
+      signal(signal_spec, sample_rate)
+{
+}
+
+std::vector<int> interleaved_dsp_runner::run(const std::vector<self_measuring_dsp*>& dsps)
+{
+    // Every DSP has its own instance and buffers
+    std::vector<std::unique_ptr<cycle_buffers>> buffers;
+    for (self_measuring_dsp* d : dsps) {
+        d->init(sample_rate);
+        buffers.push_back(std::make_unique<cycle_buffers>(d->getNumInputs(), d->getNumOutputs(),
+                                                          buffer_size, signal));
+    }
+
+    std::mt19937     random(seed);
+    std::vector<int> order;
+    std::vector<int> schedule;
+
+    while (true) {
+        order.clear();
+        for (int i = 0; i < dsps.size(); i++) {
+            if (!dsps[i]->end_reached()) {
+                order.push_back(i);
+            }
+        }
+        if (order.empty()) {
+            break;
+        }
+        std::shuffle(order.begin(), order.end(), random);
+
+        for (int i : order) {
+            self_measuring_dsp& d = *dsps[i];
+            schedule.push_back(i);
+
+            // Only count the events of the DSP that is running
+            d.resume_events();
+            for (int loop = 0; loop < block_size && !d.end_reached(); loop++) {
+                int it = d.get_current_iteration();
+                d.compute(buffer_size, buffers[i]->get_inputs(it), buffers[i]->get_outputs(it));
+            }
+            d.suspend_events();
+        }
+    }
+
+    return schedule;
+}
@@ -0,0 +1,32 @@
+#ifndef __FCSCHEDTOOL_INTERLEAVED_H__
+#define __FCSCHEDTOOL_INTERLEAVED_H__
+
+#include <vector>
+
+#include "dsp_measuring.h"
+#include "signals.h"
+
+#define DEFAULT_BLOCK_SIZE 10
+
+/*
+ * Runs several DSPs in the same process, in rounds of blocks of block_size loops: every round runs
+ * a block of each DSP that has not reached its end, in a random order. Slow drifts of the machine,
+ * e.g. thermal throttling or frequency changes, then affect every DSP alike rather than the ones
+ * that happen to run last.
+ */
+class interleaved_dsp_runner {
+   public:
+    const int      sample_rate;
+    const int      buffer_size;
+    const int      block_size;
+    const unsigned seed;
+    input_signal   signal;
+
+    interleaved_dsp_runner(int sample_rate, int buffer_size, int block_size = DEFAULT_BLOCK_SIZE,
+                           unsigned seed = 0, const std::string& signal_spec = DEFAULT_SIGNAL);
+
+    // Returns the schedule: the index of the DSP run by each block, in order
+    std::vector<int> run(const std::vector<self_measuring_dsp*>& dsps);
+};
+
+#endif
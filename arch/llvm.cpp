@@ -0,0 +1,105 @@
+#include <chrono>
+#include <filesystem>
+#include <format>
+#include <iostream>
+
+#include <unistd.h>
+
+#include <faust/dsp/libfaust.h>
+
+#include "llvm.h"
+
+// Optimization level of the LLVM backend, -1 being the highest one
+#define JIT_OPT_LEVEL -1
+
+static std::string fnv1a(const std::string& str)
+{
+    unsigned long long hash = 14695981039346656037ULL;
+    for (unsigned char c : str) {
+        hash ^= c;
+        hash *= 1099511628211ULL;
+    }
+    return std::format("{:016x}", hash);
+}
+
+static std::vector<const char*> faust_argv(const std::vector<std::string>& options)
+{
+    std::vector<const char*> argv;
+    for (const auto& option : options) {
+        argv.push_back(option.c_str());
+    }
+    return argv;
+}
+
+/*
+ * Expands the program with its imports, so that the key changes with the libraries it uses too.
+ * libfaust hashes the expanded source with the options.
+ */
+static std::string cache_path(const std::string& path, const std::vector<std::string>& options,
+                              const std::string& target, const std::string& cache_directory)
+{
+    auto        argv = faust_argv(options);
+    std::string sha_key;
+    std::string error;
+    expandDSPFromFile(path, argv.size(), argv.data(), sha_key, error);
+    if (sha_key.empty()) {
+        std::cerr << path << ": " << error << std::endl;
+        exit(1);
+    }
+
+    std::string key = sha_key + "-" + fnv1a(target + "\n" + getCLibFaustVersion());
+    return (std::filesystem::path(cache_directory) / (key + ".o")).string();
+}
+
+jit_dsp::jit_dsp(const std::string& path, const std::vector<std::string>& options,
+                 const std::string& cache_directory)
+    : decorator_dsp(nullptr), factory(nullptr), cached(false)
+{
+    auto        start  = std::chrono::steady_clock::now();
+    std::string target = getDSPMachineTarget();
+    std::string error;
+
+    std::string machine_path;
+    if (!cache_directory.empty()) {
+        machine_path = cache_path(path, options, target, cache_directory);
+        if (std::filesystem::exists(machine_path)) {
+            factory = readDSPFactoryFromMachineFile(machine_path, target, error);
+            cached  = factory != nullptr;
+        }
+    }
+
+    if (factory == nullptr) {
+        auto argv = faust_argv(options);
+        factory   = createDSPFactoryFromFile(path, argv.size(), argv.data(), target, error,
+                                             JIT_OPT_LEVEL);
+        if (factory == nullptr) {
+            std::cerr << path << ": " << error << std::endl;
+            exit(1);
+        }
+
+        // Concurrent runs may compile the same factory: write it atomically
+        if (!machine_path.empty()) {
+            std::error_code ec;
+            std::filesystem::create_directories(cache_directory, ec);
+            std::string tmp_path = machine_path + "." + std::to_string(getpid()) + ".tmp";
+            if (writeDSPFactoryToMachineFile(factory, tmp_path, target)) {
+                std::filesystem::rename(tmp_path, machine_path, ec);
+            }
+            std::filesystem::remove(tmp_path, ec);
+        }
+    }
+
+    fDSP         = factory->createDSPInstance();
+    compile_time = std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() -
+                                                             start)
+                       .count();
+}
+
+jit_dsp::~jit_dsp()
+{
+    // The instance must be deleted before its factory
+    delete fDSP;
+    fDSP = nullptr;
+
+    deleteDSPFactory(factory);
+}
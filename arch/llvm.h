@@ -0,0 +1,31 @@
+#ifndef __FCSCHEDTOOL_LLVM_H__
+#define __FCSCHEDTOOL_LLVM_H__
+
+#include <string>
+#include <vector>
+
+#include <faust/dsp/llvm-dsp.h>
+
+/*
+ * A FAUST program compiled in memory by libfaust's LLVM backend, with the given FAUST options.
+ * Compiled factories are cached as machine code files, keyed by the expanded source and options,
+ * the target and the libfaust version, so that each variant is only compiled once.
+ */
+class jit_dsp : public decorator_dsp {
+    llvm_dsp_factory* factory;
+    bool              cached;
+    double            compile_time;
+
+   public:
+    jit_dsp(const std::string& path, const std::vector<std::string>& options,
+            const std::string& cache_directory);
+    ~jit_dsp();
+
+    // True if the factory was read from the cache rather than compiled
+    bool is_cached() const { return cached; }
+
+    // Time spent compiling or reading the factory, in milliseconds
+    double get_compile_time() const { return compile_time; }
+};
+
+#endif
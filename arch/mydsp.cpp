@@ -45,4 +45,40 @@ dsp* create_dsp()
 {
     return new mydsp();
 }
+
+/*
+ * Wrappers around the virtual methods of the DSP, for callers that cannot use the C++ ABI, such as
+ * the in-process test runner (ctypes).
+ */
+
+void delete_dsp(dsp* d)
+{
+    delete d;
+}
+
+int dsp_get_num_inputs(dsp* d)
+{
+    return d->getNumInputs();
+}
+
+int dsp_get_num_outputs(dsp* d)
+{
+    return d->getNumOutputs();
+}
+
+void dsp_init(dsp* d, int sample_rate)
+{
+    d->init(sample_rate);
+}
+
+void dsp_build_user_interface(dsp* d)
+{
+    UI ui;
+    d->buildUserInterface(&ui);
+}
+
+void dsp_compute(dsp* d, int count, FAUSTFLOAT** inputs, FAUSTFLOAT** outputs)
+{
+    d->compute(count, inputs, outputs);
+}
 }
@@ -0,0 +1,35 @@
+#ifndef __FCSCHEDTOOL_NULL_DSP_H__
+#define __FCSCHEDTOOL_NULL_DSP_H__
+
+#include <faust/dsp/dsp.h>
+
+/*
+ * A DSP that does nothing, with the inputs and outputs of another one. Measuring it measures the
+ * overhead of the measures themselves.
+ */
+class null_dsp : public dsp {
+    int num_inputs;
+    int num_outputs;
+    int sample_rate = 0;
+
+   public:
+    null_dsp(int num_inputs, int num_outputs) : num_inputs(num_inputs), num_outputs(num_outputs) {}
+
+    int  getNumInputs() override { return num_inputs; }
+    int  getNumOutputs() override { return num_outputs; }
+    void buildUserInterface(UI* ui_interface) override {}
+    int  getSampleRate() override { return sample_rate; }
+
+    void init(int sample_rate) override { instanceInit(sample_rate); }
+    void instanceInit(int sample_rate) override { instanceConstants(sample_rate); }
+    void instanceConstants(int sample_rate) override { this->sample_rate = sample_rate; }
+    void instanceResetUserInterface() override {}
+    void instanceClear() override {}
+
+    null_dsp* clone() override { return new null_dsp(num_inputs, num_outputs); }
+    void      metadata(Meta* m) override {}
+
+    void compute(int count, FAUSTFLOAT** inputs, FAUSTFLOAT** outputs) override {}
+};
+
+#endif
@@ -0,0 +1,66 @@
+#include <fstream>
+#include <sstream>
+#include <string>
+#include <thread>
+
+#include <sys/mman.h>
+#include <unistd.h>
+
+#include "perf_user.h"
+
+perf_event_mmap_page* perf_user_map(int fd)
+{
+    void* addr = mmap(nullptr, sysconf(_SC_PAGESIZE), PROT_READ, MAP_SHARED, fd, 0);
+    if (addr == MAP_FAILED) {
+        return nullptr;
+    }
+
+    auto* page = static_cast<perf_event_mmap_page*>(addr);
+    if (!page->cap_user_rdpmc) {
+        perf_user_unmap(page);
+        return nullptr;
+    }
+    return page;
+}
+
+void perf_user_unmap(perf_event_mmap_page* page)
+{
+    munmap(page, sysconf(_SC_PAGESIZE));
+}
+
+static bool has_invariant_tsc()
+{
+#ifdef PERF_USER_X86
+    std::ifstream cpuinfo("/proc/cpuinfo");
+    std::string   line;
+    while (std::getline(cpuinfo, line)) {
+        if (line.rfind("flags", 0) == 0) {
+            std::istringstream flags(line);
+            std::string        flag;
+            bool               constant = false, nonstop = false;
+            while (flags >> flag) {
+                constant |= flag == "constant_tsc";
+                nonstop |= flag == "nonstop_tsc";
+            }
+            return constant && nonstop;
+        }
+    }
+#endif
+    return false;
+}
+
+cycle_timer::cycle_timer() : use_tsc(has_invariant_tsc())
+{
+    if (!use_tsc) {
+        return;
+    }
+
+    auto     start       = std::chrono::steady_clock::now();
+    uint64_t start_ticks = now();
+    std::this_thread::sleep_for(std::chrono::milliseconds(20));
+    auto     end       = std::chrono::steady_clock::now();
+    uint64_t end_ticks = now();
+
+    std::chrono::nanoseconds elapsed = end - start;
+    nanoseconds_per_tick             = (double)elapsed.count() / (end_ticks - start_ticks);
+}
@@ -0,0 +1,125 @@
+#ifndef __FCSCHEDTOOL_PERF_USER_H__
+#define __FCSCHEDTOOL_PERF_USER_H__
+
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+
+#include <linux/perf_event.h>
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#define PERF_USER_X86 1
+#endif
+
+/*
+ * Counter and time reads from user space, without syscalls.
+ *
+ * The kernel exposes the state of each perf event in a page that can be mapped by the process. When
+ * the event is scheduled on a hardware counter and the kernel allows it, the count is the offset
+ * stored in the page plus the value read with rdpmc. The page is protected by a sequence lock, as
+ * the kernel may move the event to another counter at any time.
+ */
+
+// Maps the user page of a perf event. Returns nullptr if rdpmc is not allowed for this event.
+perf_event_mmap_page* perf_user_map(int fd);
+void                  perf_user_unmap(perf_event_mmap_page* page);
+
+#ifdef PERF_USER_X86
+static inline uint64_t perf_user_rdpmc(uint32_t counter)
+{
+    uint32_t low, high;
+    asm volatile("rdpmc" : "=a"(low), "=d"(high) : "c"(counter));
+    return low | ((uint64_t)high << 32);
+}
+#endif
+
+// Reads the count of an enabled event. Returns false when it must be read with read() instead,
+// e.g. when the event is not currently scheduled on a counter.
+static inline bool perf_user_read(const volatile perf_event_mmap_page* page, long long* value)
+{
+#ifdef PERF_USER_X86
+    uint32_t sequence;
+    int64_t  count;
+
+    do {
+        sequence = page->lock;
+        std::atomic_signal_fence(std::memory_order_seq_cst);
+
+        uint32_t index = page->index;
+        if (!page->cap_user_rdpmc || index == 0) {
+            return false;
+        }
+
+        // The counter is pmc_width bits wide: sign-extend it
+        int     shift = 64 - page->pmc_width;
+        int64_t pmc   = (int64_t)(perf_user_rdpmc(index - 1) << shift) >> shift;
+        count         = page->offset + pmc;
+
+        std::atomic_signal_fence(std::memory_order_seq_cst);
+    } while (page->lock != sequence);
+
+    *value = count;
+    return true;
+#else
+    return false;
+#endif
+}
+
+// Returns the time an event was enabled but not counting, because it was not scheduled on the PMU.
+// It only changes when the event is scheduled out and in again, i.e. multiplexed.
+static inline uint64_t perf_user_lost_time(const volatile perf_event_mmap_page* page)
+{
+    uint32_t sequence;
+    uint64_t lost;
+
+    do {
+        sequence = page->lock;
+        std::atomic_signal_fence(std::memory_order_seq_cst);
+        lost = page->time_enabled - page->time_running;
+        std::atomic_signal_fence(std::memory_order_seq_cst);
+    } while (page->lock != sequence);
+
+    return lost;
+}
+
+/*
+ * A timer reading the time stamp counter when it is invariant (constant rate, and not stopped in
+ * idle states), and std::chrono::steady_clock otherwise. The counter frequency is calibrated
+ * against steady_clock when the timer is created.
+ */
+class cycle_timer {
+    bool   use_tsc;
+    double nanoseconds_per_tick = 1;
+
+   public:
+    cycle_timer();
+
+    bool is_tsc() const { return use_tsc; }
+
+    inline uint64_t now() const
+    {
+#ifdef PERF_USER_X86
+        if (use_tsc) {
+            // Do not let the timed code move across the timestamps
+            _mm_lfence();
+            uint64_t ticks = __rdtsc();
+            _mm_lfence();
+            return ticks;
+        }
+#endif
+        return std::chrono::steady_clock::now().time_since_epoch().count();
+    }
+
+    inline long long nanoseconds(uint64_t start, uint64_t end) const
+    {
+        if (use_tsc) {
+            return (long long)((end - start) * nanoseconds_per_tick);
+        }
+        return std::chrono::duration_cast<std::chrono::nanoseconds>(
+                   std::chrono::steady_clock::duration(end - start))
+            .count();
+    }
+};
+
+#endif
@@ -1,3 +1,5 @@
+#include <algorithm>
+#include <cerrno>
 #include <cstring>
 #include <iostream>
 
@@ -36,22 +38,103 @@ void pfm_utils_parse_events(const char* arg, std::vector<std::string>& events)
     events.emplace_back(event);
 }
 
-int pfm_utils_open_named_event(const char* str, int group_fd)
+static void encode_event(const char* str, perf_event_attr& attr)
 {
-    int                   ret;
-    perf_event_attr       attr = {.size = sizeof(perf_event_attr)};
-    pfm_perf_encode_arg_t arg  = {.attr = &attr, .size = sizeof(pfm_perf_encode_arg_t)};
+    pfm_perf_encode_arg_t arg = {.attr = &attr, .size = sizeof(pfm_perf_encode_arg_t)};
 
-    ret = pfm_get_os_event_encoding(str, PFM_PLM3, PFM_OS_PERF_EVENT_EXT, &arg);
+    int ret = pfm_get_os_event_encoding(str, PFM_PLM3, PFM_OS_PERF_EVENT_EXT, &arg);
     if (ret != PFM_SUCCESS) {
         std::cerr << "Error opening event " << str << ": " << pfm_strerror(ret) << std::endl;
         pfm_terminate();
         exit(ret);
     }
+}
+
+int pfm_utils_open_named_event(const char* str, int group_fd)
+{
+    perf_event_attr attr = {.size = sizeof(perf_event_attr)};
+    encode_event(str, attr);
 
     attr.disabled       = 1;
     attr.exclude_kernel = 1;
     attr.exclude_hv     = 1;
+    attr.read_format =
+        PERF_FORMAT_GROUP | PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING;
+
+    int fd = syscall(SYS_perf_event_open, &attr, 0, -1, group_fd, 0);
+    if (fd < 0) {
+        std::cerr << "Error opening event " << str << ": " << strerror(errno) << std::endl;
+        pfm_terminate();
+        exit(1);
+    }
+    return fd;
+}
+
+pfm_utils_counters pfm_utils_get_counters()
+{
+    pfm_utils_counters counters = {0, 0};
+    bool               found    = false;
+
+    for (int pmu = PFM_PMU_NONE; pmu < PFM_PMU_MAX; pmu++) {
+        pfm_pmu_info_t info = {.size = sizeof(pfm_pmu_info_t)};
+        if (pfm_get_pmu_info((pfm_pmu_t)pmu, &info) != PFM_SUCCESS || !info.is_present ||
+            info.type != PFM_PMU_TYPE_CORE) {
+            continue;
+        }
+
+        if (found) {
+            counters.general = std::min(counters.general, info.num_cntrs);
+            counters.fixed   = std::min(counters.fixed, info.num_fixed_cntrs);
+        } else {
+            counters = {info.num_cntrs, info.num_fixed_cntrs};
+            found    = true;
+        }
+    }
+
+    if (!found || counters.general <= 0) {
+        return {PFM_UTILS_DEFAULT_COUNTERS, 0};
+    }
+    return counters;
+}
+
+bool pfm_utils_is_fixed_event(const char* str)
+{
+    perf_event_attr attr = {.size = sizeof(perf_event_attr)};
+    encode_event(str, attr);
+
+    if (attr.type == PERF_TYPE_HARDWARE) {
+        return attr.config == PERF_COUNT_HW_CPU_CYCLES ||
+               attr.config == PERF_COUNT_HW_INSTRUCTIONS ||
+               attr.config == PERF_COUNT_HW_REF_CPU_CYCLES;
+    }
+
+    // Intel architectural events: INST_RETIRED.ANY, CPU_CLK_UNHALTED.THREAD and
+    // CPU_CLK_UNHALTED.REF_TSC, without modifiers
+    if (attr.type == PERF_TYPE_RAW) {
+        uint64_t code = attr.config & 0xffffffff;
+        return code == 0x00c0 || code == 0x003c || code == 0x0300;
+    }
+
+    return false;
+}
+
+bool pfm_utils_group_fits(int group_fd, int nb_events)
+{
+    std::vector<uint64_t> values(PFM_UTILS_READ_HEADER + nb_events);
+
+    ioctl(group_fd, PERF_EVENT_IOC_RESET, PERF_IOC_FLAG_GROUP);
+    ioctl(group_fd, PERF_EVENT_IOC_ENABLE, PERF_IOC_FLAG_GROUP);
+    volatile uint64_t sum = 0;
+    for (int i = 0; i < 1000000; i++) {
+        sum = sum + i;
+    }
+    ioctl(group_fd, PERF_EVENT_IOC_DISABLE, PERF_IOC_FLAG_GROUP);
+
+    if (read(group_fd, values.data(), values.size() * sizeof(uint64_t)) <= 0) {
+        return false;
+    }
 
-    return syscall(SYS_perf_event_open, &attr, 0, -1, group_fd, 0);
+    uint64_t time_enabled = values[1];
+    uint64_t time_running = values[2];
+    return time_running > 0 && time_running == time_enabled;
 }
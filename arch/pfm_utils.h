@@ -1,13 +1,41 @@
 #ifndef __FCSCHEDTOOL_PFM_UTILS_H__
 #define __FCSCHEDTOOL_PFM_UTILS_H__
 
+#include <cstdint>
 #include <string>
 #include <vector>
 
+/*
+ * Number of counters to assume when libpfm does not know the core PMU.
+ */
+#define PFM_UTILS_DEFAULT_COUNTERS 4
+
+/*
+ * Events are opened with PERF_FORMAT_GROUP and the total enabled and running times, so that a
+ * read() of any event of a group returns, as uint64_t:
+ *
+ *     nr, time_enabled, time_running, values[nr]
+ */
+#define PFM_UTILS_READ_HEADER 3
+
+struct pfm_utils_counters {
+    int general;  // General-purpose counters, for any event
+    int fixed;    // Fixed counters, each for a single event such as cycles or instructions
+};
+
 void pfm_utils_initialize();
 void pfm_utils_terminate();
 
 void pfm_utils_parse_events(const char* arg, std::vector<std::string>& events);
 int  pfm_utils_open_named_event(const char* str, int group_fd);
 
+// Counters of the core PMU, the smallest ones if there are several (hybrid CPUs)
+pfm_utils_counters pfm_utils_get_counters();
+
+// True if the event may be counted by a fixed counter
+bool pfm_utils_is_fixed_event(const char* str);
+
+// Enables a group for a short while, and returns true if it was scheduled on the PMU all along
+bool pfm_utils_group_fits(int group_fd, int nb_events);
+
 #endif
@@ -0,0 +1,343 @@
+#include <algorithm>
+#include <cmath>
+#include <iostream>
+#include <utility>
+
+#include "poly.h"
+
+namespace {
+
+// Forwards a UI to another, leaving out some controls
+struct filtered_ui : UI {
+    UI*                      target;
+    std::vector<FAUSTFLOAT*> excluded;
+
+    filtered_ui(UI* target, std::vector<FAUSTFLOAT*> excluded)
+        : target(target), excluded(std::move(excluded))
+    {
+    }
+
+    bool is_excluded(FAUSTFLOAT* zone) const
+    {
+        return std::find(excluded.begin(), excluded.end(), zone) != excluded.end();
+    }
+
+    void openTabBox(const char* label) override { target->openTabBox(label); }
+    void openHorizontalBox(const char* label) override { target->openHorizontalBox(label); }
+    void openVerticalBox(const char* label) override { target->openVerticalBox(label); }
+    void closeBox() override { target->closeBox(); }
+
+    void addButton(const char* label, FAUSTFLOAT* zone) override
+    {
+        if (!is_excluded(zone)) {
+            target->addButton(label, zone);
+        }
+    }
+
+    void addCheckButton(const char* label, FAUSTFLOAT* zone) override
+    {
+        if (!is_excluded(zone)) {
+            target->addCheckButton(label, zone);
+        }
+    }
+
+    void addVerticalSlider(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init, FAUSTFLOAT min,
+                           FAUSTFLOAT max, FAUSTFLOAT step) override
+    {
+        if (!is_excluded(zone)) {
+            target->addVerticalSlider(label, zone, init, min, max, step);
+        }
+    }
+
+    void addHorizontalSlider(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init,
+                             FAUSTFLOAT min, FAUSTFLOAT max, FAUSTFLOAT step) override
+    {
+        if (!is_excluded(zone)) {
+            target->addHorizontalSlider(label, zone, init, min, max, step);
+        }
+    }
+
+    void addNumEntry(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init, FAUSTFLOAT min,
+                     FAUSTFLOAT max, FAUSTFLOAT step) override
+    {
+        if (!is_excluded(zone)) {
+            target->addNumEntry(label, zone, init, min, max, step);
+        }
+    }
+
+    void addHorizontalBargraph(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT min,
+                               FAUSTFLOAT max) override
+    {
+        target->addHorizontalBargraph(label, zone, min, max);
+    }
+
+    void addVerticalBargraph(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT min,
+                             FAUSTFLOAT max) override
+    {
+        target->addVerticalBargraph(label, zone, min, max);
+    }
+
+    void addSoundfile(const char* label, const char* filename, Soundfile** sf_zone) override
+    {
+        target->addSoundfile(label, filename, sf_zone);
+    }
+
+    void declare(FAUSTFLOAT* zone, const char* key, const char* value) override
+    {
+        target->declare(zone, key, value);
+    }
+};
+
+}  // namespace
+
+poly_dsp::poly_dsp(dsp* program, int nvoices) : decorator_dsp(program)
+{
+    for (int i = 0; i < nvoices; i++) {
+        voice v;
+        v.program = i == 0 ? program : program->clone();
+
+        UI ui;
+        v.program->buildUserInterface(&ui);
+        auto find = [&](const char* name) {
+            const parameter* p = ui.find(name);
+            return p != nullptr ? p->zone : nullptr;
+        };
+        v.freq     = find("freq");
+        v.key      = find("key");
+        v.gain     = find("gain");
+        v.velocity = find("vel") != nullptr ? find("vel") : find("velocity");
+        v.gate     = find("gate");
+        if (v.gate == nullptr) {
+            std::cerr << "Polyphonic programs need a gate control" << std::endl;
+            exit(1);
+        }
+
+        for (const auto& p : ui.get_parameters()) {
+            if (!p.is_output && p.zone != v.freq && p.zone != v.key && p.zone != v.gain &&
+                p.zone != v.velocity && p.zone != v.gate) {
+                v.controls.push_back(p.zone);
+            }
+        }
+
+        // The UI presses gate buttons: voices are silent until they get a note
+        *v.gate = 0;
+        voices.push_back(v);
+    }
+}
+
+poly_dsp::~poly_dsp()
+{
+    // The first voice is deleted by decorator_dsp::~decorator_dsp()
+    for (int i = 1; i < voices.size(); i++) {
+        delete voices[i].program;
+    }
+}
+
+void poly_dsp::set_note(voice& v, int pitch, int velocity)
+{
+    if (v.freq != nullptr) {
+        *v.freq = 440.0f * powf(2.0f, (pitch - 69) / 12.0f);
+    }
+    if (v.key != nullptr) {
+        *v.key = pitch;
+    }
+    if (v.gain != nullptr) {
+        *v.gain = velocity / 127.0f;
+    }
+    if (v.velocity != nullptr) {
+        *v.velocity = velocity;
+    }
+}
+
+int poly_dsp::key_on(int note, int pitch, int velocity)
+{
+    // A free voice, or else the voice released the longest ago, or else the one started the
+    // longest ago
+    int chosen = -1;
+    for (voice_state state : {voice_state::FREE, voice_state::RELEASED, voice_state::PLAYING}) {
+        for (int i = 0; i < voices.size(); i++) {
+            if (voices[i].state == state &&
+                (chosen < 0 || voices[i].date < voices[chosen].date)) {
+                chosen = i;
+            }
+        }
+        if (chosen >= 0) {
+            break;
+        }
+    }
+
+    voice& v = voices[chosen];
+    set_note(v, pitch, velocity);
+    *v.gate = 1;
+    v.state = voice_state::PLAYING;
+    v.note  = note;
+    v.date  = ++date;
+    return chosen;
+}
+
+void poly_dsp::key_off(int voice, int note)
+{
+    poly_dsp::voice& v = voices[voice];
+    if (v.state == voice_state::PLAYING && v.note == note) {
+        *v.gate = 0;
+        v.state = voice_state::RELEASED;
+        v.date  = ++date;
+    }
+}
+
+void poly_dsp::key_on_all()
+{
+    for (int i = 0; i < voices.size(); i++) {
+        key_on(-1 - i, 36 + i * 7 % 61, 100);
+    }
+}
+
+void poly_dsp::sync_controls()
+{
+    for (int i = 1; i < voices.size(); i++) {
+        for (int c = 0; c < voices[0].controls.size(); c++) {
+            *voices[i].controls[c] = *voices[0].controls[c];
+        }
+    }
+}
+
+void poly_dsp::buildUserInterface(UI* ui_interface)
+{
+    // Note controls are left out, so that the UI does not press the gate of the first voice, and
+    // controls cannot be set on them
+    const voice& v = voices[0];
+    filtered_ui ui(ui_interface, {v.freq, v.key, v.gain, v.velocity, v.gate});
+    fDSP->buildUserInterface(&ui);
+}
+
+void poly_dsp::init(int sample_rate)
+{
+    for (auto& v : voices) {
+        v.program->init(sample_rate);
+        *v.gate = 0;
+        v.state = voice_state::FREE;
+    }
+}
+
+void poly_dsp::instanceInit(int sample_rate)
+{
+    for (auto& v : voices) {
+        v.program->instanceInit(sample_rate);
+        *v.gate = 0;
+        v.state = voice_state::FREE;
+    }
+}
+
+void poly_dsp::instanceClear()
+{
+    for (auto& v : voices) {
+        v.program->instanceClear();
+    }
+}
+
+poly_dsp* poly_dsp::clone()
+{
+    return new poly_dsp(fDSP->clone(), voices.size());
+}
+
+void poly_dsp::compute(int count, FAUSTFLOAT** inputs, FAUSTFLOAT** outputs)
+{
+    int num_outputs = fDSP->getNumOutputs();
+    if (voice_buffers.empty() || voice_buffers[0].size() < count) {
+        voice_buffers.assign(num_outputs, std::vector<FAUSTFLOAT>(count));
+        voice_outputs.clear();
+        for (auto& buffer : voice_buffers) {
+            voice_outputs.push_back(buffer.data());
+        }
+    }
+
+    for (int ch = 0; ch < num_outputs; ch++) {
+        std::fill(outputs[ch], outputs[ch] + count, 0.0f);
+    }
+
+    // Controls of the first voice are set, e.g. by automation, right before compute
+    sync_controls();
+
+    active = 0;
+    for (auto& v : voices) {
+        if (v.state == voice_state::FREE) {
+            continue;
+        }
+        active++;
+
+        v.program->compute(count, inputs, voice_outputs.data());
+
+        FAUSTFLOAT level = 0;
+        for (int ch = 0; ch < num_outputs; ch++) {
+            for (int s = 0; s < count; s++) {
+                outputs[ch][s] += voice_outputs[ch][s];
+                level = std::max(level, std::fabs(voice_outputs[ch][s]));
+            }
+        }
+        if (v.state == voice_state::RELEASED && level < VOICE_STOP_LEVEL) {
+            v.state = voice_state::FREE;
+        }
+    }
+}
+
+poly_dsp_runner::poly_dsp_runner(int sample_rate, int buffer_size,
+                                 const std::string& signal_spec)
+    : basic_dsp_runner(sample_rate, buffer_size, signal_spec)
+{
+}
+
+void poly_dsp_runner::run(self_measuring_dsp& d)
+{
+    auto* poly = dynamic_cast<poly_dsp*>(d.get_program());
+    if (poly == nullptr) {
+        basic_dsp_runner::run(d);
+        return;
+    }
+
+    d.init(sample_rate);
+
+    // Create the input and output buffers
+    cycle_buffers buffers(d.getNumInputs(), d.getNumOutputs(), buffer_size, signal);
+
+    const cycle_timer& timer   = d.get_timer();
+    int                nvoices = poly->get_voice_count();
+    auto               start   = [&](int note) { return (long long)note * NOTE_LENGTH / nvoices; };
+
+    std::deque<std::pair<int, int>> held;  // Notes held, with their voice
+    int                             next_note = 0;
+
+    long long allocation_time = 0;
+    long long note_events     = 0;
+    long long active_voices   = 0;
+    long long computes        = 0;
+
+    while (!d.end_reached()) {
+        int it = d.get_current_iteration();
+
+        bool off_due = !held.empty() && start(held.front().first) + NOTE_LENGTH - 1 <= it;
+        if (off_due || start(next_note) <= it) {
+            uint64_t begin = timer.now();
+            while (!held.empty() && start(held.front().first) + NOTE_LENGTH - 1 <= it) {
+                poly->key_off(held.front().second, held.front().first);
+                held.pop_front();
+                note_events++;
+            }
+            while (start(next_note) <= it) {
+                // Pitches walk by fifths over 5 octaves, velocities vary from 64 to 127
+                int voice = poly->key_on(next_note, 36 + next_note * 7 % 61,
+                                         64 + next_note * 37 % 64);
+                held.emplace_back(next_note++, voice);
+                note_events++;
+            }
+            allocation_time += timer.nanoseconds(begin, timer.now());
+        }
+        d.compute(buffer_size, buffers.get_inputs(it), buffers.get_outputs(it));
+        active_voices += poly->get_active_voices();
+        computes++;
+    }
+
+    d.set_metadata("poly:voices", std::to_string(nvoices));
+    d.set_metadata("poly:active_voices", std::to_string((double)active_voices / computes));
+    d.set_metadata("poly:note_events", std::to_string(note_events));
+    d.set_metadata("poly:allocation_time(ns)", std::to_string(allocation_time));
+}
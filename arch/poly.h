@@ -0,0 +1,104 @@
+#ifndef __FCSCHEDTOOL_POLY_H__
+#define __FCSCHEDTOOL_POLY_H__
+
+#include <deque>
+#include <vector>
+
+#include "basic.h"
+#include "ui.h"
+
+// Released voices stop once a buffer of their outputs stays below this level, -66 dB as in FAUST
+#define VOICE_STOP_LEVEL 0.0005
+
+// Loops each note of the schedule is held for
+#define NOTE_LENGTH 64
+
+enum class voice_state {
+    FREE,
+    PLAYING,
+    RELEASED,
+};
+
+/*
+ * A polyphonic instrument made of voices, instances of a program with freq (or key), gain (or
+ * vel, velocity) and gate controls, in the manner of FAUST's mydsp_poly. Notes go to a free voice,
+ * or else steal the voice released or started the longest ago. Every playing or released voice is
+ * computed and mixed into the outputs.
+ *
+ * The UI of the instrument is the one of its first voice without its note controls, which only
+ * notes set: other controls of the first voice are copied to every voice before each compute.
+ */
+class poly_dsp : public decorator_dsp {
+    struct voice {
+        dsp*        program;
+        FAUSTFLOAT* freq;
+        FAUSTFLOAT* key;
+        FAUSTFLOAT* gain;
+        FAUSTFLOAT* velocity;
+        FAUSTFLOAT* gate;
+
+        std::vector<FAUSTFLOAT*> controls;  // Other controls, in the order of the UI
+
+        voice_state state = voice_state::FREE;
+        int         note  = -1;
+        long long   date  = 0;  // When the voice was last started or released
+    };
+
+    std::vector<voice> voices;
+    long long          date   = 0;
+    int                active = 0;
+
+    // Outputs of a voice, before they are mixed
+    std::vector<std::vector<FAUSTFLOAT>> voice_buffers;
+    std::vector<FAUSTFLOAT*>             voice_outputs;
+
+    void set_note(voice& v, int pitch, int velocity);
+
+   public:
+    // Takes ownership of program, which becomes the first voice
+    poly_dsp(dsp* program, int nvoices);
+    ~poly_dsp();
+
+    int get_voice_count() const { return voices.size(); }
+
+    // Voices computed by the last compute
+    int get_active_voices() const { return active; }
+
+    // Starts a note, and returns the voice playing it
+    int key_on(int note, int pitch, int velocity);
+
+    // Releases the note played by a voice, unless the voice was stolen by another note since
+    void key_off(int voice, int note);
+
+    // Starts a note on every voice, e.g. to warm up every voice before init frees them
+    void key_on_all();
+
+    // Copies the controls of the first voice, other than the note controls, to every voice, as
+    // compute does first
+    void sync_controls();
+
+    void buildUserInterface(UI* ui_interface) override;
+    void init(int sample_rate) override;
+    void instanceInit(int sample_rate) override;
+    void instanceClear() override;
+    poly_dsp* clone() override;
+
+    void compute(int count, FAUSTFLOAT** inputs, FAUSTFLOAT** outputs) override;
+};
+
+/*
+ * Runs a polyphonic instrument like basic_dsp_runner, playing a deterministic schedule of notes:
+ * a note starts every NOTE_LENGTH / voices loops and is held for NOTE_LENGTH - 1 loops, so that
+ * about as many voices as the instrument has are active. Starting and releasing notes happens
+ * between loops, and is timed apart from the measures of the instrument. Other programs run as
+ * with basic_dsp_runner.
+ */
+class poly_dsp_runner : public basic_dsp_runner {
+   public:
+    poly_dsp_runner(int sample_rate, int buffer_size,
+                    const std::string& signal_spec = DEFAULT_SIGNAL);
+
+    virtual void run(self_measuring_dsp& d) override;
+};
+
+#endif
@@ -26,15 +26,11 @@ int main(int argc, char* argv[])
     UI ui;
     d.buildUserInterface(&ui);
 
-    srand(0xABCD);
-
-    // Create the input buffers
+    // Create the input buffers, an impulse in every input, as fcschedtool feeds in process
     float* inputs[256];
     for (int i = 0; i < d.getNumInputs(); i++) {
-        inputs[i] = new float[NBSAMPLES];
-        for (int j = 0; j < NBSAMPLES; j++) {
-            inputs[i][j] = -1 + 2 * (rand() / (float)RAND_MAX);
-        }
+        inputs[i] = new float[NBSAMPLES]();
+        inputs[i][0] = 1;
     }
 
     // Create the output buffers
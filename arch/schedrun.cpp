@@ -1,19 +1,30 @@
+#include <format>
 #include <fstream>
 #include <iostream>
-#include <optional>
 
 #include <getopt.h>
+#include <sched.h>
 
 #include "alsa.h"
 #include "basic.h"
+#include "concurrent.h"
+#include "controls.h"
 #include "dsp_measuring.h"
+#include "interleaved.h"
 #include "jack.h"
+#include "load.h"
+#include "null_dsp.h"
+#include "poly.h"
+#ifdef FCSCHED_JIT
+#include "llvm.h"
+#endif
 #include "pfm_utils.h"
 #include "ui.h"
 
 #define SAMPLE_RATE 44100
 #define NBSAMPLES 256
 #define NBITERATIONS 1000
+#define NBMINITERATIONS 100
 
 enum run_type {
     BASIC,
@@ -24,8 +35,108 @@ enum run_type {
 static void print_usage(int argc, char* argv[])
 {
     std::cerr << "Usage: " << argv[0]
-              << " [-o output] [-e events] [-n number_of_loops] [-b buffer_size]"
-              << " program1.so [program2.so ...]" << std::endl;
+              << " [-o output1 [-o output2 ...]] [-e events] [-n number_of_loops]"
+              << " [-b buffer_size] [-s sample_rate] [-p precision [-m min_loops]] [--overhead]"
+              << " [--streaming [--trace-rows rows]] [--interleave block_size | --instances n]"
+              << " [--jit [--jit-cache directory]] [--signal signal] [--param control=value ...]"
+              << " [--automation script] [--voices n] [--] program1.so [program2.so ...]"
+              << std::endl;
+    std::cerr << "When outputs are given, the measures of the n-th program are written to the "
+                 "n-th output."
+              << std::endl;
+    std::cerr << "Raw measures are written in binary to output files, and as CSV to the standard "
+                 "output or when --csv is given."
+              << std::endl;
+    std::cerr << "With -p, programs stop running once the relative confidence interval of their "
+                 "time quantile is below precision, after at least min_loops and at most "
+                 "number_of_loops loops."
+              << std::endl;
+    std::cerr << "With --overhead, an empty DSP is measured after each program in the same way, "
+                 "and the quantiles of its measures are recorded as overhead metadata."
+              << std::endl;
+    std::cerr << "Counters are read with rdpmc when the kernel allows it, or with syscalls when "
+                 "--syscalls is given."
+              << std::endl;
+    std::cerr << "Counts of event groups that were multiplexed are scaled, or measured again when "
+                 "--reject-multiplexed is given."
+              << std::endl;
+    std::cerr << "With --streaming, only summaries of the measures are kept, with a trace of at "
+                 "most rows measures, so that memory does not grow with the number of loops."
+              << std::endl;
+    std::cerr << "With --interleave, all programs are loaded at once and run in rounds of blocks "
+                 "of block_size loops, in a random order every round."
+              << std::endl;
+    std::cerr << "With --instances, n instances of the programs, taken round-robin, run at the "
+                 "same time on threads pinned to the CPUs schedrun may run on, with one output per "
+                 "instance."
+              << std::endl;
+    std::cerr << "With --jit, programs are FAUST sources each followed by its FAUST options, "
+                 "e.g. -- a.dsp -ss 3 b.dsp -vec, compiled in memory by libfaust, and cached as "
+                 "machine code in the --jit-cache directory."
+              << std::endl;
+    std::cerr << "The basic backend feeds programs with the --signal input: noise (default), "
+                 "silence, impulse[:period], sweep or file:path to a WAV or raw float file."
+              << std::endl;
+    std::cerr << "Controls are found by path, e.g. /reverb/damping, or by name. --param sets a "
+                 "control for the whole run, and --automation changes controls between loops as "
+                 "given by a script of \"loop control value\" lines."
+              << std::endl;
+    std::cerr << "With --voices, programs are polyphonic instruments of n voices, playing a "
+                 "schedule of notes that keeps about n voices active."
+              << std::endl;
+}
+
+/*
+ * Sets the controls given as control=value, and the automation script of a DSP if any, and records
+ * them in its metadata.
+ */
+static void set_controls(self_measuring_dsp& d, const UI& ui,
+                         const std::vector<std::string>& params,
+                         const std::string&              automation_path)
+{
+    auto controls = std::make_unique<dsp_controls>(ui);
+
+    std::string values;
+    for (const auto& param : params) {
+        const parameter& p = controls->set(ui, param);
+        values += (values.empty() ? "" : " ") + p.path + "=" + param.substr(param.rfind('=') + 1);
+    }
+    if (!values.empty()) {
+        d.set_metadata("parameters", values);
+    }
+
+    if (!automation_path.empty()) {
+        controls->load_script(ui, automation_path);
+        d.set_metadata("automation", automation_path);
+    }
+
+    d.set_controls(std::move(controls));
+}
+
+/*
+ * Measures a DSP doing nothing with the same inputs, outputs and events as d, in the same way, and
+ * records the quantile of each of its measures in the metadata of d as the measuring overhead. With
+ * a target precision, the empty DSP stops as d does, once its quantiles are precise enough.
+ */
+static void measure_overhead(self_measuring_dsp& d, dsp_runner& runner,
+                             const std::vector<std::string>& events, int nloops, int buffer_size,
+                             bool user_reads, bool streaming, double precision, int min_loops)
+{
+    self_measuring_dsp null(new null_dsp(d.getNumInputs(), d.getNumOutputs()), nloops);
+    null.set_user_reads(user_reads);
+    null.set_streaming(streaming, 0);
+    null.observe_events(events);
+    if (precision > 0) {
+        null.set_target_precision(precision, min_loops);
+    }
+    null.warmup(buffer_size, nloops / 10);
+
+    runner.run(null);
+    null.close_events();
+
+    for (const auto& [column, value] : null.get_quantiles(PRECISION_QUANTILE)) {
+        d.set_metadata("overhead:" + column, std::to_string(value));
+    }
 }
 
 int main(int argc, char* argv[])
@@ -35,11 +146,30 @@ int main(int argc, char* argv[])
     const char* optname;
 
     bool raw         = false;
+    bool csv         = false;
+    bool user_reads  = true;
+
+    bool reject_multiplexed = false;
+    bool streaming          = false;
+    int  trace_rows         = DEFAULT_TRACE_ROWS;
+    int  block_size         = 0;
+    int  instances          = 0;
+    int  voices             = 0;
+    bool jit                = false;
+    bool overhead           = false;
     int  buffer_size = NBSAMPLES;
+    int  sample_rate = SAMPLE_RATE;
     int  nloops      = NBITERATIONS;
 
-    std::optional<std::string> output_path;
-    std::vector<std::string>   events;
+    double precision = 0;
+    int    min_loops = NBMINITERATIONS;
+
+    std::vector<std::string> output_paths;
+    std::vector<std::string> events;
+    std::string              jit_cache;
+    std::string              signal = DEFAULT_SIGNAL;
+    std::vector<std::string> params;
+    std::string              automation_path;
 
     run_type                    rtype  = BASIC;
     std::unique_ptr<dsp_runner> runner = nullptr;
@@ -48,9 +178,24 @@ int main(int argc, char* argv[])
         {"basic", no_argument, 0, 0},
         {"alsa", no_argument, 0, 0},
         {"jack", no_argument, 0, 0},
+        {"csv", no_argument, 0, 0},
+        {"syscalls", no_argument, 0, 0},
+        {"reject-multiplexed", no_argument, 0, 0},
+        {"streaming", no_argument, 0, 0},
+        {"trace-rows", required_argument, 0, 0},
+        {"interleave", required_argument, 0, 0},
+        {"instances", required_argument, 0, 0},
+        {"voices", required_argument, 0, 0},
+        {"jit", no_argument, 0, 0},
+        {"jit-cache", required_argument, 0, 0},
+        {"signal", required_argument, 0, 0},
+        {"param", required_argument, 0, 0},
+        {"automation", required_argument, 0, 0},
+        {"overhead", no_argument, 0, 0},
+        {0, 0, 0, 0},
     };
 
-    while ((opt = getopt_long(argc, argv, "ro:e:n:b:", long_options, &option_index)) != -1) {
+    while ((opt = getopt_long(argc, argv, "ro:e:n:b:s:p:m:", long_options, &option_index)) != -1) {
         switch (opt) {
             case 0:
                 optname = long_options[option_index].name;
@@ -60,13 +205,41 @@ int main(int argc, char* argv[])
                     rtype = ALSA;
                 } else if (!strcmp(optname, "jack")) {
                     rtype = JACK;
+                } else if (!strcmp(optname, "csv")) {
+                    csv = true;
+                } else if (!strcmp(optname, "syscalls")) {
+                    user_reads = false;
+                } else if (!strcmp(optname, "reject-multiplexed")) {
+                    reject_multiplexed = true;
+                } else if (!strcmp(optname, "streaming")) {
+                    streaming = true;
+                } else if (!strcmp(optname, "trace-rows")) {
+                    trace_rows = atoi(optarg);
+                } else if (!strcmp(optname, "interleave")) {
+                    block_size = atoi(optarg);
+                } else if (!strcmp(optname, "instances")) {
+                    instances = atoi(optarg);
+                } else if (!strcmp(optname, "voices")) {
+                    voices = atoi(optarg);
+                } else if (!strcmp(optname, "jit")) {
+                    jit = true;
+                } else if (!strcmp(optname, "jit-cache")) {
+                    jit_cache = optarg;
+                } else if (!strcmp(optname, "signal")) {
+                    signal = optarg;
+                } else if (!strcmp(optname, "param")) {
+                    params.emplace_back(optarg);
+                } else if (!strcmp(optname, "automation")) {
+                    automation_path = optarg;
+                } else if (!strcmp(optname, "overhead")) {
+                    overhead = true;
                 }
                 break;
             case 'r':
                 raw = true;
                 break;
             case 'o':
-                output_path.emplace(optarg);
+                output_paths.emplace_back(optarg);
                 break;
             case 'e':
                 pfm_utils_parse_events(optarg, events);
@@ -77,69 +250,251 @@ int main(int argc, char* argv[])
             case 'b':
                 buffer_size = atoi(optarg);
                 break;
+            case 's':
+                sample_rate = atoi(optarg);
+                break;
+            case 'p':
+                precision = atof(optarg);
+                break;
+            case 'm':
+                min_loops = atoi(optarg);
+                break;
             default:
                 print_usage(argc, argv);
                 return 1;
         }
     }
 
-    if (nloops == 0) {
+    if (nloops == 0 || buffer_size <= 0 || sample_rate <= 0) {
         print_usage(argc, argv);
         return 1;
     }
 
-    if (output_path.has_value()) {
+    if (!output_paths.empty()) {
         raw = true;
     }
 
+    if ((block_size > 0 || instances > 0) && rtype != BASIC) {
+        std::cerr << "Only the basic backend can interleave programs or run instances concurrently"
+                  << std::endl;
+        return 1;
+    }
+
+#ifndef FCSCHED_JIT
+    if (jit) {
+        std::cerr << "schedrun was built without libfaust, rebuild it with make JIT=1" << std::endl;
+        return 1;
+    }
+#endif
+
+    if (voices > 0 && (rtype != BASIC || block_size > 0 || instances > 0)) {
+        std::cerr << "Polyphonic programs only run with the basic backend, one at a time"
+                  << std::endl;
+        return 1;
+    }
+
+    if (block_size > 0 && instances > 0) {
+        std::cerr << "Programs cannot be both interleaved and run concurrently" << std::endl;
+        return 1;
+    }
+
     switch (rtype) {
         case BASIC:
-            runner = std::make_unique<basic_dsp_runner>(SAMPLE_RATE, buffer_size);
+            if (voices > 0) {
+                runner = std::make_unique<poly_dsp_runner>(sample_rate, buffer_size, signal);
+            } else {
+                runner = std::make_unique<basic_dsp_runner>(sample_rate, buffer_size, signal);
+            }
             break;
         case ALSA:
-            runner = std::make_unique<alsa_dsp_runner>(SAMPLE_RATE, buffer_size);
+            runner = std::make_unique<alsa_dsp_runner>(sample_rate, buffer_size);
             break;
         case JACK:
             runner = std::make_unique<jack_dsp_runner>();
             break;
     }
 
-    int nprograms = argc - optind;
+    // Programs are shared objects or, with --jit, FAUST sources each followed by its FAUST
+    // options, a program starting at every argument ending in .dsp
+    std::vector<std::vector<std::string>> programs;
+    for (int i = optind; i < argc; i++) {
+        if (jit && !programs.empty() && !std::string(argv[i]).ends_with(".dsp")) {
+            programs.back().emplace_back(argv[i]);
+        } else {
+            programs.push_back({argv[i]});
+        }
+    }
+
+    int nprograms = programs.size();
     if (nprograms <= 0) {
         print_usage(argc, argv);
         return 1;
     }
 
-    std::vector<std::string> dsp_paths(nprograms);
-    for (int i = 0; i < nprograms; i++) {
-        dsp_paths[i] = argv[optind + i];
+    // Concurrent instances run the programs round-robin, and are measured like programs
+    std::vector<std::vector<std::string>> measured_programs = programs;
+    if (instances > 0) {
+        measured_programs.clear();
+        for (int i = 0; i < instances; i++) {
+            measured_programs.push_back(programs[i % nprograms]);
+        }
+    }
+
+    std::vector<std::string> measured_paths;
+    for (const auto& program : measured_programs) {
+        std::string path = program[0];
+        for (int i = 1; i < program.size(); i++) {
+            path += " " + program[i];
+        }
+        measured_paths.push_back(path);
+    }
+
+    if (!output_paths.empty() && output_paths.size() != measured_paths.size()) {
+        std::cerr << "Expected one output per " << (instances > 0 ? "instance" : "program")
+                  << ", got " << output_paths.size() << " outputs for " << measured_paths.size()
+                  << (instances > 0 ? " instances" : " programs") << std::endl;
+        print_usage(argc, argv);
+        return 1;
     }
 
     pfm_utils_initialize();
 
-    for (const std::string& path : dsp_paths) {
-        self_measuring_dsp d(path, nloops);
+    auto load = [&](const std::vector<std::string>& args) {
+        const std::string& path = args[0];
+#ifdef FCSCHED_JIT
+        if (jit) {
+            std::vector<std::string> options(args.begin() + 1, args.end());
+
+            auto* program    = new jit_dsp(path, options, jit_cache);
+            dsp*  instrument = voices > 0 ? new poly_dsp(program, voices) : (dsp*)program;
+            auto  d          = std::make_unique<self_measuring_dsp>(instrument, nloops);
+            d->set_metadata("jit:cached", program->is_cached() ? "1" : "0");
+            d->set_metadata("jit:compile_time(ms)", std::to_string(program->get_compile_time()));
+            return d;
+        }
+#endif
+        if (voices > 0) {
+            auto* instrument = new poly_dsp(new foreign_dsp(path), voices);
+            return std::make_unique<self_measuring_dsp>(instrument, nloops);
+        }
+        return std::make_unique<self_measuring_dsp>(path, nloops);
+    };
+
+    // Programs warm up here unless warmup is false, e.g. when they warm up on their own thread
+    auto prepare = [&](const std::vector<std::string>& program, bool warmup = true) {
+        auto d = load(program);
 
         UI ui;
-        d.buildUserInterface(&ui);
-        d.observe_events(events);
+        d->buildUserInterface(&ui);
+        set_controls(*d, ui, params, automation_path);
+        d->set_user_reads(user_reads);
+        d->set_reject_multiplexed(reject_multiplexed);
+        d->set_streaming(streaming, trace_rows);
+        d->observe_events(events);
+        if (precision > 0) {
+            d->set_target_precision(precision, min_loops);
+        }
 
-        d.warmup(buffer_size, nloops / 10);
+        if (!warmup) {
+            return d;
+        }
+
+        // Instruments warm up with every voice playing, until the runner's init frees them
+        if (auto* poly = dynamic_cast<poly_dsp*>(d->get_program())) {
+            poly->key_on_all();
+        }
+        d->warmup(buffer_size, nloops / 10);
+        return d;
+    };
 
-        runner->run(d);
+    auto finish = [&](self_measuring_dsp& d, int i) {
+        d.set_metadata("counters", d.has_user_reads() ? "rdpmc" : "syscalls");
+        d.close_events();
+
+        if (overhead) {
+            measure_overhead(d, *runner, events, nloops, buffer_size, user_reads, streaming,
+                             precision, min_loops);
+        }
+
+        d.set_metadata("sample_rate", std::to_string(d.getSampleRate()));
+        d.set_metadata("buffer_size", std::to_string(buffer_size));
+        d.set_metadata("cpu", std::to_string(sched_getcpu()));
+        d.set_metadata("precision", std::to_string(d.get_precision()));
+        d.set_metadata("timer", d.has_tsc_timer() ? "tsc" : "steady_clock");
+        d.set_metadata("groups", std::to_string(d.get_group_count()));
+        d.set_metadata("multiplexed", std::to_string(d.get_multiplexed_count()));
+        d.set_metadata("streaming", streaming ? "1" : "0");
+        if (rtype == BASIC) {
+            d.set_metadata("signal", signal);
+        }
 
         if (raw) {
-            if (output_path.has_value()) {
-                std::ofstream output(output_path.value());
-                d.print_measures_raw(output);
+            if (!output_paths.empty()) {
+                std::ofstream output(output_paths[i], std::ios::binary);
+                if (csv) {
+                    d.print_measures_raw(output);
+                } else {
+                    d.print_measures_binary(output);
+                }
             } else {
                 d.print_measures_raw(std::cout);
             }
         } else {
-            std::cerr << "\033[1;4m" << path << "\033[0m\n";
+            std::cerr << "\033[1;4m" << measured_paths[i] << "\033[0m\n";
             d.print_measures_pretty(std::cerr);
+            std::cerr << std::format("{} loops, precision: {:.02f}%\n",
+                                     d.get_total_iterations(), d.get_precision() * 100);
             std::cerr << "\n";
         }
+    };
+
+    if (instances > 0) {
+        std::vector<std::unique_ptr<self_measuring_dsp>> dsps;
+        std::vector<self_measuring_dsp*>                 running;
+        for (const auto& program : measured_programs) {
+            dsps.push_back(prepare(program, false));
+            running.push_back(dsps.back().get());
+        }
+
+        concurrent_dsp_runner concurrent(sample_rate, buffer_size, nloops / 10, {}, signal);
+        long long             wall_time = concurrent.run(running);
+
+        for (int i = 0; i < instances; i++) {
+            dsps[i]->set_metadata("concurrency:instances", std::to_string(instances));
+            dsps[i]->set_metadata("concurrency:index", std::to_string(i));
+            dsps[i]->set_metadata("concurrency:cpu", std::to_string(concurrent.get_cpu(i)));
+            dsps[i]->set_metadata("concurrency:wall_time(ns)", std::to_string(wall_time));
+            finish(*dsps[i], i);
+        }
+    } else if (block_size > 0) {
+        // Every program is loaded at once, and their loops are interleaved
+        std::vector<std::unique_ptr<self_measuring_dsp>> dsps;
+        std::vector<self_measuring_dsp*>                 running;
+        for (const auto& program : programs) {
+            dsps.push_back(prepare(program));
+            running.push_back(dsps.back().get());
+        }
+
+        interleaved_dsp_runner interleaved(sample_rate, buffer_size, block_size, 0, signal);
+        std::vector<int>       schedule = interleaved.run(running);
+
+        std::string schedule_str;
+        for (int index : schedule) {
+            schedule_str += (schedule_str.empty() ? "" : ",") + std::to_string(index);
+        }
+
+        for (int i = 0; i < nprograms; i++) {
+            dsps[i]->set_metadata("interleaving:index", std::to_string(i));
+            dsps[i]->set_metadata("interleaving:block_size", std::to_string(block_size));
+            dsps[i]->set_metadata("interleaving:schedule", schedule_str);
+            finish(*dsps[i], i);
+        }
+    } else {
+        for (int i = 0; i < nprograms; i++) {
+            auto d = prepare(programs[i]);
+            runner->run(*d);
+            finish(*d, i);
+        }
     }
 
     pfm_utils_terminate();
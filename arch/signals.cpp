@@ -0,0 +1,198 @@
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <iostream>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include "signals.h"
+
+#define WAVE_FORMAT_PCM 1
+#define WAVE_FORMAT_IEEE_FLOAT 3
+#define WAVE_FORMAT_EXTENSIBLE 0xFFFE
+
+/*
+ * splitmix64 finalizer: every sample is a hash of its channel and position, so that the loops
+ * filling blocks have no dependency from one sample to the next, and vectorize.
+ */
+static inline float noise_sample(uint64_t key)
+{
+    uint64_t z = key + 0x9E3779B97F4A7C15ULL;
+    z          = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+    z          = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+    z ^= z >> 31;
+    return (int64_t)(z >> 40) * (2.0f / (1 << 24)) - 1;
+}
+
+static uint32_t read_u32(const char* p)
+{
+    uint32_t value;
+    memcpy(&value, p, sizeof(value));
+    return value;
+}
+
+static uint16_t read_u16(const char* p)
+{
+    uint16_t value;
+    memcpy(&value, p, sizeof(value));
+    return value;
+}
+
+input_signal::input_signal(const std::string& spec, int sample_rate)
+    : spec(spec),
+      sample_rate(sample_rate),
+      period(DEFAULT_IMPULSE_PERIOD),
+      mapping(nullptr),
+      mapping_size(0),
+      data(nullptr),
+      frames(0),
+      channels(1),
+      bytes_per_sample(4),
+      is_float(true)
+{
+    if (spec == "noise") {
+        kind = signal_kind::NOISE;
+    } else if (spec == "silence") {
+        kind = signal_kind::SILENCE;
+    } else if (spec == "impulse" || spec.starts_with("impulse:")) {
+        kind = signal_kind::IMPULSE;
+        if (spec != "impulse") {
+            period = atoi(spec.c_str() + strlen("impulse:"));
+        }
+        if (period <= 0) {
+            std::cerr << "Invalid impulse period: " << spec << std::endl;
+            exit(1);
+        }
+    } else if (spec == "sweep") {
+        kind = signal_kind::SWEEP;
+    } else if (spec.starts_with("file:")) {
+        kind = signal_kind::FILE;
+        map_file(spec.substr(strlen("file:")));
+    } else {
+        std::cerr << "Unknown input signal: " << spec << std::endl;
+        exit(1);
+    }
+}
+
+input_signal::~input_signal()
+{
+    if (mapping != nullptr) {
+        munmap(mapping, mapping_size);
+    }
+}
+
+void input_signal::map_file(const std::string& path)
+{
+    int fd = open(path.c_str(), O_RDONLY);
+    if (fd < 0) {
+        perror(path.c_str());
+        exit(1);
+    }
+
+    struct stat st;
+    fstat(fd, &st);
+    mapping_size = st.st_size;
+    mapping      = mmap(nullptr, mapping_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (mapping == MAP_FAILED) {
+        perror(path.c_str());
+        exit(1);
+    }
+
+    const char* bytes = (const char*)mapping;
+    size_t      size  = mapping_size;
+
+    if (size >= 12 && !memcmp(bytes, "RIFF", 4) && !memcmp(bytes + 8, "WAVE", 4)) {
+        // Walk the chunks of the WAV file for its format and its samples
+        int    format = 0;
+        size_t offset = 12;
+        while (offset + 8 <= size) {
+            const char* chunk = bytes + offset;
+            size_t      chunk_size = std::min<size_t>(read_u32(chunk + 4), size - offset - 8);
+            if (!memcmp(chunk, "fmt ", 4) && chunk_size >= 16) {
+                format           = read_u16(chunk + 8);
+                channels         = read_u16(chunk + 10);
+                bytes_per_sample = read_u16(chunk + 22) / 8;
+                if (format == WAVE_FORMAT_EXTENSIBLE && chunk_size >= 26) {
+                    format = read_u16(chunk + 32);
+                }
+            } else if (!memcmp(chunk, "data", 4)) {
+                data   = chunk + 8;
+                frames = channels > 0 ? chunk_size / (channels * bytes_per_sample) : 0;
+            }
+            offset += 8 + chunk_size + (chunk_size & 1);
+        }
+
+        is_float = format == WAVE_FORMAT_IEEE_FLOAT;
+        bool pcm = format == WAVE_FORMAT_PCM && (bytes_per_sample == 2 || bytes_per_sample == 3);
+        if (!(pcm || (is_float && bytes_per_sample == 4)) || channels <= 0) {
+            std::cerr << path << ": unsupported WAV format" << std::endl;
+            exit(1);
+        }
+    } else {
+        data   = bytes;
+        frames = size / sizeof(float);
+    }
+
+    if (frames == 0) {
+        std::cerr << path << ": no samples" << std::endl;
+        exit(1);
+    }
+}
+
+float input_signal::file_sample(int channel, int64_t frame) const
+{
+    const char* p = data + (frame * channels + channel % channels) * bytes_per_sample;
+    if (is_float) {
+        float value;
+        memcpy(&value, p, sizeof(value));
+        return value;
+    }
+    if (bytes_per_sample == 2) {
+        return (int16_t)read_u16(p) / 32768.0f;
+    }
+    int32_t value = (uint8_t)p[0] << 8 | (uint8_t)p[1] << 16 | (uint32_t)(int8_t)p[2] << 24;
+    return value / 2147483648.0f;
+}
+
+void input_signal::fill(float* samples, int channel, int64_t position, int count,
+                        int64_t period) const
+{
+    switch (kind) {
+        case signal_kind::NOISE: {
+            uint64_t key = (uint64_t)channel << 40 | position;
+            for (int s = 0; s < count; s++) {
+                samples[s] = noise_sample(key + s);
+            }
+            break;
+        }
+        case signal_kind::SILENCE:
+            std::fill(samples, samples + count, 0.0f);
+            break;
+        case signal_kind::IMPULSE:
+            for (int s = 0; s < count; s++) {
+                samples[s] = (position + s) % this->period == 0 ? 1.0f : 0.0f;
+            }
+            break;
+        case signal_kind::SWEEP: {
+            // Exponential sweep over the cycle, up to the Nyquist frequency at most
+            double f0       = SWEEP_START_FREQUENCY;
+            double f1       = std::min(SWEEP_END_FREQUENCY, sample_rate / 2.0);
+            double duration = (double)period / sample_rate;
+            double rate     = log(f1 / f0);
+            for (int s = 0; s < count; s++) {
+                double t   = (double)((position + s) % period) / sample_rate;
+                samples[s] = sin(2 * M_PI * f0 * duration / rate * (exp(t / duration * rate) - 1));
+            }
+            break;
+        }
+        case signal_kind::FILE:
+            for (int s = 0; s < count; s++) {
+                samples[s] = file_sample(channel, (position + s) % frames);
+            }
+            break;
+    }
+}
@@ -0,0 +1,65 @@
+#ifndef __FCSCHEDTOOL_SIGNALS_H__
+#define __FCSCHEDTOOL_SIGNALS_H__
+
+#include <cstdint>
+#include <string>
+
+#define DEFAULT_SIGNAL "noise"
+#define DEFAULT_IMPULSE_PERIOD 4096
+#define SWEEP_START_FREQUENCY 20.0
+#define SWEEP_END_FREQUENCY 20000.0
+
+enum class signal_kind {
+    NOISE,
+    SILENCE,
+    IMPULSE,
+    SWEEP,
+    FILE,
+};
+
+/*
+ * Input signal of the runners, given by a specification:
+ *
+ *     noise               white noise in [-1, 1), from a counter-based generator
+ *     silence             zeros
+ *     impulse[:period]    an impulse every period samples (default: DEFAULT_IMPULSE_PERIOD)
+ *     sweep               an exponential sine sweep from 20 Hz to 20 kHz over every cycle
+ *     file:path           a WAV file (16 or 24-bit PCM, or 32-bit float), or raw mono 32-bit
+ *                         floats, mapped in memory and looped
+ *
+ * Samples are addressed by channel and position, so that runners can precompute every input
+ * block once, rather than generating inputs between the measured compute calls.
+ */
+class input_signal {
+    std::string spec;
+    signal_kind kind;
+    int         sample_rate;
+    int         period;
+
+    // Mapped file, and its samples
+    void*       mapping;
+    size_t      mapping_size;
+    const char* data;
+    int64_t     frames;
+    int         channels;
+    int         bytes_per_sample;
+    bool        is_float;
+
+    void map_file(const std::string& path);
+    float file_sample(int channel, int64_t frame) const;
+
+   public:
+    input_signal(const std::string& spec, int sample_rate);
+    ~input_signal();
+
+    input_signal(const input_signal&)            = delete;
+    input_signal& operator=(const input_signal&) = delete;
+
+    const std::string& get_spec() const { return spec; }
+
+    // Fills count samples of a channel, starting at the given position. period is the length
+    // of the cycle the samples are looped over, in samples.
+    void fill(float* samples, int channel, int64_t position, int count, int64_t period) const;
+};
+
+#endif
@@ -0,0 +1,213 @@
+#include <algorithm>
+#include <bit>
+#include <cmath>
+
+#include "streaming_stats.h"
+
+void running_stats::add(long long value)
+{
+    if (count == 0 || value < min) {
+        min = value;
+    }
+    if (count == 0 || value > max) {
+        max = value;
+    }
+
+    count++;
+    double delta = value - mean;
+    mean += delta / count;
+    m2 += delta * (value - mean);
+}
+
+double running_stats::get_stddev() const
+{
+    return count > 0 ? sqrt(m2 / count) : 0;
+}
+
+p2_quantile::p2_quantile(double p) : p(p)
+{
+}
+
+void p2_quantile::add(double value)
+{
+    // The first five values initialize the markers
+    if (count < 5) {
+        heights[count++] = value;
+        if (count == 5) {
+            std::sort(heights, heights + 5);
+            for (int i = 0; i < 5; i++) {
+                positions[i] = i + 1;
+            }
+            desired[0]    = 1;
+            desired[1]    = 1 + 2 * p;
+            desired[2]    = 1 + 4 * p;
+            desired[3]    = 3 + 2 * p;
+            desired[4]    = 5;
+            increments[0] = 0;
+            increments[1] = p / 2;
+            increments[2] = p;
+            increments[3] = (1 + p) / 2;
+            increments[4] = 1;
+        }
+        return;
+    }
+
+    // Find the cell of the value, extending the extreme markers if needed
+    int k;
+    if (value < heights[0]) {
+        heights[0] = value;
+        k          = 0;
+    } else if (value >= heights[4]) {
+        heights[4] = value;
+        k          = 3;
+    } else {
+        k = 0;
+        while (value >= heights[k + 1]) {
+            k++;
+        }
+    }
+
+    for (int i = k + 1; i < 5; i++) {
+        positions[i]++;
+    }
+    for (int i = 0; i < 5; i++) {
+        desired[i] += increments[i];
+    }
+
+    // Move the middle markers towards their desired positions
+    for (int i = 1; i < 4; i++) {
+        double delta = desired[i] - positions[i];
+        if ((delta >= 1 && positions[i + 1] - positions[i] > 1) ||
+            (delta <= -1 && positions[i - 1] - positions[i] < -1)) {
+            int    d      = delta > 0 ? 1 : -1;
+            double height = parabolic(i, d);
+            if (heights[i - 1] < height && height < heights[i + 1]) {
+                heights[i] = height;
+            } else {
+                heights[i] = linear(i, d);
+            }
+            positions[i] += d;
+        }
+    }
+
+    count++;
+}
+
+double p2_quantile::parabolic(int i, int d) const
+{
+    return heights[i] +
+           d / (positions[i + 1] - positions[i - 1]) *
+               ((positions[i] - positions[i - 1] + d) * (heights[i + 1] - heights[i]) /
+                    (positions[i + 1] - positions[i]) +
+                (positions[i + 1] - positions[i] - d) * (heights[i] - heights[i - 1]) /
+                    (positions[i] - positions[i - 1]));
+}
+
+double p2_quantile::linear(int i, int d) const
+{
+    return heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i]);
+}
+
+double p2_quantile::value() const
+{
+    if (count >= 5) {
+        return heights[2];
+    }
+    if (count == 0) {
+        return 0;
+    }
+
+    double sorted[5];
+    std::copy(heights, heights + count, sorted);
+    std::sort(sorted, sorted + count);
+    return sorted[(int)(p * (count - 1))];
+}
+
+log_histogram::log_histogram() : buckets(bucket(INT64_MAX) + 1)
+{
+}
+
+int log_histogram::bucket(long long value)
+{
+    if (value < (1 << LOG_HISTOGRAM_BITS)) {
+        return std::max(value, 0LL);
+    }
+    int shift = std::bit_width((unsigned long long)value) - 1 - LOG_HISTOGRAM_BITS;
+    int sub   = (value >> shift) - (1 << LOG_HISTOGRAM_BITS);
+    return ((shift + 1) << LOG_HISTOGRAM_BITS) + sub;
+}
+
+long long log_histogram::lower_bound(int bucket)
+{
+    if (bucket < (1 << LOG_HISTOGRAM_BITS)) {
+        return bucket;
+    }
+    int       shift = (bucket >> LOG_HISTOGRAM_BITS) - 1;
+    long long sub   = bucket & ((1 << LOG_HISTOGRAM_BITS) - 1);
+    return (sub + (1 << LOG_HISTOGRAM_BITS)) << shift;
+}
+
+long long log_histogram::width(int bucket)
+{
+    return bucket < (1 << LOG_HISTOGRAM_BITS) ? 1 : 1LL << ((bucket >> LOG_HISTOGRAM_BITS) - 1);
+}
+
+void log_histogram::add(long long value)
+{
+    buckets[bucket(value)]++;
+    count++;
+}
+
+long long log_histogram::value_at_rank(long long k) const
+{
+    long long seen = 0;
+    for (int i = 0; i < buckets.size(); i++) {
+        seen += buckets[i];
+        if (seen > k) {
+            return lower_bound(i) + width(i) / 2;
+        }
+    }
+    return 0;
+}
+
+std::string log_histogram::to_string() const
+{
+    std::string str;
+    for (int i = 0; i < buckets.size(); i++) {
+        if (buckets[i] > 0) {
+            if (!str.empty()) {
+                str += ',';
+            }
+            str += std::to_string(lower_bound(i)) + ':' + std::to_string(buckets[i]);
+        }
+    }
+    return str;
+}
+
+stream_summary::stream_summary()
+{
+    for (double q : STREAM_QUANTILES) {
+        quantiles.emplace_back(q);
+    }
+}
+
+void stream_summary::add(long long value)
+{
+    stats.add(value);
+    for (auto& quantile : quantiles) {
+        quantile.add(value);
+    }
+    histogram.add(value);
+}
+
+double stream_summary::quantile(double q) const
+{
+    for (const auto& quantile : quantiles) {
+        if (quantile.get_p() == q) {
+            return quantile.value();
+        }
+    }
+
+    long long n = stats.get_count();
+    return n > 0 ? histogram.value_at_rank(std::min((long long)(n * q), n - 1)) : 0;
+}
@@ -0,0 +1,95 @@
+#ifndef __FCSCHEDTOOL_STREAMING_STATS_H__
+#define __FCSCHEDTOOL_STREAMING_STATS_H__
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+/*
+ * Statistics updated one measure at a time, in constant memory, for runs too long to store every
+ * measure.
+ */
+
+// Count, mean and variance (Welford's algorithm), minimum and maximum
+class running_stats {
+    long long count = 0;
+    double    mean  = 0;
+    double    m2    = 0;
+    long long min   = 0;
+    long long max   = 0;
+
+   public:
+    void add(long long value);
+
+    long long get_count() const { return count; }
+    double    get_mean() const { return mean; }
+    double    get_stddev() const;
+    long long get_min() const { return min; }
+    long long get_max() const { return max; }
+};
+
+// Estimate of a quantile with the P² algorithm (Jain and Chlamtac, 1985), from five markers
+class p2_quantile {
+    double p;
+    int    count = 0;
+    double heights[5];
+    double positions[5];
+    double desired[5];
+    double increments[5];
+
+    double parabolic(int i, int d) const;
+    double linear(int i, int d) const;
+
+   public:
+    explicit p2_quantile(double p);
+
+    void   add(double value);
+    double get_p() const { return p; }
+    double value() const;
+};
+
+/*
+ * Histogram of positive values with buckets of constant relative width: values below
+ * 2^LOG_HISTOGRAM_BITS have their own bucket, and every power of two above is split into
+ * 2^LOG_HISTOGRAM_BITS buckets, so that bucket bounds are within 1.6% of the values they hold.
+ */
+#define LOG_HISTOGRAM_BITS 6
+
+class log_histogram {
+    std::vector<long long> buckets;
+    long long              count = 0;
+
+    static int       bucket(long long value);
+    static long long lower_bound(int bucket);
+    static long long width(int bucket);
+
+   public:
+    log_histogram();
+
+    void add(long long value);
+
+    // Value of rank k among the values added so far, within the precision of its bucket
+    long long value_at_rank(long long k) const;
+
+    // Lower bound and count of each non-empty bucket, as "lower:count,lower:count,..."
+    std::string to_string() const;
+};
+
+// The quantiles estimated by stream_summary
+#define STREAM_QUANTILES {0.2, 0.5, 0.9, 0.99}
+
+struct stream_summary {
+    running_stats            stats;
+    std::vector<p2_quantile> quantiles;
+    log_histogram            histogram;
+
+    stream_summary();
+
+    void add(long long value);
+
+    // The q-quantile: estimated with P² if it is one of STREAM_QUANTILES, from the histogram
+    // otherwise
+    double quantile(double q) const;
+};
+
+#endif
@@ -1,47 +1,148 @@
 #ifndef __FCSCHEDTOOL_UI_H__
 #define __FCSCHEDTOOL_UI_H__
 
+#include <algorithm>
+#include <cctype>
 #include <cstring>
+#include <string>
+#include <vector>
 
 #include <faust/dsp/dsp.h>
 #include <faust/gui/meta.h>
 
+struct Soundfile;
+
+/*
+ * A control of a DSP: its zone, and the range the program declares for it. Buttons and check
+ * buttons range from 0 to 1, and bargraphs are outputs of the program.
+ */
+struct parameter {
+    std::string path;
+    FAUSTFLOAT* zone;
+    FAUSTFLOAT  init;
+    FAUSTFLOAT  min;
+    FAUSTFLOAT  max;
+    bool        is_output;
+    bool        is_pressed;  // Buttons held down during runs
+};
+
+/*
+ * Records the controls of a DSP by path, e.g. "/reverb/damping": the labels of the boxes holding
+ * a control and its own label, with spaces replaced by underscores. Buttons whose label contains
+ * play, gate or hit are pressed, so that instruments make sound; dsp_controls keeps them pressed
+ * once the DSP is initialized.
+ *
+ * Virtual methods are laid out as in FAUST's UI, so that programs compiled by libfaust call them
+ * too.
+ */
 struct UI {
+   private:
+    std::vector<std::string> boxes;
+    std::vector<parameter>   parameters;
+
+    std::string make_path(const char* label) const
+    {
+        std::string path;
+        for (const auto& box : boxes) {
+            path += "/" + box;
+        }
+        path += "/";
+        path += label;
+        std::replace_if(path.begin(), path.end(), [](char c) { return isspace(c); }, '_');
+        return path;
+    }
+
+    void add(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init, FAUSTFLOAT min,
+             FAUSTFLOAT max, bool is_output, bool is_pressed = false)
+    {
+        parameters.push_back({make_path(label), zone, init, min, max, is_output, is_pressed});
+    }
+
    public:
     virtual ~UI() {}
-    void openTabBox(const char* label) {}
-    void openHorizontalBox(const char* label) {}
-    void openVerticalBox(const char* label) {}
-    void closeBox() {}
-    void addCheckButton(const char* label, float* zone) {}
-    void addVerticalSlider(const char* label, float* zone, float min, float max,
-                           float step, float init)
+
+    virtual void openTabBox(const char* label) { boxes.emplace_back(label); }
+    virtual void openHorizontalBox(const char* label) { boxes.emplace_back(label); }
+    virtual void openVerticalBox(const char* label) { boxes.emplace_back(label); }
+    virtual void closeBox() { boxes.pop_back(); }
+
+    virtual void addButton(const char* label, FAUSTFLOAT* zone)
     {
+        static const char* patterns[] = {"play", "gate", "hit", NULL};
+        bool               pressed    = false;
+        for (int i = 0; patterns[i] != NULL; i++) {
+            if (strcasestr(label, patterns[i])) {
+                *zone   = 1;
+                pressed = true;
+            }
+        }
+        add(label, zone, 0, 0, 1, false, pressed);
     }
-    void addHorizontalSlider(const char* label, float* zone, float min, float max,
-                             float step, float init)
+
+    virtual void addCheckButton(const char* label, FAUSTFLOAT* zone)
     {
+        add(label, zone, 0, 0, 1, false);
     }
-    void addNumEntry(const char* label, float* zone, float min, float max,
-                     float step, float init)
+
+    virtual void addVerticalSlider(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init,
+                                   FAUSTFLOAT min, FAUSTFLOAT max, FAUSTFLOAT step)
     {
+        add(label, zone, init, min, max, false);
     }
-    void addHorizontalBargraph(const char* label, float* zone, float min, float max)
+
+    virtual void addHorizontalSlider(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init,
+                                     FAUSTFLOAT min, FAUSTFLOAT max, FAUSTFLOAT step)
     {
+        add(label, zone, init, min, max, false);
     }
-    void addVerticalBargraph(const char* label, float* zone, float min, float max) {}
-    void addText(const char* text) {}
-    void declare(float* zone, const char* key, const char* value) {}
-    void declare(const char* key, const char* value) {}
 
-    void addButton(const char* label, float* zone)
+    virtual void addNumEntry(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT init,
+                             FAUSTFLOAT min, FAUSTFLOAT max, FAUSTFLOAT step)
     {
-        static const char* patterns[] = {"play", "gate", "hit", NULL};
-        for (int i = 0; patterns[i] != NULL; i++) {
-            if (strcasestr(label, patterns[i])) {
-                *zone = 1;
+        add(label, zone, init, min, max, false);
+    }
+
+    virtual void addHorizontalBargraph(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT min,
+                                       FAUSTFLOAT max)
+    {
+        add(label, zone, min, min, max, true);
+    }
+
+    virtual void addVerticalBargraph(const char* label, FAUSTFLOAT* zone, FAUSTFLOAT min,
+                                     FAUSTFLOAT max)
+    {
+        add(label, zone, min, min, max, true);
+    }
+
+    virtual void addSoundfile(const char* label, const char* filename, Soundfile** sf_zone) {}
+
+    virtual void declare(FAUSTFLOAT* zone, const char* key, const char* value) {}
+
+    virtual int sizeOfFAUSTFLOAT() { return sizeof(FAUSTFLOAT); }
+
+    const std::vector<parameter>& get_parameters() const { return parameters; }
+
+    // The control input with the given path, or whose path ends with the given name, e.g.
+    // "damping". Returns nullptr if there is none, or if the name is ambiguous.
+    const parameter* find(const std::string& name) const
+    {
+        const parameter* found = nullptr;
+        for (const auto& p : parameters) {
+            if (p.is_output) {
+                continue;
+            }
+            if (p.path == name) {
+                return &p;
+            }
+            if (p.path.size() > name.size() && p.path.ends_with(name) &&
+                (name[0] == '/' || p.path[p.path.size() - name.size() - 1] == '/')) {
+                if (found != nullptr) {
+                    return nullptr;
+                }
+                found = &p;
             }
         }
+        return found;
     }
 };
 
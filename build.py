@@ -1,26 +1,45 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
 from enum import StrEnum
-from typing import Optional, List, Dict
+from typing import TYPE_CHECKING, Callable, Dict, Generic, Iterator, List, Optional, TypeVar
 
+import _ctypes
 import csv
+import ctypes
 import hashlib
+import heapq
+import itertools
 import multiprocessing
 import os
+import queue
+import re
+import struct
 import subprocess
 import threading
 
 from numpy.typing import NDArray
 import numpy
 
+from cache import BuildCache, file_digest, tool_version
+from cpus import split_cpus
+from jobserver import JobServer, default_jobserver
 from perf import PerfEvent
 
+if TYPE_CHECKING:
+    from history import HistoryStore
+
 
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 FAUST_ARCH = os.path.join(ROOT_DIR, 'arch/mydsp.cpp')
+FAUST_UI = os.path.join(ROOT_DIR, 'arch/ui.h')
 
 BENCH_BINARY = 'schedrun'
 TEST_BINARY = 'schedprint'
+LLVM_PROFDATA = 'llvm-profdata'
+
+T = TypeVar('T')
 
 
 class Scheduling(StrEnum):
@@ -46,13 +65,17 @@ class Compiler(StrEnum):
     CLANG = 'clang++'
     GCC = 'g++'
 
+    # FAUST programs compiled in memory by schedrun with libfaust's LLVM
+    # backend, rather than built as shared objects, see FaustBenchmarkingPlan.jit
+    LIBFAUST = 'libfaust'
+
     @staticmethod
     def default() -> Compiler:
         return Compiler.CLANG
 
     @staticmethod
     def all() -> List[Compiler]:
-        return list(Compiler)
+        return [Compiler.CLANG, Compiler.GCC]
 
 
 class Architecture(StrEnum):
@@ -91,13 +114,19 @@ class FaustProgram:
     directory: str
     name: str
 
-    def __init__(self, src: str):
+    # Directory of the libraries the program imports, when they are not next
+    # to it, e.g. for programs generated in a build directory
+    library_directory: str
+
+    def __init__(self, src: str, library_directory: Optional[str] = None):
         directory, filename = os.path.split(src)
         name, _ = os.path.splitext(filename)
 
         object.__setattr__(self, 'src', src)
         object.__setattr__(self, 'directory', directory)
         object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'library_directory',
+                           directory if library_directory is None else library_directory)
 
     def build_directory(self) -> str:
         return os.path.join(self.directory, f'{self.name}.fcsched')
@@ -105,6 +134,25 @@ class FaustProgram:
     def make_build_directory(self):
         os.makedirs(self.build_directory(), mode=0o755, exist_ok=True)
 
+    def libraries(self) -> List[str]:
+        """Returns the FAUST libraries of the library directory, which this program may import"""
+        return sorted(os.path.join(self.library_directory, f)
+                      for f in os.listdir(self.library_directory or '.')
+                      if f.endswith('.lib'))
+
+    def faust_options(self) -> List[str]:
+        """FAUST command line options for the program to find its libraries"""
+        if self.library_directory == self.directory:
+            return []
+        return ['-I', self.library_directory or '.']
+
+    def source_hash(self) -> str:
+        """Hash of the source of this program and of the libraries next to it"""
+        digest = hashlib.sha256()
+        for path in [self.src] + self.libraries():
+            digest.update(file_digest(path).encode('utf-8'))
+        return digest.hexdigest()
+
     def cpp_path(self, faust_strategy: FaustStrategy) -> str:
         return os.path.join(self.build_directory(),
                             f'{self.name}_{faust_strategy.suffix()}.cpp')
@@ -120,6 +168,40 @@ class FaustProgram:
                             f'{self.name}_{faust_strategy.suffix()}'
                             f'_bench_{compilation_strategy.suffix()}.so')
 
+    def instrumented_path(self,
+                          faust_strategy: FaustStrategy,
+                          compilation_strategy: CompilationStrategy) -> str:
+        return os.path.join(self.build_directory(),
+                            f'{self.name}_{faust_strategy.suffix()}'
+                            f'_bench_{compilation_strategy.suffix()}_instr.so')
+
+    def profile_base(self,
+                     faust_strategy: FaustStrategy,
+                     compilation_strategy: CompilationStrategy) -> str:
+        """The path profiles of a profile-guided build are named after"""
+        return os.path.join(self.build_directory(),
+                            f'{self.name}_{faust_strategy.suffix()}'
+                            f'_bench_{compilation_strategy.suffix()}_profile')
+
+    def raw_profile_path(self,
+                         faust_strategy: FaustStrategy,
+                         compilation_strategy: CompilationStrategy) -> str:
+        """The profile written by the training run of an instrumented build"""
+        base = self.profile_base(faust_strategy, compilation_strategy)
+        if compilation_strategy.compiler == Compiler.GCC:
+            # GCC appends the name of the source file to -dumpbase
+            source, _ = os.path.splitext(os.path.basename(self.cpp_path(faust_strategy)))
+            return f'{base}-{source}.gcda'
+        return f'{base}.profraw'
+
+    def profile_path(self,
+                     faust_strategy: FaustStrategy,
+                     compilation_strategy: CompilationStrategy) -> str:
+        """The profile read by a profile-guided build"""
+        if compilation_strategy.compiler == Compiler.GCC:
+            return self.raw_profile_path(faust_strategy, compilation_strategy)
+        return f'{self.profile_base(faust_strategy, compilation_strategy)}.profdata'
+
     def benchmark_output_path(self,
                               faust_strategy: FaustStrategy,
                               compilation_strategy: CompilationStrategy,
@@ -127,12 +209,108 @@ class FaustProgram:
         return os.path.join(self.build_directory(),
                             f'{self.name}_{faust_strategy.suffix()}'
                             f'_bench_{compilation_strategy.suffix()}'
-                            f'.{run_hash}.csv')
+                            f'.{run_hash}.bin')
+
+
+@dataclass(frozen=True)
+class CodegenOptions:
+    """FAUST code generation options, other than the scheduling strategy
+
+    Attributes:
+        vec -- generate vector code (-vec)
+        vector_size -- size of the vectors (-vs), with vec
+        loop_variant -- vector loop variant (-lv), with vec
+        dfs -- deep-first scheduling of the vector loops (-dfs), with vec
+        fun -- compile the vector loops into separate functions (-fun), with vec
+        max_copy_delay -- largest delay line copied rather than ring-buffered (-mcd)
+        double -- compute in double precision (-double) instead of single
+    """
+    vec: bool = False
+    vector_size: Optional[int] = None
+    loop_variant: Optional[int] = None
+    dfs: bool = False
+    fun: bool = False
+    max_copy_delay: Optional[int] = None
+    double: bool = False
+
+    def __post_init__(self):
+        if not self.vec and (self.vector_size is not None or self.loop_variant is not None
+                             or self.dfs or self.fun):
+            raise ValueError('-vs, -lv, -dfs and -fun require -vec')
+
+    @staticmethod
+    def parse(text: str) -> CodegenOptions:
+        """Parses FAUST command line options, e.g. `-vec -vs 32 -double`"""
+        options = CodegenOptions.grid(text)
+        if len(options) != 1:
+            raise ValueError(f'Expected a single value per option in: {text}')
+        return options[0]
+
+    @staticmethod
+    def grid(text: str) -> List[CodegenOptions]:
+        """
+        Parses FAUST command line options whose values may be comma-separated
+        lists, e.g. `-vec -vs 16,32 -lv 0,1`, into every combination of them
+        """
+        flags = {'-vec': 'vec', '-dfs': 'dfs', '-fun': 'fun', '-double': 'double'}
+        valued = {'-vs': 'vector_size', '-lv': 'loop_variant', '-mcd': 'max_copy_delay'}
+
+        axes: Dict[str, List[object]] = {}
+        words = text.split()
+        while len(words) > 0:
+            word = words.pop(0)
+            if word in flags:
+                axes[flags[word]] = [True]
+            elif word == '-single':
+                axes['double'] = [False]
+            elif word in valued and len(words) > 0:
+                try:
+                    axes[valued[word]] = [int(v) for v in words.pop(0).split(',')]
+                except ValueError:
+                    raise ValueError(f'Invalid value for {word} in: {text}')
+            else:
+                raise ValueError(f'Unsupported FAUST option {word} in: {text}')
+
+        return [CodegenOptions(**dict(zip(axes.keys(), values)))  # type: ignore[arg-type]
+                for values in itertools.product(*axes.values())]
+
+    def options(self) -> List[str]:
+        """FAUST command line options, empty for the default code generation"""
+        options: List[str] = []
+        if self.vec:
+            options.append('-vec')
+        if self.vector_size is not None:
+            options += ['-vs', str(self.vector_size)]
+        if self.loop_variant is not None:
+            options += ['-lv', str(self.loop_variant)]
+        if self.dfs:
+            options.append('-dfs')
+        if self.fun:
+            options.append('-fun')
+        if self.max_copy_delay is not None:
+            options += ['-mcd', str(self.max_copy_delay)]
+        if self.double:
+            options.append('-double')
+        return options
+
+    def suffix(self) -> str:
+        """Path suffix naming every option, empty for the default code generation"""
+        parts: List[str] = []
+        for option in self.options():
+            if option.startswith('-'):
+                parts.append(option[1:])
+            else:
+                parts[-1] += option
+        return ''.join(f'_{p}' for p in parts)
+
+    def __str__(self):
+        return ' '.join(self.options())
 
 
 @dataclass(frozen=True)
 class FaustStrategy:
     scheduling: Scheduling
+    codegen: CodegenOptions = field(default_factory=CodegenOptions)
 
     @staticmethod
     def all() -> List[FaustStrategy]:
@@ -140,16 +318,74 @@ class FaustStrategy:
                 for scheduling in Scheduling.all()]
 
     def suffix(self) -> str:
-        return f'ss{self.scheduling.value}'
+        return f'ss{self.scheduling.value}{self.codegen.suffix()}'
+
+    def options(self) -> List[str]:
+        """FAUST command line options of this strategy"""
+        return ['-ss', self.scheduling.value, *self.codegen.options()]
+
+    def __str__(self):
+        if len(self.codegen.options()) == 0:
+            return f'strategy {self.scheduling.value}'
+        return f'strategy {self.scheduling.value} {self.codegen}'
+
+
+@dataclass(frozen=True)
+class CompilerOptions:
+    """C++ compiler options of benchmark shared objects, other than the architecture
+
+    Attributes:
+        optimization -- optimization level, as in -O<level>
+        lto -- enable link-time optimization (-flto)
+        pgo -- optimize with a profile of a training run of the program
+        extra_flags -- other compiler flags, appended to the command line
+    """
+    optimization: str = '3'
+    lto: bool = False
+    pgo: bool = False
+    extra_flags: tuple[str, ...] = ()
+
+    @staticmethod
+    def parse(text: str) -> CompilerOptions:
+        """
+        Parses compiler flags, e.g. `-O2 -flto -funroll-loops`: -O<level> and
+        -flto set their own options, -fprofile-use enables profile-guided
+        optimization, and the other flags are kept as they are
+        """
+        optimization = '3'
+        lto = False
+        pgo = False
+        extra_flags: List[str] = []
+        for flag in text.split():
+            if flag.startswith('-O'):
+                optimization = flag[2:]
+            elif flag == '-flto':
+                lto = True
+            elif flag == '-fprofile-use':
+                pgo = True
+            else:
+                extra_flags.append(flag)
+        return CompilerOptions(optimization, lto, pgo, tuple(extra_flags))
+
+    def suffix(self) -> str:
+        """Path suffix naming these options, empty for the default options"""
+        suffix = f'_O{self.optimization}' if self.optimization != '3' else ''
+        suffix += '_lto' if self.lto else ''
+        suffix += '_pgo' if self.pgo else ''
+        if len(self.extra_flags) > 0:
+            suffix += '_' + hashlib.sha1(' '.join(self.extra_flags).encode('utf-8')).hexdigest()[:8]
+        return suffix
 
     def __str__(self):
-        return f'strategy {self.scheduling.value}'
+        return ' '.join([f'-O{self.optimization}', *(['-flto'] if self.lto else []),
+                         *self.extra_flags, *(['pgo'] if self.pgo else [])])
 
 
 @dataclass(frozen=True)
 class CompilationStrategy:
     compiler: Compiler
     architecture: Architecture
+    options: CompilerOptions = field(default_factory=CompilerOptions)
 
     @staticmethod
     def all() -> List[CompilationStrategy]:
@@ -158,10 +394,32 @@ class CompilationStrategy:
                 for architecture in Architecture.all()]
 
     def suffix(self) -> str:
-        return f'{self.compiler.value}_{self.architecture.value}'
+        return f'{self.compiler.value}_{self.architecture.value}{self.options.suffix()}'
+
+    def flags(self) -> List[str]:
+        """Compiler flags of this strategy, profile-guided optimization aside"""
+        if self.compiler == Compiler.LIBFAUST:
+            return []
+        return [f'-march={self.architecture}', f'-O{self.options.optimization}', '-ffast-math',
+                '--std=c++20', *(['-flto'] if self.options.lto else []), *self.options.extra_flags]
+
+    def profile_generate_flags(self, profile_base: str) -> List[str]:
+        """Flags instrumenting a build to write a profile named after profile_base"""
+        if self.compiler == Compiler.GCC:
+            return ['-fprofile-generate', '-dumpbase', profile_base]
+        return [f'-fprofile-instr-generate={profile_base}.profraw']
+
+    def profile_use_flags(self, profile_base: str) -> List[str]:
+        """Flags optimizing a build with the profile named after profile_base"""
+        if self.compiler == Compiler.GCC:
+            # GCC looks for the profile named after the same -dumpbase
+            return ['-fprofile-use', '-dumpbase', profile_base]
+        return [f'-fprofile-instr-use={profile_base}.profdata']
 
     def __str__(self):
-        return f'{self.compiler.value}, {self.architecture.value}'
+        if self.options == CompilerOptions():
+            return f'{self.compiler.value}, {self.architecture.value}'
+        return f'{self.compiler.value}, {self.architecture.value}, {self.options}'
 
 
 @dataclass
@@ -178,24 +436,124 @@ class RunException(BaseException):
         )
 
 
-@dataclass(frozen=True)
+class FaustVariants:
+    """Groups the strategies of a program that generate the same C++ code
+
+    Only one strategy of each group, its representative, is compiled, run and
+    tested. Its results are shared by the other strategies of the group.
+
+    Attributes:
+        representatives -- the representative of each strategy
+    """
+    representatives: Dict[FaustStrategy, FaustStrategy]
+
+    lock: threading.Lock
+    resolved: bool
+
+    def __init__(self):
+        self.representatives = {}
+        self.lock = threading.Lock()
+        self.resolved = False
+
+    def resolve(self, faust_tasks: List[FaustTask]):
+        """
+        Fingerprints the code generated by the given tasks of this build. Must
+        be called once they are all complete. Code left by strategies that
+        were not generated in this build may be stale, and is not compared.
+        """
+        with self.lock:
+            if self.resolved:
+                return
+
+            by_fingerprint: Dict[str, FaustStrategy] = {}
+            for task in faust_tasks:
+                if task.failed or not os.path.exists(task.product):
+                    continue
+                fingerprint = cpp_fingerprint(task.product)
+                self.representatives[task.strategy] = by_fingerprint.setdefault(fingerprint,
+                                                                                task.strategy)
+
+            self.resolved = True
+
+    def representative(self, strategy: FaustStrategy) -> FaustStrategy:
+        return self.representatives.get(strategy, strategy)
+
+    def is_representative(self, strategy: FaustStrategy) -> bool:
+        return self.representative(strategy) == strategy
+
+    def equivalents(self, strategy: FaustStrategy) -> List[FaustStrategy]:
+        """Returns all the strategies generating the same code as strategy, itself included"""
+        representative = self.representative(strategy)
+        return [s for s, r in self.representatives.items() if r == representative] \
+            or [strategy]
+
+
+@dataclass
 class FaustTest:
     program: FaustProgram
     faust_strategies: List[FaustStrategy] = field(default_factory=FaustStrategy.all)
+    variants: FaustVariants = field(default_factory=FaustVariants)
 
     def path(self, faust_strategy: FaustStrategy) -> str:
-        return self.program.test_path(faust_strategy)
+        return self.program.test_path(self.variants.representative(faust_strategy))
 
 
 @dataclass
 class FaustTestRun:
+    """Computes the response of every strategy of a test to the same input
+
+    By default, the test shared objects are loaded in this process and
+    computed directly into NumPy buffers. Isolated runs use the schedprint
+    binary instead, so that a crashing DSP does not stop the whole test suite.
+    """
     test: FaustTest
+    isolated: bool = False
 
     def run(self) -> FaustTestResult:
-        outputs = {c: self.get_output(c) for c in self.test.faust_strategies}
+        variants = self.test.variants
+        outputs = {c: self.get_output(c) for c in self.test.faust_strategies
+                   if variants.is_representative(c)}
+        outputs = {c: outputs[variants.representative(c)] for c in self.test.faust_strategies}
         return FaustTestResult(self.test, outputs)
 
     def get_output(self, codegen: FaustStrategy) -> NDArray:
+        if self.isolated:
+            return self.get_output_isolated(codegen)
+        return self.get_output_in_process(codegen)
+
+    def get_output_in_process(self, codegen: FaustStrategy) -> NDArray:
+        # Libraries are loaded with RTLD_LOCAL, so the mydsp symbols of each
+        # strategy do not interpose each other.
+        lib = ctypes.CDLL(os.path.abspath(self.test.path(codegen)))
+        lib.create_dsp.restype = ctypes.c_void_p
+        lib.delete_dsp.argtypes = [ctypes.c_void_p]
+        lib.dsp_get_num_inputs.argtypes = [ctypes.c_void_p]
+        lib.dsp_get_num_outputs.argtypes = [ctypes.c_void_p]
+        lib.dsp_init.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.dsp_build_user_interface.argtypes = [ctypes.c_void_p]
+        lib.dsp_compute.argtypes = [ctypes.c_void_p, ctypes.c_int,
+                                    ctypes.c_void_p, ctypes.c_void_p]
+
+        try:
+            d = lib.create_dsp()
+            try:
+                lib.dsp_init(d, TEST_SAMPLE_RATE)
+                lib.dsp_build_user_interface(d)
+
+                inputs = test_input(lib.dsp_get_num_inputs(d))
+                outputs = numpy.zeros((lib.dsp_get_num_outputs(d), TEST_SAMPLES),
+                                      dtype=numpy.float32)
+                lib.dsp_compute(d, TEST_SAMPLES, channel_pointers(inputs),
+                                channel_pointers(outputs))
+            finally:
+                lib.delete_dsp(d)
+        finally:
+            # ctypes never unloads libraries, and a test loads one per variant
+            _ctypes.dlclose(lib._handle)
+
+        return outputs
+
+    def get_output_isolated(self, codegen: FaustStrategy) -> NDArray:
         cmd = [os.path.join(ROOT_DIR, TEST_BINARY), self.test.path(codegen)]
         proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
         if proc.stdout is None:
@@ -208,13 +566,93 @@ class FaustTestRun:
         return numpy.array(response, dtype=numpy.float32).T
 
 
+TEST_SAMPLE_RATE = 44100
+TEST_SAMPLES = 44100
+
+
+def test_input(channels: int) -> NDArray:
+    """
+    The impulse fed to every strategy under test, one row per channel, as
+    schedprint does
+    """
+    inputs = numpy.zeros((channels, TEST_SAMPLES), dtype=numpy.float32)
+    inputs[:, 0] = 1
+    return inputs
+
+
+def channel_pointers(buffers: NDArray) -> ctypes.Array:
+    """Returns a float** pointing to each row of a C-contiguous float32 array"""
+    pointers = (ctypes.POINTER(ctypes.c_float) * buffers.shape[0])()
+    for ch, row in enumerate(buffers):
+        pointers[ch] = row.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+    return pointers
+
+
 @dataclass
 class FaustTestResult:
     test: FaustTest
     outputs: Dict[FaustStrategy, NDArray]
 
 
+BENCH_BUFFER_SIZE = 256
+BENCH_SAMPLE_RATE = 44100
+
+# Input signals of the basic runner, as specified to schedrun
+DEFAULT_SIGNAL = 'noise'
+SIGNAL_FILE_PREFIX = 'file:'
+
+
 @dataclass(frozen=True)
+class ParameterSet:
+    """Values of the controls of a program for a whole run
+
+    Attributes:
+        values -- (control, value) pairs, controls being paths or names of the
+            program's controls, e.g. `/reverb/damping` or `damping`
+    """
+    values: tuple[tuple[str, float], ...] = ()
+
+    @staticmethod
+    def grid(assignments: List[str]) -> List[ParameterSet]:
+        """
+        Parses `control=values` assignments whose values may be comma-separated
+        lists, e.g. `freq=110,440,1760`, into every combination of them
+        """
+        names: List[str] = []
+        axes: List[List[float]] = []
+        for assignment in assignments:
+            name, _, values = assignment.rpartition('=')
+            if name == '':
+                raise ValueError(f'Expected control=values: {assignment}')
+            try:
+                axes.append([float(v) for v in values.split(',')])
+            except ValueError:
+                raise ValueError(f'Invalid value in: {assignment}')
+            names.append(name)
+
+        return [ParameterSet(tuple(zip(names, values)))
+                for values in itertools.product(*axes)]
+
+    def arguments(self) -> List[str]:
+        """schedrun options setting the controls"""
+        return [arg for name, value in self.values for arg in ['--param', f'{name}={value:.9g}']]
+
+    def controls(self, automation: Optional[str] = None) -> str:
+        """
+        These values, and the digest of the automation script run with them if
+        any: what results are keyed by, empty for the default controls
+        """
+        controls = str(self)
+        if automation is not None:
+            controls = f'{controls} automation={file_digest(automation)[:8]}'.strip()
+        return controls
+
+    def __str__(self):
+        # Enough digits to set single precision controls exactly
+        return ' '.join(f'{name}={value:.9g}' for name, value in self.values)
+
+
+@dataclass
 class FaustBenchmark:
     program: FaustProgram
 
@@ -229,17 +667,60 @@ class FaustBenchmark:
     bench_type: BenchType = field(default_factory=BenchType.default)
 
     override: bool = False
+    variants: FaustVariants = field(default_factory=FaustVariants)
+
+    precision: Optional[float] = None
+    min_loops: int = 100
+    subtract_overhead: bool = False
+    streaming: bool = False
+    interleave: Optional[int] = None
+
+    # Whether to measure the overhead of measuring, with an empty DSP run
+    # after each program, which subtracting the overhead requires
+    measure_overhead: bool = False
+
+    buffer_sizes: List[int] = field(default_factory=lambda: [BENCH_BUFFER_SIZE])
+    sample_rates: List[int] = field(default_factory=lambda: [BENCH_SAMPLE_RATE])
+    instances: List[int] = field(default_factory=lambda: [1])
+
+    # Where schedrun caches the machine code of the programs it compiles in memory
+    jit_cache: Optional[str] = None
+
+    # Input signal of the basic runner, see `schedrun --signal`
+    signal: str = DEFAULT_SIGNAL
+
+    # Control values of the runs, each measured separately, and the script
+    # changing controls between loops, see `schedrun --automation`
+    parameter_sets: List[ParameterSet] = field(default_factory=lambda: [ParameterSet()])
+    automation: Optional[str] = None
+
+    # Numbers of voices to run the program with as a polyphonic instrument, 0
+    # running it as is
+    voices: List[int] = field(default_factory=lambda: [0])
 
     def path(self,
              faust_strategy: FaustStrategy,
              compilation_strategy: CompilationStrategy) -> str:
-        return self.program.benchmark_path(faust_strategy, compilation_strategy)
+        return self.program.benchmark_path(self.variants.representative(faust_strategy),
+                                           compilation_strategy)
 
     def run(self) -> List[FaustBenchmarkResult]:
-        runs = [FaustBenchmarkRun(self, f, c, self.loops, self.events, self.bench_type)
+        runs = [FaustBenchmarkRun(self, f, c, self.loops, self.events, self.bench_type,
+                                  self.precision, self.min_loops, self.streaming,
+                                  self.interleave, buffer_size, sample_rate, instances,
+                                  self.signal, parameters, voices,
+                                  self.measure_overhead or self.subtract_overhead)
                 for f in self.faust_strategies
-                for c in self.compilation_strategies]
-        return [r.run(override=self.override) for r in runs]
+                for c in self.compilation_strategies
+                for buffer_size in self.buffer_sizes
+                for sample_rate in self.sample_rates
+                for instances in self.instances
+                for parameters in self.parameter_sets
+                for voices in self.voices]
+        results = run_benchmarks(runs, override=self.override)
+        if self.subtract_overhead:
+            results = [r.without_overhead() for r in results]
+        return results
 
 
 @dataclass
@@ -252,67 +733,159 @@ class FaustBenchmarkRun:
     events: List[PerfEvent]
     bench_type: BenchType = BenchType.BASIC
 
-    def csv_path(self) -> str:
+    # When set, stop after min_loops once the relative confidence interval of
+    # the time quantile is below precision, with loops as the maximum
+    precision: Optional[float] = None
+    min_loops: int = 100
+
+    # When set, schedrun only keeps summaries of the measures and a decimated
+    # trace, so that very long runs use constant memory
+    streaming: bool = False
+
+    # When set, the runs of a program are measured by the same process, in
+    # randomized round-robin blocks of this many loops
+    interleave: Optional[int] = None
+
+    buffer_size: int = BENCH_BUFFER_SIZE
+    sample_rate: int = BENCH_SAMPLE_RATE
+
+    # When above 1, this many instances of the shared object run at the same
+    # time on their own threads, each written to its own measures file
+    instances: int = 1
+
+    signal: str = DEFAULT_SIGNAL
+    parameters: ParameterSet = ParameterSet()
+
+    # When above 0, the program runs as a polyphonic instrument of this many
+    # voices, playing a schedule of notes that keeps them all active
+    voices: int = 0
+
+    # Whether schedrun measures an empty DSP after the program, see
+    # FaustBenchmarkResult.overhead
+    overhead: bool = False
+
+    def settings(self) -> tuple:
+        """Settings that runs must share to be measured by the same process"""
+        program = self.benchmark.program.src if self.interleave is not None else None
+        if self.instances > 1:
+            program = tuple(self.program_arguments())
+        return (self.bench_type, self.loops, tuple(self.events), self.precision, self.min_loops,
+                self.streaming, self.interleave, program, self.buffer_size, self.sample_rate,
+                self.instances, self.is_jit(), self.signal, self.parameters, self.voices,
+                self.overhead)
+
+    def output_path(self) -> str:
         measures = f'events: {sorted(self.events)}, nloops: {self.loops}, ' \
-                   f'type: {self.bench_type.value}'
+                   f'type: {self.bench_type.value}, buffer_size: {self.buffer_size}, ' \
+                   f'sample_rate: {self.sample_rate}, signal: {self.signal}'
+        if self.signal.startswith(SIGNAL_FILE_PREFIX):
+            measures += f', file: {file_digest(self.signal[len(SIGNAL_FILE_PREFIX):])}'
+        if self.precision is not None:
+            measures += f', precision: {self.precision}, min_loops: {self.min_loops}'
+        if self.streaming:
+            measures += ', streaming'
+        if self.interleave is not None:
+            measures += f', interleave: {self.interleave}'
+        if self.instances > 1:
+            measures += f', instances: {self.instances}'
+        if self.controls() != '':
+            measures += f', controls: {self.controls()}'
+        if self.voices > 0:
+            measures += f', voices: {self.voices}'
+        if self.overhead:
+            measures += ', overhead'
         run_hash = hashlib.sha1(measures.encode('utf-8')).hexdigest()[:8]
         return self.benchmark.program.benchmark_output_path(
-                self.faust_strategy,
+                self.measured_strategy(),
                 self.compilation_strategy,
                 run_hash)
 
+    def controls(self) -> str:
+        """The controls of the run, see ParameterSet.controls"""
+        return self.parameters.controls(self.benchmark.automation)
+
+    def instance_output_path(self, instance: int) -> str:
+        """The measures file of one of the instances run at the same time"""
+        if instance == 0:
+            return self.output_path()
+        path, ext = os.path.splitext(self.output_path())
+        return f'{path}.{instance}{ext}'
+
     def shared_object_path(self) -> str:
-        return self.benchmark.program.benchmark_path(
-                self.faust_strategy,
-                self.compilation_strategy)
+        return self.benchmark.path(self.faust_strategy, self.compilation_strategy)
 
-    def run(self, *, override=False) -> FaustBenchmarkResult:
-        output = self.csv_path()
-        binary_path = os.path.join(ROOT_DIR, BENCH_BINARY)
-        shared_object_path = self.shared_object_path()
-        if not override \
-                and os.path.exists(output) \
-                and os.path.getmtime(output) > os.path.getmtime(shared_object_path):
-            return self.parse_output()
-
-        print(f'RUN    {self.benchmark.program.src} '
-              f'[{self.faust_strategy}, {self.compilation_strategy}]')
+    def is_jit(self) -> bool:
+        """True if schedrun compiles the program in memory rather than loading a shared object"""
+        return self.compilation_strategy.compiler == Compiler.LIBFAUST
 
-        cmd = [binary_path,
-               shared_object_path,
-               self.bench_type.run_opt(),
-               '-r',
-               '-o', output,
-               '-n', str(self.loops)]
+    def program_arguments(self) -> List[str]:
+        """
+        The program as given to schedrun: a shared object, or a FAUST source
+        followed by its FAUST options, each one its own argument
+        """
+        if self.is_jit():
+            return [self.benchmark.program.src, *self.benchmark.program.faust_options(),
+                    *self.measured_strategy().options()]
+        return [self.shared_object_path()]
 
-        if len(self.events) > 0:
-            cmd += ['-e', ','.join(map(lambda e: e.value, self.events))]
+    def measured_strategy(self) -> FaustStrategy:
+        """The strategy whose shared object is actually run for this strategy"""
+        return self.benchmark.variants.representative(self.faust_strategy)
 
-        proc = subprocess.run(cmd, capture_output=True, text=True)
+    def is_up_to_date(self) -> bool:
+        output = self.output_path()
+        program = self.benchmark.program.src if self.is_jit() else self.shared_object_path()
+        return os.path.exists(output) and os.path.getmtime(output) > os.path.getmtime(program)
 
-        if proc.returncode != 0:
-            raise RunException(cmd, proc)
+    def run(self, *, override=False) -> FaustBenchmarkResult:
+        if override or not self.is_up_to_date():
+            FaustBenchmarkBatch([self]).run()
 
         return self.parse_output()
 
     def parse_output(self) -> FaustBenchmarkResult:
-        with open(self.csv_path()) as output:
-            reader = csv.reader(output, delimiter=';')
-            header = [col for col in next(reader) if len(col) > 0]
-            events = [[] for h in header if len(h) > 0]
-            loops = 0
-            for row in reader:
-                if len(row) > 0:
-                    for i, col in enumerate(row):
-                        if len(col) > 0:
-                            events[i].append(int(col))
-                    loops += 1
+        return self.parse_measures(self.output_path())
+
+    def parse_instances(self) -> List[FaustBenchmarkResult]:
+        """The results of every instance, when several ran at the same time"""
+        return [self.parse_measures(self.instance_output_path(i)) for i in range(self.instances)]
+
+    def parse_measures(self, path: str) -> FaustBenchmarkResult:
+        columns, metadata, measures = read_measures(path)
+        events = {PerfEvent(k): measures[i + 1] for i, k in enumerate(columns[1:])}
+        loops = int(metadata.get('summary:count:time(ns)', measures.shape[1]))
+        return FaustBenchmarkResult(self, loops, events, measures[0], metadata)
+
+
+MEASURES_MAGIC = b'FCSCHED\0'
+MEASURES_VERSION = 1
+
+
+def read_measures(path: str) -> tuple[List[str], Dict[str, str], NDArray]:
+    """
+    Reads a binary measures file written by schedrun, and returns its column
+    names, its metadata and a (column, iteration) array of its measures,
+    mapped from the file without copy. See dsp_measuring.h for the format.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(28)
+        magic, version, ncolumns, nrows, nmetadata = struct.unpack('<8sIIQI', header)
+        if magic != MEASURES_MAGIC or version != MEASURES_VERSION:
+            raise BaseException(f'{path} is not a measures file (version {MEASURES_VERSION})')
+
+        def read_string() -> str:
+            size, = struct.unpack('<I', f.read(4))
+            return f.read(size).decode('utf-8')
 
-            times = numpy.array(events[0])
-            events_dict = {PerfEvent(k): numpy.array(events[i+1]) 
-                           for i, k in enumerate(header[1:])}
+        columns = [read_string() for _ in range(ncolumns)]
+        metadata = dict((read_string(), read_string()) for _ in range(nmetadata))
+        offset = f.tell() + (-f.tell()) % 8
 
-            return FaustBenchmarkResult(self, loops, events_dict, times)
+    if nrows == 0:
+        return columns, metadata, numpy.zeros((ncolumns, 0), dtype=numpy.int64)
+
+    measures = numpy.memmap(path, dtype='<i8', mode='r', offset=offset, shape=(ncolumns, nrows))
+    return columns, metadata, measures
 
 
 @dataclass
@@ -321,69 +894,291 @@ class FaustBenchmarkResult:
     loops: int
     events: dict[PerfEvent, NDArray]
     times: NDArray
+    metadata: Dict[str, str] = field(default_factory=dict)
+
+    def export_csv(self, path: str):
+        """Writes the measures as semicolon-separated values, like schedrun --csv"""
+        header = ';'.join(['time(ns)'] + [e.value for e in self.events.keys()]) + ';'
+        measures = numpy.stack([self.times] + list(self.events.values()), axis=1)
+        numpy.savetxt(path, measures, fmt='%d', delimiter=';', header=header, comments='')
+
+    def overhead(self) -> Dict[str, int]:
+        """
+        The 20% quantile of each measure of an empty DSP with the same inputs
+        and outputs, measured right after this one by schedrun, by column name
+        """
+        prefix = 'overhead:'
+        return {k[len(prefix):]: int(v) for k, v in self.metadata.items() if k.startswith(prefix)}
+
+    def without_overhead(self) -> FaustBenchmarkResult:
+        """Returns this result with the measuring overhead subtracted from every measure"""
+        overhead = self.overhead()
+        return replace(self,
+                       times=self.times - overhead.get('time(ns)', 0),
+                       events={e: m - overhead.get(e.value, 0) for e, m in self.events.items()})
+
+    def precision(self) -> Optional[float]:
+        """
+        Relative half-width of the 95% confidence interval of the 20% quantile
+        of times, as measured by schedrun
+        """
+        try:
+            return float(self.metadata['precision'])
+        except KeyError:
+            return None
+
+    def is_streaming(self) -> bool:
+        """
+        True if schedrun only kept summaries of the measures: times and events
+        then hold a decimated trace, of one loop every trace_step()
+        """
+        return self.metadata.get('streaming') == '1'
+
+    def trace_step(self) -> int:
+        return int(self.metadata.get('trace_step', 1))
+
+    def instances(self) -> List[FaustBenchmarkResult]:
+        """The results of every instance that ran at the same time as this one, this one first"""
+        return self.run.parse_instances()
+
+    def aggregate_throughput(self) -> float:
+        """
+        Samples computed per second by all the instances that ran at the same
+        time, waits for each other included. Instances stop on their own, so
+        the loops of each one are counted.
+        """
+        wall_time = float(self.metadata.get('concurrency:wall_time(ns)', numpy.sum(self.times)))
+        loops = sum(i.loops for i in self.instances())
+        return loops * self.run.buffer_size * 1e9 / wall_time
+
+    def active_voices(self) -> float:
+        """Mean number of voices computed per loop by a polyphonic run"""
+        return float(self.metadata.get('poly:active_voices', 1))
+
+    def allocation_time(self) -> float:
+        """
+        Mean time a polyphonic run spent per loop starting and releasing notes,
+        apart from the measured computation, in nanoseconds
+        """
+        return float(self.metadata.get('poly:allocation_time(ns)', 0)) / self.loops
+
+    def schedule(self) -> List[int]:
+        """
+        The order in which an interleaved run measured its programs: the index
+        of the program run by each block of loops. This result's program is
+        the one of index metadata['interleaving:index'].
+        """
+        schedule = self.metadata.get('interleaving:schedule', '')
+        return [int(i) for i in schedule.split(',') if i]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Statistics of every loop of a streaming run, by column name then
+        statistic: count, mean, stddev, min, max and the p20, p50, p90 and p99
+        quantiles
+        """
+        prefix = 'summary:'
+        summary: Dict[str, Dict[str, float]] = {}
+        for k, v in self.metadata.items():
+            if k.startswith(prefix):
+                stat, column = k[len(prefix):].split(':', 1)
+                if stat != 'histogram':
+                    summary.setdefault(column, {})[stat] = float(v)
+        return summary
+
+    def histogram(self, column: str = 'time(ns)') -> Dict[int, int]:
+        """
+        Histogram of every loop of a streaming run, as the count of measures by
+        lower bound of their bucket. Buckets are at most 1/64 of their bounds wide.
+        """
+        histogram = self.metadata.get(f'summary:histogram:{column}', '')
+        return {int(lower): int(count)
+                for lower, count in (b.split(':') for b in histogram.split(',') if b)}
+
+    def equivalent_strategies(self) -> List[FaustStrategy]:
+        """Strategies other than this result's one that generate the same code"""
+        return [s for s in self.run.benchmark.variants.equivalents(self.run.faust_strategy)
+                if s != self.run.faust_strategy]
+
+
+@dataclass
+class FaustBenchmarkBatch:
+    """Several benchmark runs with the same settings, measured by a single schedrun process
+
+    Running them together saves the process startup and the PFM initialization
+    for each run, and measures them all under the same machine conditions.
+    """
+    runs: List[FaustBenchmarkRun]
+
+    def command(self) -> List[str]:
+        settings = self.runs[0]
+        cmd = [os.path.join(ROOT_DIR, BENCH_BINARY),
+               settings.bench_type.run_opt(),
+               '-r',
+               '-n', str(settings.loops),
+               '-b', str(settings.buffer_size),
+               '-s', str(settings.sample_rate)]
+
+        if len(settings.events) > 0:
+            cmd += ['-e', ','.join(map(lambda e: e.value, settings.events))]
+
+        if settings.precision is not None:
+            cmd += ['-p', str(settings.precision), '-m', str(settings.min_loops)]
+
+        if settings.streaming:
+            cmd += ['--streaming']
+
+        if settings.interleave is not None:
+            cmd += ['--interleave', str(settings.interleave)]
+
+        if settings.instances > 1:
+            cmd += ['--instances', str(settings.instances)]
+
+        if settings.bench_type == BenchType.BASIC:
+            cmd += ['--signal', settings.signal]
+
+        cmd += settings.parameters.arguments()
+        if settings.voices > 0:
+            cmd += ['--voices', str(settings.voices)]
+        if settings.overhead:
+            cmd += ['--overhead']
+        if settings.benchmark.automation is not None:
+            cmd += ['--automation', settings.benchmark.automation]
+
+        if settings.is_jit():
+            cmd += ['--jit']
+            if settings.benchmark.jit_cache is not None:
+                cmd += ['--jit-cache', settings.benchmark.jit_cache]
+
+        for r in self.runs:
+            cmd += [arg for i in range(r.instances) for arg in ['-o', r.instance_output_path(i)]]
+
+        # FAUST options start with a dash, and must not be read as options of schedrun
+        return cmd + ['--'] + [arg for r in self.runs for arg in r.program_arguments()]
+
+    def run(self):
+        for r in self.runs:
+            controls = f', {r.controls()}' if r.controls() != '' else ''
+            print(f'RUN    {r.benchmark.program.src} '
+                  f'[{r.faust_strategy}, {r.compilation_strategy}{controls}]')
+
+        cmd = self.command()
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+
+        if proc.returncode != 0:
+            raise RunException(cmd, proc)
+
+
+def run_benchmarks(runs: List[FaustBenchmarkRun], *,
+                   override: bool = False) -> List[FaustBenchmarkResult]:
+    """
+    Runs the benchmarks of every representative strategy, and shares their
+    results with the equivalent strategies. All the runs that are not up to
+    date and share the same settings are measured by a single process.
+    """
+    def key(r: FaustBenchmarkRun):
+        return (id(r.benchmark), r.measured_strategy(), r.compilation_strategy,
+                r.buffer_size, r.sample_rate, r.instances, r.parameters, r.voices)
+
+    measured: Dict[tuple[int, FaustStrategy, CompilationStrategy, int, int, int, ParameterSet,
+                         int],
+                   FaustBenchmarkRun] = {}
+    for r in runs:
+        if key(r) not in measured:
+            measured[key(r)] = replace(r, faust_strategy=r.measured_strategy())
+
+    batches: Dict[tuple, FaustBenchmarkBatch] = {}
+    for r in measured.values():
+        if override or not r.is_up_to_date():
+            batches.setdefault(r.settings(), FaustBenchmarkBatch([])).runs.append(r)
+
+    for batch in batches.values():
+        batch.run()
+
+    results = {k: r.parse_output() for k, r in measured.items()}
+    return [replace(results[key(r)], run=r) for r in runs]
 
 
 class FaustTestingPlan:
     programs: List[FaustProgram]
     scheduling_strategies: List[Scheduling]
+    cache: Optional[BuildCache]
+    isolated: bool
 
     def __init__(self,
                  programs: List[FaustProgram],
-                 scheduling_strategies: List[Scheduling] = Scheduling.all()):
+                 scheduling_strategies: List[Scheduling] = Scheduling.all(),
+                 cache: Optional[BuildCache] = None,
+                 isolated: bool = False):
         self.programs = programs
         self.scheduling_strategies = scheduling_strategies
+        self.cache = cache
+        self.isolated = isolated
 
-    def build(self) -> List[FaustTest]:
-        tests: List[FaustTest] = []
-        tasks: List[Task] = []
-
-        make(TEST_BINARY)
+    def tasks(self) -> List[tuple[FaustTest, List[Task]]]:
+        """Creates the tests of the plan, each with the tasks that build it"""
+        plan: List[tuple[FaustTest, List[Task]]] = []
 
         for program in self.programs:
             program.make_build_directory()
 
             faust_strategies = [FaustStrategy(s) for s in self.scheduling_strategies]
             test = FaustTest(program, faust_strategies)
-            tests.append(test)
 
-            for faust_strategy in faust_strategies:
-                faust_task = FaustTask(program, faust_strategy)
-                tasks.append(faust_task)
-                tasks.append(FaustTestTask(test, faust_task))
+            faust_tasks = [FaustTask(program, s) for s in faust_strategies]
+            test_tasks = [FaustTestTask(test, faust_task, faust_tasks)
+                          for faust_task in faust_tasks]
+            plan.append((test, faust_tasks + test_tasks))
 
-        scheduler = BuildScheduler(tasks)
-        scheduler.run()
+        return plan
+
+    def check_build(self, test: FaustTest, tasks: List[Task]):
+        # Group the strategies generating identical code, if no build task did it already
+        test.variants.resolve([t for t in tasks if isinstance(t, FaustTask)])
 
         # Remove failed tasks from the test so the plan can still go on with the others
         for task in tasks:
             if task.failed:
                 if isinstance(task, FaustTask):
-                    for t in tests:
-                        if t.program != task.program:
-                            continue
-                        t.faust_strategies = [s for s in t.faust_strategies
-                                              if s != task.strategy]
+                    test.faust_strategies = [s for s in test.faust_strategies
+                                             if s != task.strategy]
                 elif isinstance(task, FaustTestTask):
-                    for t in tests:
-                        if t.program != task.test.program:
-                            continue
-                        t.faust_strategies = [s for s in t.faust_strategies 
-                                              if s != task.faust_strategy]
+                    failed = test.variants.equivalents(task.faust_strategy)
+                    test.faust_strategies = [s for s in test.faust_strategies
+                                             if s not in failed]
+
+    def build(self) -> List[FaustTest]:
+        make(TEST_BINARY)
+
+        plan = self.tasks()
+        scheduler = BuildScheduler([t for _, tasks in plan for t in tasks], self.cache)
+        scheduler.run()
+
+        for test, tasks in plan:
+            self.check_build(test, tasks)
+
+        return [test for test, _ in plan]
+
+    def pipeline(self) -> Iterator[FaustTest]:
+        """Builds the tests in the background, and yields each one as soon as it is built"""
+        make(TEST_BINARY)
 
-        return tests
+        for test, tasks in BuildPipeline(self.tasks(), self.cache):
+            self.check_build(test, tasks)
+            yield test
 
     def run(self) -> List[FaustTestResult]:
-        tests = self.build()
-        runs = [FaustTestRun(t) for t in tests]
-        return [r.run() for r in runs]
+        return [FaustTestRun(t, self.isolated).run() for t in self.pipeline()]
 
 
 class FaustBenchmarkingPlan:
     programs: List[FaustProgram]
     scheduling_strategies: List[Scheduling]
+    codegen_options: List[CodegenOptions]
 
     compilers: List[Compiler]
     architectures: List[Architecture]
+    compiler_options: List[CompilerOptions]
 
     loops: int
     events: List[PerfEvent]
@@ -391,86 +1186,269 @@ class FaustBenchmarkingPlan:
 
     override: bool
     tested_schedulings: List[Scheduling]
+    cache: Optional[BuildCache]
+    history: Optional[HistoryStore]
+
+    jobs: int
+    cpus: Optional[List[int]]
+
+    precision: Optional[float]
+    min_loops: int
+    subtract_overhead: bool
+    measure_overhead: bool
+    streaming: bool
+    interleave: Optional[int]
+    buffer_sizes: List[int]
+    sample_rates: List[int]
+    instances: List[int]
+
+    # When set, schedrun compiles the programs in memory with libfaust instead
+    # of loading shared objects built by the plan, for a faster exploration
+    jit: bool
+
+    signal: str
+    parameter_sets: List[ParameterSet]
+    automation: Optional[str]
+    voices: List[int]
 
     def __init__(self,
                  programs: List[FaustProgram],
                  scheduling_strategies: List[Scheduling] = Scheduling.all(),
-                 compilers: List[Compiler] = [Compiler.default()],
-                 architectures: List[Architecture] = [Architecture.default()],
+                 compilers: Optional[List[Compiler]] = None,
+                 architectures: Optional[List[Architecture]] = None,
                  loops: int = 100,
-                 events: List[PerfEvent] = [],
+                 events: Optional[List[PerfEvent]] = None,
                  bench_type: BenchType = BenchType.default(),
                  override: bool = False,
-                 tested_schedulings: List[Scheduling] = []):
+                 tested_schedulings: Optional[List[Scheduling]] = None,
+                 cache: Optional[BuildCache] = None,
+                 history: Optional[HistoryStore] = None,
+                 jobs: int = 1,
+                 cpus: Optional[List[int]] = None,
+                 precision: Optional[float] = None,
+                 min_loops: int = 100,
+                 subtract_overhead: bool = False,
+                 measure_overhead: bool = False,
+                 streaming: bool = False,
+                 interleave: Optional[int] = None,
+                 buffer_sizes: Optional[List[int]] = None,
+                 sample_rates: Optional[List[int]] = None,
+                 instances: Optional[List[int]] = None,
+                 codegen_options: Optional[List[CodegenOptions]] = None,
+                 compiler_options: Optional[List[CompilerOptions]] = None,
+                 jit: bool = False,
+                 signal: str = DEFAULT_SIGNAL,
+                 parameter_sets: Optional[List[ParameterSet]] = None,
+                 automation: Optional[str] = None,
+                 voices: Optional[List[int]] = None):
         self.programs = programs
         self.scheduling_strategies = scheduling_strategies
-        self.compilers = compilers
-        self.architectures = architectures
+        self.codegen_options = codegen_options if codegen_options is not None \
+            else [CodegenOptions()]
+        self.compiler_options = compiler_options if compiler_options is not None \
+            else [CompilerOptions()]
+        self.compilers = compilers if compilers is not None else [Compiler.default()]
+        self.architectures = architectures if architectures is not None \
+            else [Architecture.default()]
         self.loops = loops
-        self.events = events
+        self.events = events if events is not None else []
         self.bench_type = bench_type
         self.override = override
-        self.tested_schedulings = tested_schedulings
-
-    def build(self) -> List[FaustBenchmark]:
-        benchmarks: List[FaustBenchmark] = []
-        tasks: List[Task] = []
-
-        make(BENCH_BINARY)
+        self.tested_schedulings = tested_schedulings if tested_schedulings is not None else []
+        self.cache = cache
+        self.history = history
+        self.jobs = jobs
+        self.cpus = cpus
+        self.precision = precision
+        self.min_loops = min_loops
+        self.subtract_overhead = subtract_overhead
+        self.measure_overhead = measure_overhead
+        self.streaming = streaming
+        self.interleave = interleave
+        self.buffer_sizes = buffer_sizes if buffer_sizes is not None else [BENCH_BUFFER_SIZE]
+        self.sample_rates = sample_rates if sample_rates is not None else [BENCH_SAMPLE_RATE]
+        self.instances = instances if instances is not None else [1]
+        self.jit = jit
+        self.signal = signal
+        self.parameter_sets = parameter_sets if parameter_sets is not None else [ParameterSet()]
+        self.automation = automation
+        self.voices = voices if voices is not None else [0]
+
+    def tasks(self) -> List[tuple[FaustBenchmark, List[Task]]]:
+        """Creates the benchmarks of the plan, each with the tasks that build it"""
+        plan: List[tuple[FaustBenchmark, List[Task]]] = []
 
         for program in self.programs:
             program.make_build_directory()
 
-            faust_strategies = [FaustStrategy(s) for s in self.scheduling_strategies]
-            compilation_strategies = [CompilationStrategy(compiler, architecture)
+            faust_strategies = [FaustStrategy(s, codegen)
+                                for s in self.scheduling_strategies
+                                for codegen in self.codegen_options]
+            compilation_strategies = [CompilationStrategy(compiler, architecture, options)
                                       for compiler in self.compilers
-                                      for architecture in self.architectures]
+                                      for architecture in self.architectures
+                                      for options in self.compiler_options]
+            if self.jit:
+                # libfaust compiles for the host, with its own optimizations
+                compilation_strategies = [CompilationStrategy(Compiler.LIBFAUST,
+                                                              Architecture.NATIVE)]
 
             benchmark = FaustBenchmark(program, faust_strategies, compilation_strategies,
-                                       self.loops, self.events, self.bench_type, self.override)
-            benchmarks.append(benchmark)
-
-            for faust_strategy in faust_strategies:
-                if len(self.tested_schedulings) > 0 and \
-                        faust_strategy.scheduling not in self.tested_schedulings:
-                    continue
-
-                faust_task = FaustTask(program, faust_strategy)
-                tasks.append(faust_task)
+                                       self.loops, self.events, self.bench_type, self.override,
+                                       precision=self.precision, min_loops=self.min_loops,
+                                       subtract_overhead=self.subtract_overhead,
+                                       measure_overhead=self.measure_overhead,
+                                       streaming=self.streaming,
+                                       interleave=self.interleave,
+                                       buffer_sizes=self.buffer_sizes,
+                                       sample_rates=self.sample_rates,
+                                       instances=self.instances,
+                                       jit_cache=self.jit_cache(),
+                                       signal=self.signal,
+                                       parameter_sets=self.parameter_sets,
+                                       automation=self.automation,
+                                       voices=self.voices)
+            if self.jit:
+                # Nothing to build: schedrun compiles the programs itself
+                plan.append((benchmark, []))
+                continue
+
+            faust_tasks = [FaustTask(program, faust_strategy)
+                           for faust_strategy in faust_strategies
+                           if len(self.tested_schedulings) == 0
+                           or faust_strategy.scheduling in self.tested_schedulings]
+            benchmark_tasks = [task
+                               for faust_task in faust_tasks
+                               for compilation_strategy in compilation_strategies
+                               for task in self.benchmark_tasks(benchmark, faust_task,
+                                                                compilation_strategy, faust_tasks)]
+            plan.append((benchmark, faust_tasks + benchmark_tasks))
+
+        return plan
+
+    def jit_cache(self) -> Optional[str]:
+        """Where schedrun caches the machine code of the programs it compiles, if anywhere"""
+        if not self.jit or self.cache is None:
+            return None
+        return os.path.join(self.cache.directory, 'jit')
 
-                for compilation_strategy in compilation_strategies:
-                    tasks.append(FaustBenchmarkTask(benchmark, faust_task, compilation_strategy))
+    def make_bench_binary(self):
+        make(BENCH_BINARY, variables=['JIT=1'] if self.jit else [])
 
-        scheduler = BuildScheduler(tasks)
-        scheduler.run()
+    @staticmethod
+    def benchmark_tasks(benchmark: FaustBenchmark, faust_task: FaustTask,
+                        compilation_strategy: CompilationStrategy,
+                        faust_tasks: List[FaustTask]) -> List[Task]:
+        """
+        The tasks building the shared object of a strategy: profile-guided
+        builds are instrumented, trained with the basic runner, then built
+        again with the profile
+        """
+        if not compilation_strategy.options.pgo:
+            return [FaustBenchmarkTask(benchmark, faust_task, compilation_strategy, faust_tasks)]
+
+        instrumented = InstrumentedBenchmarkTask(benchmark, faust_task, compilation_strategy,
+                                                 faust_tasks)
+        training = ProfileTrainingTask(instrumented)
+        tasks: List[Task] = [instrumented, training]
+        if compilation_strategy.compiler != Compiler.GCC:
+            tasks.append(ProfileMergeTask(training))
+        tasks.append(FaustBenchmarkTask(benchmark, faust_task, compilation_strategy, faust_tasks,
+                                        profile_task=tasks[-1]))
+        return tasks
+
+    def check_build(self, benchmark: FaustBenchmark, tasks: List[Task]) -> bool:
+        """
+        Removes the strategies that failed to build from the benchmark, and
+        returns False if none of them is left
+        """
+        # Group the strategies generating identical code, if no build task did it already
+        benchmark.variants.resolve([t for t in tasks if isinstance(t, FaustTask)])
 
-        # Remove failed tasks from the test so the plan can still go on with the others
+        # Remove failed tasks from the benchmark so the plan can still go on with the others
         for task in tasks:
             if task.failed:
                 if isinstance(task, FaustTask):
-                    for b in benchmarks:
-                        if b.program != task.program:
-                            continue
-                        b.faust_strategies = [s for s in b.faust_strategies
-                                              if s != task.strategy]
+                    benchmark.faust_strategies = [s for s in benchmark.faust_strategies
+                                                  if s != task.strategy]
                 elif isinstance(task, FaustBenchmarkTask):
-                    for b in benchmarks:
-                        if b.program != task.benchmark.program:
-                            continue
-                        b.faust_strategies = [s for s in b.faust_strategies 
-                                              if s != task.faust_strategy]
+                    failed = benchmark.variants.equivalents(task.faust_strategy)
+                    benchmark.faust_strategies = [s for s in benchmark.faust_strategies
+                                                  if s not in failed]
+
+        return len(benchmark.faust_strategies) > 0
 
-        benchmarks = [b for b in benchmarks if len(b.faust_strategies) > 0]
+    def build(self) -> List[FaustBenchmark]:
+        self.make_bench_binary()
+
+        plan = self.tasks()
+        scheduler = BuildScheduler([t for _, tasks in plan for t in tasks], self.cache)
+        scheduler.run()
 
-        return benchmarks
+        return [benchmark for benchmark, tasks in plan if self.check_build(benchmark, tasks)]
+
+    def pipeline(self, *,
+                 build_cpus: Optional[List[int]] = None,
+                 benchmark_cpus: Optional[List[int]] = None) -> Iterator[FaustBenchmark]:
+        """
+        Builds the benchmarks in the background, and yields each one as soon as
+        it is built. The caller can run it right away: it is moved to CPUs
+        reserved for benchmarks, away from the build workers.
+        """
+        self.make_bench_binary()
+
+        if build_cpus is None or benchmark_cpus is None:
+            build_cpus, benchmark_cpus = split_cpus(self.jobs, self.cpus)
+        for benchmark, tasks in BuildPipeline(self.tasks(), self.cache,
+                                              build_cpus=build_cpus,
+                                              benchmark_cpus=benchmark_cpus):
+            if self.check_build(benchmark, tasks):
+                yield benchmark
+
+    def measure(self) -> Iterator[tuple[FaustBenchmark, List[FaustBenchmarkResult]]]:
+        """
+        Builds and runs the benchmarks, and yields each one with its results as
+        soon as it is measured. Up to `jobs` benchmarks run at the same time,
+        each bound to its own physical core. Benchmarks running several
+        instances at the same time get all the benchmark cores instead, one
+        per instance. Results are recorded in the history store, if any.
+        """
+        ncores = max(self.jobs, *self.instances)
+        build_cpus, benchmark_cpus = split_cpus(ncores, self.cpus)
+        if len(benchmark_cpus) < ncores:
+            print(f'WARNING: only {len(benchmark_cpus)} physical cores available for benchmarks')
+
+        cpus: queue.Queue[set[int]] = queue.Queue()
+        if max(self.instances) > 1:
+            cpus.put(set(benchmark_cpus))
+        else:
+            for cpu in benchmark_cpus:
+                cpus.put({cpu})
+
+        def run(benchmark: FaustBenchmark) -> tuple[FaustBenchmark, List[FaustBenchmarkResult]]:
+            cpu_set = cpus.get()
+            try:
+                # schedrun inherits the affinity of the thread starting it
+                os.sched_setaffinity(0, cpu_set)
+                results = benchmark.run()
+            finally:
+                cpus.put(cpu_set)
+            if self.history is not None:
+                self.history.record(results)
+            return benchmark, results
+
+        with ThreadPoolExecutor(max_workers=cpus.qsize()) as executor:
+            pending = set()
+            for benchmark in self.pipeline(build_cpus=build_cpus, benchmark_cpus=benchmark_cpus):
+                pending.add(executor.submit(run, benchmark))
+                for future in [f for f in pending if f.done()]:
+                    pending.remove(future)
+                    yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
 
     def run(self) -> List[FaustBenchmarkResult]:
-        benchmarks = self.build()
-        runs = [FaustBenchmarkRun(b, f, c, self.loops, self.events, self.bench_type) 
-                for b in benchmarks
-                for f in b.faust_strategies
-                for c in b.compilation_strategies]
-        return [r.run(override=self.override) for r in runs]
+        return [result for _, results in self.measure() for result in results]
 
 
 def faust_executable():
@@ -481,12 +1459,68 @@ def faust_executable():
         return 'faust'
 
 
-def make(target: str):
-    subprocess.call(['make',
-                     f'-C{ROOT_DIR}',
-                     '--silent',
-                     f'-j{multiprocessing.cpu_count()}',
-                     target])
+CPP_COMMENT_OR_STRING = re.compile(r'"(?:\\.|[^"\\])*"|/\*.*?\*/|//[^\n]*', re.DOTALL)
+CPP_COMPILE_OPTIONS = re.compile(r'^.*declare\("compile_options",.*$', re.MULTILINE)
+
+
+def cpp_fingerprint(path: str) -> str:
+    """
+    Returns a hash of generated C++ code that ignores comments, the
+    compile_options metadata and blank lines. FAUST writes its command line,
+    file paths and version there, which do not change the compiled code.
+    """
+    with open(path) as f:
+        code = f.read()
+    code = CPP_COMMENT_OR_STRING.sub(
+            lambda m: m.group(0) if m.group(0).startswith('"') else '', code)
+    code = CPP_COMPILE_OPTIONS.sub('', code)
+    lines = [line.strip() for line in code.splitlines()]
+    normalized = '\n'.join(line for line in lines if len(line) > 0)
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def make(target: str, jobserver: Optional[JobServer] = None, variables: List[str] = []):
+    """Builds a target of the Makefile, sharing the job slots of the build tasks"""
+    if jobserver is None:
+        jobserver = default_jobserver()
+    with jobserver.slot():
+        subprocess.call(['make', f'-C{ROOT_DIR}', '--silent', *variables, target],
+                        env=jobserver.make_environment(), pass_fds=jobserver.fds())
+
+
+def available_memory() -> int:
+    """Returns the memory available without swapping, in bytes"""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+
+
+# Rough estimates of C++ compilations of generated code, for scheduling only.
+# They are made before the code is generated, so they assume a typical size.
+COMPILE_TYPICAL_SIZE = 32 * 1024
+COMPILE_BYTES_PER_SECOND = 16 * 1024
+COMPILE_BASE_MEMORY = 256 * 1024 * 1024
+COMPILE_MEMORY_PER_BYTE = 4 * 1024
+
+
+def compile_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return COMPILE_TYPICAL_SIZE
+
+
+def compile_cost(path: str) -> float:
+    return compile_size(path) / COMPILE_BYTES_PER_SECOND
+
+
+def compile_memory(path: str) -> int:
+    return COMPILE_BASE_MEMORY + compile_size(path) * COMPILE_MEMORY_PER_BYTE
 
 
 @dataclass
@@ -522,8 +1556,14 @@ class TaskDependencyException(TaskException):
 class Task:
     """Base class for any build task
 
+    A task is up to date when its product has a stamp file holding the cache
+    key it was built from. The key only depends on file contents, tool
+    versions and flags, so checkouts and copies do not trigger rebuilds.
+
     Attributes:
         deps -- list of tasks this task depends on
+        order_only -- list of tasks that must complete before this one, but
+                      whose failure does not prevent it from running
         sources -- list of source files for this tasks that are not produced by
                    the dependencies
         product -- product file for this task
@@ -531,51 +1571,124 @@ class Task:
     sources: List[str]
     product: str
     dependencies: List[Task]
+    order_only: List[Task]
 
     complete: bool = False
     running: bool = False
     failed: bool = False
 
-    def __init__(self, sources: List[str], product: str, dependencies: List[Task] = []):
+    def __init__(self, sources: List[str], product: str, dependencies: List[Task] = [],
+                 order_only: List[Task] = []):
         self.sources = sources
         self.product = product
         self.dependencies = dependencies
+        self.order_only = order_only
 
     def is_ready(self) -> bool:
-        return all(d.complete for d in self.dependencies)
+        return all(d.complete for d in self.dependencies + self.order_only)
 
-    def is_up_to_date(self) -> bool:
+    def cost(self) -> float:
+        """Estimated duration of the task in seconds, used to schedule long chains first"""
+        return 1.0
+
+    def memory(self) -> int:
+        """Estimated peak memory used by the task, in bytes"""
+        return 0
+
+    def cache_key(self) -> Optional[str]:
         """
-        Returns True iff this tasks's product exists and is newer than all its
-        sources, and all the dependencies have been completed
+        Returns a key identifying this task's product from the contents of its
+        sources, the versions of the tools it runs and its command line, or
+        None if some of the sources do not exist
         """
-        if not os.path.exists(self.product):
+        inputs = self.sources + self.extra_dependencies()
+        if not all(os.path.exists(s) for s in inputs):
+            return None
+        return BuildCache.key([type(self).__name__]
+                              + [tool_version(t) for t in self.tools()]
+                              + [self.digest(s) for s in inputs]
+                              + self.portable_command())
+
+    def digest(self, path: str) -> str:
+        return file_digest(path)
+
+    def portable_command(self) -> List[str]:
+        """
+        Returns the command with paths replaced by placeholders, so that the
+        same build in another directory or checkout gets the same cache key
+        """
+        aliases = [(self.product, '$product')]
+        aliases += [(s, f'$source{i}') for i, s in enumerate(self.sources)]
+        aliases += [(d, f'$dep{i}') for i, d in enumerate(self.extra_dependencies())]
+        aliases += [(d, f'$dir{i}') for i, d in enumerate(self.directories())]
+        aliases += [(ROOT_DIR, '$root')]
+        # Replace the longest paths first, as they may contain the others
+        aliases = sorted([a for a in aliases if len(a[0]) > 0],
+                         key=lambda a: len(a[0]), reverse=True)
+
+        command = []
+        for arg in self.command():
+            for path, alias in aliases:
+                arg = arg.replace(path, alias)
+            command.append(arg)
+        return command
+
+    def stamp_path(self) -> str:
+        return f'{self.product}.key'
+
+    def is_up_to_date(self, key: Optional[str]) -> bool:
+        """
+        Returns True iff this task's product exists and was built from the
+        given cache key
+        """
+        if key is None or not os.path.exists(self.product):
+            return False
+        try:
+            with open(self.stamp_path()) as stamp:
+                return stamp.read().strip() == key
+        except FileNotFoundError:
             return False
-        for s in self.sources + self.extra_dependencies():
-            if not os.path.exists(s):
-                return False
-            if os.path.getmtime(s) > os.path.getmtime(self.product):
-                return False
-        return True
 
-    def run(self):
-        if self.is_up_to_date():
-            return
+    def write_stamp(self, key: str):
+        with open(self.stamp_path(), 'w') as stamp:
+            stamp.write(key)
 
+    def run(self, cache: Optional[BuildCache] = None):
+        """Run the task, unless its product is up to date or cached"""
         for d in self.dependencies:
             if d.failed:
                 raise TaskDependencyException(self, d)
 
-        """Run the task"""
+        key = self.cache_key()
+        if self.is_up_to_date(key):
+            return
+
+        if key is not None and cache is not None and cache.fetch(key, self.product):
+            self.write_stamp(key)
+            return
+
         self.print_info()
         # print(f'\033[2m{" ".join(self.command())}\033[22m')
         process = subprocess.run(self.command(), capture_output=True, text=True)
         if process.returncode:
             raise TaskRunException(self, process)
 
+        if key is not None:
+            if cache is not None:
+                cache.store(key, self.product)
+            self.write_stamp(key)
+
     def extra_dependencies(self) -> List[str]:
         return []
 
+    def tools(self) -> List[str]:
+        """Executables whose version affects the product"""
+        return []
+
+    def directories(self) -> List[str]:
+        """Directories appearing in the command that do not affect the product"""
+        return []
+
     def command(self) -> List[str]:
         raise Exception('Not implemented')
 
@@ -600,26 +1713,30 @@ class FaustTask(Task):
         super(FaustTask, self).__init__([program.src], program.cpp_path(strategy))
 
     def extra_dependencies(self):
-        return [FAUST_ARCH]
+        return [FAUST_ARCH] + self.program.libraries()
+
+    def tools(self):
+        return [faust_executable()]
 
     def command(self):
         return [faust_executable(),
                 '-a', FAUST_ARCH,
                 '-lang', 'ocpp',
                 # '-sg', # Print signal graph
-                '-ss', self.strategy.scheduling,
+                *self.program.faust_options(),
+                *self.strategy.options(),
                 '-o', self.product,
                 self.sources[0]]
 
     def print_info(self):
-        print(f'FAUST  {self.program.src} [strategy {self.strategy.scheduling}]')
+        print(f'FAUST  {self.program.src} [{self.strategy}]')
 
-    def run(self):
+    def run(self, cache: Optional[BuildCache] = None):
         # Faust sometimes outputs an empty C++ file upon failure. It's better
         # to delete it, otherwise the next run will consider this file as
         # valid and try to compile it.
         try:
-            super(FaustTask, self).run()
+            super(FaustTask, self).run(cache)
         except TaskRunException as err:
             if os.path.exists(self.product):
                 os.remove(self.product)
@@ -627,19 +1744,50 @@ class FaustTask(Task):
 
 
 class FaustTestTask(Task):
-    """Compile a C++ dsp into a C++ object file for testing"""
+    """Compile a C++ dsp into a C++ object file for testing
+
+    The task waits for the generated code of every strategy of the program,
+    and does nothing if another strategy generated the same code.
+    """
 
     test: FaustTest
     faust_strategy: FaustStrategy
+    faust_tasks: List[FaustTask]
 
-    def __init__(self, test: FaustTest, faust_task: FaustTask):
+    def __init__(self, test: FaustTest, faust_task: FaustTask,
+                 program_faust_tasks: List[FaustTask] = []):
         self.test = test
         self.faust_strategy = faust_task.strategy
+        self.faust_tasks = [faust_task] + [t for t in program_faust_tasks if t is not faust_task]
 
         super(FaustTestTask, self).__init__(
                 [test.program.cpp_path(self.faust_strategy)],
-                test.path(self.faust_strategy),
-                [faust_task])
+                test.program.test_path(self.faust_strategy),
+                [faust_task],
+                [t for t in program_faust_tasks if t is not faust_task])
+
+    def run(self, cache: Optional[BuildCache] = None):
+        self.test.variants.resolve(self.faust_tasks)
+        if self.test.variants.is_representative(self.faust_strategy):
+            super(FaustTestTask, self).run(cache)
+
+    def digest(self, path):
+        return cpp_fingerprint(path) if path == self.sources[0] else file_digest(path)
+
+    def cost(self):
+        return compile_cost(self.sources[0])
+
+    def memory(self):
+        return compile_memory(self.sources[0])
+
+    def extra_dependencies(self):
+        return [FAUST_UI]
+
+    def tools(self):
+        return [Compiler.default()]
+
+    def directories(self):
+        return [self.test.program.directory]
 
     def command(self):
         return [Compiler.default(),
@@ -649,32 +1797,80 @@ class FaustTestTask(Task):
                 '-shared', '-fPIC', '-o', self.product]
 
     def print_info(self):
-        print(f'CXX    {self.test.program.src} '
-              f'[strategy {self.faust_strategy.scheduling}]')
+        print(f'CXX    {self.test.program.src} [{self.faust_strategy}]')
 
 
 class FaustBenchmarkTask(Task):
-    """Compile a C++ dsp into a C++ object file for benchmarking"""
+    """Compile a C++ dsp into a C++ object file for benchmarking
+
+    The task waits for the generated code of every strategy of the program,
+    and does nothing if another strategy generated the same code. Builds
+    with profile-guided optimization also wait for the profile of their
+    training run.
+    """
 
     benchmark: FaustBenchmark
     faust_strategy: FaustStrategy
     compilation_strategy: CompilationStrategy
+    profile_task: Optional[Task]
+    faust_tasks: List[FaustTask]
 
     def __init__(self, benchmark: FaustBenchmark, faust_task: FaustTask,
-                 compilation_strategy: CompilationStrategy):
+                 compilation_strategy: CompilationStrategy,
+                 program_faust_tasks: List[FaustTask] = [],
+                 profile_task: Optional[Task] = None):
         self.benchmark = benchmark
         self.faust_strategy = faust_task.strategy
+        self.faust_tasks = [faust_task] + [t for t in program_faust_tasks if t is not faust_task]
         self.compilation_strategy = compilation_strategy
+        self.profile_task = profile_task
 
         super(FaustBenchmarkTask, self).__init__(
             [benchmark.program.cpp_path(self.faust_strategy)],
-            benchmark.path(self.faust_strategy, compilation_strategy),
-            [faust_task])
+            benchmark.program.benchmark_path(self.faust_strategy, compilation_strategy),
+            [faust_task] + ([profile_task] if profile_task is not None else []),
+            [t for t in program_faust_tasks if t is not faust_task])
+
+    def run(self, cache: Optional[BuildCache] = None):
+        self.benchmark.variants.resolve(self.faust_tasks)
+        if self.benchmark.variants.is_representative(self.faust_strategy):
+            super(FaustBenchmarkTask, self).run(cache)
+
+    def digest(self, path):
+        return cpp_fingerprint(path) if path == self.sources[0] else file_digest(path)
+
+    def cost(self):
+        return compile_cost(self.sources[0])
+
+    def memory(self):
+        return compile_memory(self.sources[0])
+
+    def extra_dependencies(self):
+        if self.profile_task is not None:
+            return [FAUST_UI, self.profile_task.product]
+        return [FAUST_UI]
+
+    def tools(self):
+        return [self.compilation_strategy.compiler]
+
+    def directories(self):
+        return [os.path.abspath(self.benchmark.program.directory),
+                self.benchmark.program.directory]
+
+    def profile_flags(self) -> List[str]:
+        if self.profile_task is None:
+            return []
+        return self.compilation_strategy.profile_use_flags(self.profile_base())
+
+    def profile_base(self) -> str:
+        # Profiles are written and looked up from wherever the build runs
+        return os.path.abspath(self.benchmark.program.profile_base(self.faust_strategy,
+                                                                   self.compilation_strategy))
 
     def command(self):
         return [self.compilation_strategy.compiler,
-                f'-march={self.compilation_strategy.architecture}',
-                '-O3', '-ffast-math', '--std=c++20',
+                *self.compilation_strategy.flags(),
+                *self.profile_flags(),
                 f'-I{self.benchmark.program.directory}', f'-I{ROOT_DIR}/arch',
                 self.sources[0],
                 '-shared', '-fPIC', '-o', self.product]
@@ -684,19 +1880,191 @@ class FaustBenchmarkTask(Task):
               f'[{self.faust_strategy}, {self.compilation_strategy}]')
 
 
+class InstrumentedBenchmarkTask(FaustBenchmarkTask):
+    """Compile a C++ dsp into a shared object writing a profile when it runs"""
+
+    def __init__(self, benchmark: FaustBenchmark, faust_task: FaustTask,
+                 compilation_strategy: CompilationStrategy,
+                 program_faust_tasks: List[FaustTask] = []):
+        super(InstrumentedBenchmarkTask, self).__init__(benchmark, faust_task,
+                                                        compilation_strategy, program_faust_tasks)
+        self.product = benchmark.program.instrumented_path(self.faust_strategy,
+                                                           compilation_strategy)
+
+    def profile_flags(self) -> List[str]:
+        return self.compilation_strategy.profile_generate_flags(self.profile_base())
+
+    def print_info(self):
+        print(f'CXX    {self.benchmark.program.src} '
+              f'[{self.faust_strategy}, {self.compilation_strategy}, instrumented]')
+
+
+PGO_TRAINING_LOOPS = 1000
+
+
+class ProfileTrainingTask(Task):
+    """Run an instrumented shared object with the basic runner to write its profile"""
+
+    benchmark: FaustBenchmark
+    faust_strategy: FaustStrategy
+    compilation_strategy: CompilationStrategy
+
+    def __init__(self, instrumented_task: InstrumentedBenchmarkTask):
+        self.benchmark = instrumented_task.benchmark
+        self.faust_strategy = instrumented_task.faust_strategy
+        self.compilation_strategy = instrumented_task.compilation_strategy
+
+        super(ProfileTrainingTask, self).__init__(
+            [instrumented_task.product],
+            self.benchmark.program.raw_profile_path(self.faust_strategy,
+                                                    self.compilation_strategy),
+            [instrumented_task])
+
+    def run(self, cache: Optional[BuildCache] = None):
+        if not self.benchmark.variants.is_representative(self.faust_strategy):
+            return
+        # GCC adds the counts of a run to the profile it finds
+        if not self.is_up_to_date(self.cache_key()) and os.path.exists(self.product):
+            os.remove(self.product)
+        super(ProfileTrainingTask, self).run(cache)
+
+    def extra_dependencies(self):
+        return [os.path.join(ROOT_DIR, BENCH_BINARY)]
+
+    def command(self):
+        return [os.path.join(ROOT_DIR, BENCH_BINARY),
+                BenchType.BASIC.run_opt(),
+                '-n', str(PGO_TRAINING_LOOPS),
+                '-b', str(self.benchmark.buffer_sizes[0]),
+                '-s', str(self.benchmark.sample_rates[0]),
+                '--signal', self.benchmark.signal,
+                *self.benchmark.parameter_sets[0].arguments(),
+                self.sources[0]]
+
+    def print_info(self):
+        print(f'TRAIN  {self.benchmark.program.src} '
+              f'[{self.faust_strategy}, {self.compilation_strategy}]')
+
+
+class ProfileMergeTask(Task):
+    """Convert the raw profile of a clang training run into a profile clang can use"""
+
+    training_task: ProfileTrainingTask
+
+    def __init__(self, training_task: ProfileTrainingTask):
+        self.training_task = training_task
+
+        super(ProfileMergeTask, self).__init__(
+            [training_task.product],
+            training_task.benchmark.program.profile_path(training_task.faust_strategy,
+                                                         training_task.compilation_strategy),
+            [training_task])
+
+    def run(self, cache: Optional[BuildCache] = None):
+        if self.training_task.benchmark.variants.is_representative(
+                self.training_task.faust_strategy):
+            super(ProfileMergeTask, self).run(cache)
+
+    def tools(self):
+        return [LLVM_PROFDATA]
+
+    def command(self):
+        return [LLVM_PROFDATA, 'merge', '-o', self.product, self.sources[0]]
+
+
 class BuildScheduler:
-    """Schedule a list of tasks to be executed in a thread pool"""
+    """Schedule a list of tasks to be executed in a thread pool
+
+    Tasks become ready when all their dependencies are complete. Ready tasks
+    are run by order of their longest remaining path of estimated costs, so
+    that FAUST code generation comes first, followed by the slowest
+    compilations. Every task holds a slot of the jobserver while it runs, and
+    tasks only start while their estimated memory fits in the available
+    memory.
+
+    Attributes:
+        cpus -- CPUs the workers and the processes they start are bound to
+        on_complete -- called by the worker that completed a task
+        jobserver -- pool of job slots shared with make
+        memory_limit -- memory the running tasks may use, in bytes
+    """
 
     tasks: List[Task]
+    cache: Optional[BuildCache]
+    cpus: Optional[List[int]]
+    on_complete: Optional[Callable[[Task], None]]
+    jobserver: JobServer
+    memory_limit: int
     cv: threading.Condition
     error: Optional[BaseException]
 
-    def __init__(self, tasks):
+    ready: List[tuple[float, int, Task]]
+    sequence: Iterator[int]
+    remaining: Dict[int, int]
+    dependents: Dict[int, List[Task]]
+    path_costs: Dict[int, float]
+    ncomplete: int
+    nrunning: int
+    reserved_memory: int
+    task_memory: Dict[int, int]
+
+    def __init__(self, tasks, cache: Optional[BuildCache] = None, *,
+                 cpus: Optional[List[int]] = None,
+                 on_complete: Optional[Callable[[Task], None]] = None,
+                 jobserver: Optional[JobServer] = None,
+                 memory_limit: Optional[int] = None):
         self.tasks = tasks
+        self.cache = cache
+        self.cpus = cpus
+        self.on_complete = on_complete
+        self.jobserver = jobserver if jobserver is not None else default_jobserver()
+        self.memory_limit = memory_limit if memory_limit is not None else available_memory()
         self.cv = threading.Condition()
         self.error = None
 
-    def run(self, *, poolsize=multiprocessing.cpu_count()):
+        scheduled = set(id(t) for t in tasks)
+        self.dependents = defaultdict(list)
+        self.remaining = {}
+        for task in tasks:
+            dependencies = [d for d in task.dependencies + task.order_only
+                            if id(d) in scheduled and not d.complete]
+            self.remaining[id(task)] = len(dependencies)
+            for d in dependencies:
+                self.dependents[id(d)].append(task)
+
+        self.path_costs = {}
+        for task in tasks:
+            self.path_cost(task)
+
+        self.ready = []
+        self.sequence = itertools.count()
+        self.ncomplete = 0
+        self.nrunning = 0
+        self.reserved_memory = 0
+        self.task_memory = {}
+        for task in tasks:
+            if task.complete:
+                self.ncomplete += 1
+            elif self.remaining[id(task)] == 0:
+                self.push_ready(task)
+
+    def path_cost(self, task: Task) -> float:
+        """Returns the estimated cost of the longest chain of tasks starting with this one"""
+        if id(task) not in self.path_costs:
+            self.path_costs[id(task)] = task.cost() + max(
+                    (self.path_cost(d) for d in self.dependents[id(task)]), default=0)
+        return self.path_costs[id(task)]
+
+    def push_ready(self, task: Task):
+        # Estimate the cost again: the sources of the task exist now
+        priority = task.cost() + max(
+                (self.path_costs[id(d)] for d in self.dependents[id(task)]), default=0)
+        heapq.heappush(self.ready, (-priority, next(self.sequence), task))
+
+    def run(self, *, poolsize: Optional[int] = None):
+        if poolsize is None:
+            poolsize = len(self.cpus) if self.cpus is not None else multiprocessing.cpu_count()
+
         threads = [threading.Thread(target=self.run_thread)
                    for _ in range(poolsize)]
 
@@ -710,36 +2078,123 @@ class BuildScheduler:
             raise self.error
 
     def run_thread(self):
+        if self.cpus is not None:
+            os.sched_setaffinity(0, self.cpus)
+
         while (task := self.acquire_next_task()) is not None:
             try:
-                task.run()
+                with self.jobserver.slot():
+                    task.run(self.cache)
             except TaskException as e:
                 task.failed = True
                 print(f'\033[31m{e}\033[0m')
+            except BaseException as e:
+                task.failed = True
+                self.error = e
             finally:
-                task.running = False
-                task.complete = True
-                with self.cv:
-                    self.cv.notify_all()
+                self.complete_task(task)
+                if self.on_complete is not None:
+                    self.on_complete(task)
 
-    def acquire_next_task(self):
+    def acquire_next_task(self) -> Optional[Task]:
         with self.cv:
-            while any(not t.complete for t in self.tasks):
-                if self.error is not None:
-                    return None
-
-                task = self.next_task()
-                if task is not None:
-                    task.running = True
-                    return task
-                else:
-                    self.cv.wait()
+            while self.ncomplete < len(self.tasks) and self.error is None:
+                if len(self.ready) > 0:
+                    _, _, task = self.ready[0]
+                    memory = task.memory()
+                    # A task that does not fit still runs alone
+                    if self.nrunning == 0 or self.reserved_memory + memory <= self.memory_limit:
+                        heapq.heappop(self.ready)
+                        task.running = True
+                        self.task_memory[id(task)] = memory
+                        self.reserved_memory += memory
+                        self.nrunning += 1
+                        return task
+                self.cv.wait()
             return None
 
-    def next_task(self):
+    def complete_task(self, task: Task):
+        with self.cv:
+            task.running = False
+            task.complete = True
+            self.reserved_memory -= self.task_memory.pop(id(task))
+            self.nrunning -= 1
+            self.ncomplete += 1
+            for dependent in self.dependents[id(task)]:
+                self.remaining[id(dependent)] -= 1
+                if self.remaining[id(dependent)] == 0:
+                    self.push_ready(dependent)
+            self.cv.notify_all()
+
+
+class BuildPipeline(Generic[T]):
+    """Build items in the background, and yield each one as soon as its tasks are complete
+
+    Build workers run on the build CPUs, while the thread iterating over the
+    pipeline is moved to the benchmark CPUs until the iteration ends, so that
+    measures are not disturbed by compilations.
+    """
+
+    items: List[tuple[T, List[Task]]]
+    scheduler: BuildScheduler
+    benchmark_cpus: List[int]
+
+    item_indices: Dict[int, List[int]]
+    pending: List[int]
+    ready: queue.Queue[Optional[int]]
+    lock: threading.Lock
+
+    def __init__(self, items: List[tuple[T, List[Task]]], cache: Optional[BuildCache] = None, *,
+                 build_cpus: Optional[List[int]] = None,
+                 benchmark_cpus: Optional[List[int]] = None):
+        if build_cpus is None or benchmark_cpus is None:
+            build_cpus, benchmark_cpus = split_cpus()
+
+        self.items = items
+        self.benchmark_cpus = benchmark_cpus
+        self.pending = [len(tasks) for _, tasks in items]
+        self.ready = queue.Queue()
+        self.lock = threading.Lock()
+
+        self.item_indices = defaultdict(list)
+        for i, (_, tasks) in enumerate(items):
+            for task in tasks:
+                self.item_indices[id(task)].append(i)
+
+        self.scheduler = BuildScheduler([t for _, tasks in items for t in tasks], cache,
+                                        cpus=build_cpus, on_complete=self.task_complete)
+
+    def task_complete(self, task: Task):
+        with self.lock:
+            for i in self.item_indices[id(task)]:
+                self.pending[i] -= 1
+                if self.pending[i] == 0:
+                    self.ready.put(i)
+
+    def build(self):
         try:
-            task = next(t for t in self.tasks
-                        if not t.running and not t.complete and t.is_ready())
-            return task
-        except StopIteration:
-            return None
+            self.scheduler.run()
+        except BaseException as e:
+            self.scheduler.error = e
+        finally:
+            self.ready.put(None)
+
+    def __iter__(self) -> Iterator[tuple[T, List[Task]]]:
+        for i, count in enumerate(self.pending):
+            if count == 0:
+                self.ready.put(i)
+
+        affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, self.benchmark_cpus)
+
+        builder = threading.Thread(target=self.build)
+        builder.start()
+        try:
+            while (i := self.ready.get()) is not None:
+                yield self.items[i]
+        finally:
+            builder.join()
+            os.sched_setaffinity(0, affinity)
+
+        if self.scheduler.error is not None:
+            raise self.scheduler.error
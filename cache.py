@@ -0,0 +1,91 @@
+from __future__ import annotations
+from functools import cache
+from typing import List, Optional
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+
+def default_cache_directory() -> str:
+    try:
+        return os.environ['FCSCHED_CACHE_DIR']
+    except KeyError:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+        return os.path.join(base, 'fcschedtool')
+
+
+def file_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+@cache
+def tool_version(executable: str) -> str:
+    """
+    Returns the version string printed by `executable --version`, so that
+    upgrading the FAUST compiler or the C++ compiler invalidates the cache
+    """
+    try:
+        proc = subprocess.run([executable, '--version'], capture_output=True, text=True)
+    except OSError:
+        return f'{executable}: not found'
+    return proc.stdout.strip()
+
+
+class BuildCache:
+    """A content-addressed store of build products
+
+    Products are stored under a key computed by the task from the contents of
+    its sources, the version of the tools it runs and its exact command line.
+    The store can be shared by every *.fcsched directory and every checkout.
+
+    Attributes:
+        directory -- root directory of the store
+    """
+    directory: str
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory if directory is not None else default_cache_directory()
+
+    @staticmethod
+    def key(parts: List[str]) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def fetch(self, key: str, product: str) -> bool:
+        """Copies the cached product for key to product. Returns False on a miss"""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return False
+        # Products are copied rather than hard-linked: compilers may rewrite
+        # their output in place, which would corrupt the cached entry.
+        copy_atomic(path, product)
+        return True
+
+    def store(self, key: str, product: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+        copy_atomic(product, path)
+
+
+def copy_atomic(src: str, dst: str):
+    """Copy src to dst so that concurrent readers never see a partial file"""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dst) or '.',
+                               prefix=f'.{os.path.basename(dst)}.')
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        shutil.copymode(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        os.remove(tmp)
+        raise
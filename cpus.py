@@ -0,0 +1,117 @@
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import glob
+import itertools
+import os
+
+
+SYSFS_CPU = '/sys/devices/system/cpu'
+
+
+@dataclass(frozen=True)
+class CpuTopology:
+    """Where a logical CPU sits in the machine
+
+    Attributes:
+        cpu -- the logical CPU
+        siblings -- logical CPUs sharing its physical core (SMT), itself included
+        llc -- logical CPUs sharing its last-level cache
+        node -- its NUMA node
+    """
+    cpu: int
+    siblings: Tuple[int, ...]
+    llc: Tuple[int, ...]
+    node: int
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """Parses a list of CPUs in the kernel format, e.g. 0-3,8,10-11"""
+    cpus = []
+    for part in text.strip().split(','):
+        if len(part) == 0:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus += range(int(first), int(last) + 1)
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def read_sysfs(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_topology(cpu: int) -> CpuTopology:
+    base = os.path.join(SYSFS_CPU, f'cpu{cpu}')
+
+    siblings = read_sysfs(os.path.join(base, 'topology/thread_siblings_list'))
+
+    # The last-level cache is the cache with the highest level
+    llc = None
+    llc_level = -1
+    for index in glob.glob(os.path.join(base, 'cache/index*')):
+        level = read_sysfs(os.path.join(index, 'level'))
+        shared = read_sysfs(os.path.join(index, 'shared_cpu_list'))
+        if level is not None and shared is not None and int(level) > llc_level:
+            llc, llc_level = shared, int(level)
+
+    nodes = glob.glob(os.path.join(base, 'node[0-9]*'))
+    node = int(os.path.basename(nodes[0])[len('node'):]) if len(nodes) > 0 else 0
+
+    return CpuTopology(cpu,
+                       tuple(parse_cpu_list(siblings)) if siblings else (cpu,),
+                       tuple(parse_cpu_list(llc)) if llc else (cpu,),
+                       node)
+
+
+def available_cpus() -> List[int]:
+    return sorted(os.sched_getaffinity(0))
+
+
+def select_benchmark_cpus(jobs: int, cpus: List[int]) -> List[int]:
+    """
+    Returns up to `jobs` CPUs among `cpus` to run benchmarks concurrently.
+    Only one logical CPU is taken per physical core, and the CPUs are spread
+    across NUMA nodes and last-level caches, so that concurrent benchmarks
+    share as few resources as possible. Higher CPUs are preferred, as the
+    first ones usually serve more interrupts.
+    """
+    cores = {}
+    for topology in sorted(map(cpu_topology, cpus), key=lambda t: t.cpu, reverse=True):
+        cores.setdefault(topology.siblings, topology)
+
+    domains = defaultdict(list)
+    for topology in cores.values():
+        domains[(topology.node, topology.llc)].append(topology.cpu)
+
+    selected = [cpu
+                for group in itertools.zip_longest(*domains.values())
+                for cpu in group
+                if cpu is not None]
+    return selected[:jobs]
+
+
+def split_cpus(jobs: int = 1, cpus: Optional[List[int]] = None) -> Tuple[List[int], List[int]]:
+    """
+    Splits the CPUs this process may use between build workers and
+    benchmarks, and returns them in this order. Benchmarks get `jobs`
+    physical cores among `cpus` (by default, all the available CPUs), and
+    build workers get the CPUs that do not share a core with them. When there
+    are not enough CPUs, both share all of them.
+    """
+    available = available_cpus()
+    benchmark = select_benchmark_cpus(jobs, cpus if cpus is not None else available)
+
+    reserved = set(sibling for cpu in benchmark for sibling in cpu_topology(cpu).siblings)
+    build = [cpu for cpu in available if cpu not in reserved]
+    if len(build) == 0:
+        return available, benchmark
+    return build, benchmark
@@ -0,0 +1,317 @@
+from __future__ import annotations
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import cache
+from typing import Dict, Iterable, List, Optional
+
+import json
+import math
+import os
+import platform
+import sqlite3
+import subprocess
+
+import numpy
+
+from build import ROOT_DIR, FaustBenchmarkRun, FaustBenchmarkResult, faust_executable
+from cache import tool_version
+
+
+HISTORY_QUANTILE = 0.2
+HISTORY_Z = 1.96
+
+# Records that differ in these fields are of different series
+SERIES_FIELDS = ['program', 'faust_strategy', 'compilation_strategy', 'bench_type',
+                 'buffer_size', 'sample_rate', 'signal', 'controls', 'subtract_overhead',
+                 'instances', 'voices', 'interleave', 'streaming', 'host']
+
+# Fields reported when they changed across a change point
+ENVIRONMENT_FIELDS = ['source_hash', 'cpu_model', 'kernel', 'faust_version', 'compiler_version',
+                      'faust_options', 'flags', 'git_revision', 'tool_revision']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    recorded_at TEXT NOT NULL,
+    measured_at TEXT NOT NULL,
+    measures_path TEXT NOT NULL,
+    program TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    faust_strategy TEXT NOT NULL,
+    compilation_strategy TEXT NOT NULL,
+    bench_type TEXT NOT NULL,
+    loops INTEGER NOT NULL,
+    buffer_size INTEGER NOT NULL,
+    sample_rate INTEGER NOT NULL,
+    signal TEXT NOT NULL DEFAULT 'noise',
+    controls TEXT NOT NULL DEFAULT '',
+    subtract_overhead INTEGER NOT NULL,
+    instances INTEGER NOT NULL DEFAULT 1,
+    voices INTEGER NOT NULL DEFAULT 0,
+    interleave INTEGER NOT NULL DEFAULT 0,
+    streaming INTEGER NOT NULL DEFAULT 0,
+    host TEXT NOT NULL,
+    cpu_model TEXT NOT NULL,
+    kernel TEXT NOT NULL,
+    faust_version TEXT NOT NULL,
+    compiler_version TEXT NOT NULL,
+    faust_options TEXT NOT NULL,
+    flags TEXT NOT NULL,
+    git_revision TEXT NOT NULL,
+    tool_revision TEXT NOT NULL,
+    time_quantile REAL NOT NULL,
+    time_lower REAL NOT NULL,
+    time_upper REAL NOT NULL,
+    events TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    UNIQUE (measures_path, measured_at)
+);
+'''
+
+# Columns added since the first schema, with the value of older results:
+# inputs were noise, controls had their default values, and programs ran
+# alone, not as polyphonic instruments, not interleaved nor streamed
+ADDED_COLUMNS = {
+    'signal': "TEXT NOT NULL DEFAULT 'noise'",
+    'controls': "TEXT NOT NULL DEFAULT ''",
+    'instances': 'INTEGER NOT NULL DEFAULT 1',
+    'voices': 'INTEGER NOT NULL DEFAULT 0',
+    'interleave': 'INTEGER NOT NULL DEFAULT 0',
+    'streaming': 'INTEGER NOT NULL DEFAULT 0',
+}
+
+
+def default_history_path() -> str:
+    try:
+        return os.environ['FCSCHED_HISTORY']
+    except KeyError:
+        base = os.environ.get('XDG_DATA_HOME', os.path.expanduser('~/.local/share'))
+        return os.path.join(base, 'fcschedtool', 'history.sqlite')
+
+
+def git_revision(directory: str) -> str:
+    """The commit checked out in directory, marked dirty if it has local changes"""
+    try:
+        head = subprocess.run(['git', '-C', directory or '.', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True)
+        status = subprocess.run(['git', '-C', directory or '.', 'status', '--porcelain',
+                                 '--untracked-files=no'],
+                                capture_output=True, text=True)
+    except OSError:
+        return ''
+    if head.returncode != 0:
+        return ''
+    return head.stdout.strip() + ('-dirty' if status.stdout.strip() else '')
+
+
+@cache
+def cpu_model() -> str:
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def compiler_executable(run: FaustBenchmarkRun) -> str:
+    # Programs compiled in memory are compiled by the libfaust of the FAUST compiler
+    if run.is_jit():
+        return faust_executable()
+    return run.compilation_strategy.compiler
+
+
+def first_line(text: str) -> str:
+    return text.splitlines()[0] if text else ''
+
+
+def quantile_interval(times: numpy.ndarray) -> tuple[float, float, float]:
+    """
+    The HISTORY_QUANTILE quantile of times, with the bounds of its
+    distribution-free 95% confidence interval, like schedrun -p
+    """
+    n = len(times)
+    if n == 0:
+        return math.nan, math.nan, math.nan
+    q = HISTORY_QUANTILE
+    deviation = HISTORY_Z * math.sqrt(n * q * (1 - q))
+    ranks = [min(max(r, 0), n - 1)
+             for r in [int(n * q), math.floor(n * q - deviation), math.ceil(n * q + deviation)]]
+    value, lower, upper = numpy.partition(times, ranks)[ranks]
+    return float(value), float(lower), float(upper)
+
+
+class HistoryStore:
+    """An append-only SQLite store of benchmark results
+
+    Every result is recorded once, with the environment it was measured in, so
+    that results of different days, machines and tool versions can be
+    compared. Results are never updated nor deleted.
+
+    Attributes:
+        path -- the SQLite database
+    """
+    path: str
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else default_history_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o755, exist_ok=True)
+        with closing(self.connect()) as db, db:
+            db.executescript(SCHEMA)
+            columns = [c['name'] for c in db.execute('PRAGMA table_info(results)')]
+            for column, definition in ADDED_COLUMNS.items():
+                if column not in columns:
+                    db.execute(f'ALTER TABLE results ADD COLUMN {column} {definition}')
+
+    def connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=60)
+        db.row_factory = sqlite3.Row
+        return db
+
+    def record(self, results: Iterable[FaustBenchmarkResult]):
+        """Records results, skipping the ones already recorded"""
+        rows = [self.row(r) for r in results]
+        if len(rows) == 0:
+            return
+        columns = list(rows[0].keys())
+        with closing(self.connect()) as db, db:
+            db.executemany(f'INSERT OR IGNORE INTO results ({", ".join(columns)}) '
+                           f'VALUES ({", ".join("?" * len(columns))})',
+                           [[row[c] for c in columns] for row in rows])
+
+    @staticmethod
+    def row(result: FaustBenchmarkResult) -> Dict[str, object]:
+        run = result.run
+        program = run.benchmark.program
+        path = run.output_path()
+        time_quantile, time_lower, time_upper = quantile_interval(result.times)
+        measured_at = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+
+        return {
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'measured_at': measured_at.isoformat(timespec='seconds'),
+            'measures_path': os.path.abspath(path),
+            'program': program.name,
+            'source_hash': program.source_hash(),
+            'faust_strategy': run.faust_strategy.suffix(),
+            'compilation_strategy': run.compilation_strategy.suffix(),
+            'bench_type': run.bench_type.value,
+            'loops': result.loops,
+            'buffer_size': run.buffer_size,
+            'sample_rate': run.sample_rate,
+            'signal': run.signal,
+            'controls': run.controls(),
+            'subtract_overhead': int(run.benchmark.subtract_overhead),
+            'instances': run.instances,
+            'voices': run.voices,
+            'interleave': run.interleave or 0,
+            'streaming': int(run.streaming),
+            'host': platform.node(),
+            'cpu_model': cpu_model(),
+            'kernel': platform.release(),
+            'faust_version': first_line(tool_version(faust_executable())),
+            'compiler_version': first_line(tool_version(compiler_executable(run))),
+            'faust_options': ' '.join(run.faust_strategy.options()),
+            'flags': ' '.join(run.compilation_strategy.flags()
+                              + (['pgo'] if run.compilation_strategy.options.pgo else [])),
+            'git_revision': git_revision(program.directory),
+            'tool_revision': git_revision(ROOT_DIR),
+            'time_quantile': time_quantile,
+            'time_lower': time_lower,
+            'time_upper': time_upper,
+            'events': json.dumps({e.value: float(numpy.quantile(m, HISTORY_QUANTILE))
+                                  for e, m in result.events.items() if len(m) > 0}),
+            'metadata': json.dumps(result.metadata),
+        }
+
+    def series(self, programs: Optional[List[str]] = None) -> Dict[tuple, List[sqlite3.Row]]:
+        """Records by series, in the order they were measured"""
+        query = 'SELECT * FROM results'
+        if programs:
+            query += f' WHERE program IN ({", ".join("?" * len(programs))})'
+        query += ' ORDER BY measured_at, id'
+
+        series: Dict[tuple, List[sqlite3.Row]] = {}
+        with closing(self.connect()) as db, db:
+            for row in db.execute(query, programs or []):
+                series.setdefault(tuple(row[f] for f in SERIES_FIELDS), []).append(row)
+        return series
+
+
+@dataclass
+class ChangePoint:
+    """A lasting change of the time of a series, between two records
+
+    Attributes:
+        before -- the last record of the segment before the change
+        after -- the first record of the segment after the change
+        time_before -- median time quantile of the segment before
+        time_after -- median time quantile of the segment after
+    """
+    before: sqlite3.Row
+    after: sqlite3.Row
+    time_before: float
+    time_after: float
+
+    def change(self) -> float:
+        return self.time_after / self.time_before - 1
+
+    def environment_changes(self) -> Dict[str, tuple[str, str]]:
+        return {f: (self.before[f], self.after[f])
+                for f in ENVIRONMENT_FIELDS if self.before[f] != self.after[f]}
+
+
+def change_points(records: List[sqlite3.Row], *, threshold: float = 0.02) -> List[ChangePoint]:
+    """
+    Binary segmentation of the log time quantiles of a series: a segment is
+    split where it reduces the squared error the most, if the reduction is
+    above the BIC penalty for the noise of the series, and the medians on each
+    side differ by more than threshold. The noise is the largest of the
+    confidence intervals of the records and of the spread of the differences
+    between consecutive records, so that run-to-run noise is not reported.
+    Records with a time quantile of zero or less, e.g. once the overhead was
+    subtracted, have no log and are skipped, as are the confidence intervals
+    with such a lower bound.
+    """
+    records = [r for r in records if r['time_quantile'] > 0]
+    x = numpy.log([r['time_quantile'] for r in records])
+    n = len(x)
+    if n < 2:
+        return []
+
+    intervals = [(math.log(r['time_upper'] / r['time_lower']) / (2 * HISTORY_Z)) ** 2
+                 for r in records if r['time_lower'] > 0]
+    ci_variance = numpy.median(intervals) if intervals else 0
+    diff_variance = (numpy.median(numpy.abs(numpy.diff(x))) / 0.6745) ** 2 / 2 if n > 2 else 0
+    variance = max(ci_variance, diff_variance, 1e-12)
+    penalty = 2 * math.log(n) * variance
+
+    def cost(a: int, b: int) -> float:
+        segment = x[a:b]
+        return float(numpy.sum((segment - numpy.mean(segment)) ** 2))
+
+    splits: List[int] = []
+
+    def segment(a: int, b: int):
+        if b - a < 2:
+            return
+        gains = [(cost(a, b) - cost(a, k) - cost(k, b), k) for k in range(a + 1, b)]
+        gain, k = max(gains)
+        relative = abs(math.exp(numpy.median(x[k:b]) - numpy.median(x[a:k])) - 1)
+        if gain > penalty and relative > threshold:
+            segment(a, k)
+            splits.append(k)
+            segment(k, b)
+
+    segment(0, n)
+
+    bounds = [0] + splits + [n]
+    points = []
+    for i, k in enumerate(splits):
+        before = float(math.exp(numpy.median(x[bounds[i]:k])))
+        after = float(math.exp(numpy.median(x[k:bounds[i + 2]])))
+        points.append(ChangePoint(records[k - 1], records[k], before, after))
+    return points
@@ -0,0 +1,134 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from functools import cache
+from typing import Dict, Iterator, Optional, Tuple
+
+import os
+import re
+import select
+import threading
+
+from cpus import available_cpus
+
+
+JOBSERVER_AUTH = re.compile(r'--jobserver-(?:auth|fds)=(?:fifo:(\S+)|(\d+),(\d+))')
+
+
+class JobServer:
+    """A pool of job slots shared with make, following the GNU make jobserver protocol
+
+    Every process owns one implicit slot, and must read a token from the pipe
+    before running each additional job, then write it back. When fcschedtool
+    is started by make with a jobserver, it joins it; otherwise it creates a
+    pool of its own, which the make processes it starts join.
+
+    Attributes:
+        read_fd -- read end of the token pipe
+        write_fd -- write end of the token pipe
+        implicit -- True while the implicit slot of this process is free
+        wakeup -- pipe waking up the threads waiting for a token when the
+                  implicit slot is released
+    """
+
+    read_fd: int
+    write_fd: int
+    implicit: bool
+    lock: threading.Lock
+    wakeup: Tuple[int, int]
+
+    def __init__(self, slots: int):
+        fds = inherited_jobserver()
+        if fds is None:
+            fds = os.pipe()
+            os.write(fds[1], b'+' * (slots - 1))
+        self.read_fd, self.write_fd = fds
+        self.implicit = True
+        self.lock = threading.Lock()
+        self.wakeup = os.pipe()
+        os.set_blocking(self.wakeup[0], False)
+
+    def acquire(self) -> Optional[bytes]:
+        """Waits for a free slot, and returns its token, or None for the implicit slot"""
+        while True:
+            with self.lock:
+                if self.implicit:
+                    self.implicit = False
+                    self.drain_wakeup()
+                    return None
+
+            readable, _, _ = select.select([self.read_fd, self.wakeup[0]], [], [])
+            if self.read_fd not in readable:
+                continue
+            # The pipe may be non-blocking when it is shared with make, and
+            # another process may take the token first
+            try:
+                token = os.read(self.read_fd, 1)
+            except BlockingIOError:
+                continue
+            if len(token) == 0:
+                raise EOFError('The jobserver pipe was closed')
+            return token
+
+    def release(self, token: Optional[bytes]):
+        if token is None:
+            with self.lock:
+                self.implicit = True
+                os.write(self.wakeup[1], b'+')
+        else:
+            os.write(self.write_fd, token)
+
+    def drain_wakeup(self):
+        try:
+            while len(os.read(self.wakeup[0], 64)) > 0:
+                pass
+        except BlockingIOError:
+            pass
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        token = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def make_environment(self) -> Dict[str, str]:
+        """
+        Returns the environment for a make process that joins this jobserver.
+        It must be started while holding a slot, which becomes its implicit
+        slot, and with pass_fds=self.fds().
+        """
+        env = dict(os.environ)
+        env['MAKEFLAGS'] = f'-j --jobserver-auth={self.read_fd},{self.write_fd}'
+        return env
+
+    def fds(self) -> Tuple[int, int]:
+        return self.read_fd, self.write_fd
+
+
+def inherited_jobserver() -> Optional[Tuple[int, int]]:
+    """Returns the token pipe of a parent make, if it shares its jobserver with us"""
+    match = JOBSERVER_AUTH.search(os.environ.get('MAKEFLAGS', ''))
+    if match is None:
+        return None
+
+    fifo, read_fd, write_fd = match.groups()
+    if fifo is not None:
+        try:
+            fd = os.open(fifo, os.O_RDWR)
+        except OSError:
+            return None
+        return fd, fd
+
+    # make only passes the pipe to recipes marked with '+'
+    try:
+        os.fstat(int(read_fd))
+        os.fstat(int(write_fd))
+    except OSError:
+        return None
+    return int(read_fd), int(write_fd)
+
+
+@cache
+def default_jobserver() -> JobServer:
+    return JobServer(len(available_cpus()))
@@ -2,17 +2,21 @@ from __future__ import annotations
 
 from collections import defaultdict
 from enum import StrEnum
-from typing import Optional, List, Dict
+from typing import Iterable, Optional, List, Dict
 
 import os
 
 import matplotlib.pyplot as plt
 from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
 import numpy as np
 
-from build import (FaustStrategy, CompilationStrategy, Scheduling, 
-                   FaustBenchmark, FaustBenchmarkResult)
+from build import (FaustStrategy, CompilationStrategy, CodegenOptions, CompilerOptions,
+                   Scheduling, FaustBenchmark, FaustBenchmarkResult)
 from perf import PerfEvent
+from scale import (ProgramFamily, CurveFit, SCALE_MIN_SIZES, fit_curve, crossovers, best_ranges,
+                   size_grid)
 
 
 class PlotType(StrEnum):
@@ -64,44 +68,89 @@ class PlotType(StrEnum):
         return sorted([t for t in PlotType if extended or len(t.events()) <= 4])
 
 
-def faust_strategy_label(strategy: FaustStrategy) -> str:
-    if strategy.scheduling == Scheduling.DEEP_FIRST:
+def scheduling_label(scheduling: Scheduling) -> str:
+    if scheduling == Scheduling.DEEP_FIRST:
         return 'deep-first'
-    if strategy.scheduling == Scheduling.REVERSE_DEEP_FIRST:
+    if scheduling == Scheduling.REVERSE_DEEP_FIRST:
       return 'reverse-deep-first'
-    if strategy.scheduling == Scheduling.BREADTH_FIRST:
+    if scheduling == Scheduling.BREADTH_FIRST:
       return 'breadth-first'
-    if strategy.scheduling == Scheduling.REVERSE_BREADTH_FIRST:
+    if scheduling == Scheduling.REVERSE_BREADTH_FIRST:
       return 'reverse-breadth-first'
-    if strategy.scheduling == Scheduling.INTERLEAVED:
+    if scheduling == Scheduling.INTERLEAVED:
       return 'interleaved'
-    if strategy.scheduling == Scheduling.ADAPTIVE:
+    if scheduling == Scheduling.ADAPTIVE:
       return 'adaptive'
-    if strategy.scheduling == Scheduling.REVERSE_ADAPTIVE:
+    if scheduling == Scheduling.REVERSE_ADAPTIVE:
         return 'reverse-adaptive'
     return 'unknown'
 
 
-def faust_strategy_label_short(strategy: FaustStrategy) -> str:
-    if strategy.scheduling == Scheduling.DEEP_FIRST:
+def scheduling_label_short(scheduling: Scheduling) -> str:
+    if scheduling == Scheduling.DEEP_FIRST:
         return 'DF'
-    if strategy.scheduling == Scheduling.REVERSE_DEEP_FIRST:
+    if scheduling == Scheduling.REVERSE_DEEP_FIRST:
         return 'RDF'
-    if strategy.scheduling == Scheduling.BREADTH_FIRST:
+    if scheduling == Scheduling.BREADTH_FIRST:
         return 'BF'
-    if strategy.scheduling == Scheduling.REVERSE_BREADTH_FIRST:
+    if scheduling == Scheduling.REVERSE_BREADTH_FIRST:
         return 'RBF'
-    if strategy.scheduling == Scheduling.INTERLEAVED:
+    if scheduling == Scheduling.INTERLEAVED:
         return 'I'
-    if strategy.scheduling == Scheduling.ADAPTIVE:
+    if scheduling == Scheduling.ADAPTIVE:
         return 'A'
-    if strategy.scheduling == Scheduling.REVERSE_ADAPTIVE:
+    if scheduling == Scheduling.REVERSE_ADAPTIVE:
         return 'RA'
     return '??'
 
 
+def codegen_label(codegen: CodegenOptions) -> str:
+    return f' {codegen}' if len(codegen.options()) > 0 else ''
+
+
+def faust_strategy_label(strategy: FaustStrategy) -> str:
+    return scheduling_label(strategy.scheduling) + codegen_label(strategy.codegen)
+
+
+def faust_strategy_label_short(strategy: FaustStrategy) -> str:
+    return scheduling_label_short(strategy.scheduling) + codegen_label(strategy.codegen)
+
+
+def equivalents_label(result: FaustBenchmarkResult) -> str:
+    """Marks the strategies that share the generated code of the result's strategy"""
+    equivalents = result.equivalent_strategies()
+    if len(equivalents) == 0:
+        return ''
+    return f' (= {", ".join(faust_strategy_label_short(s) for s in equivalents)})'
+
+
 def compilation_strategy_label(strategy: CompilationStrategy) -> str:
-    return f'{strategy.compiler} {strategy.architecture}'
+    if strategy.options == CompilerOptions():
+        return f'{strategy.compiler} {strategy.architecture}'
+    return f'{strategy.compiler} {strategy.architecture} {strategy.options}'
+
+
+def controls_label(benchmark: FaustBenchmark, result: FaustBenchmarkResult) -> str:
+    """The controls of the result, when the benchmark runs several sets of them"""
+    if len(benchmark.parameter_sets) <= 1 or result.run.controls() == '':
+        return ''
+    return f', {result.run.controls()}'
+
+
+def settings_label(benchmark: FaustBenchmark, result: FaustBenchmarkResult,
+                   exclude: Iterable[str] = ()) -> str:
+    """
+    The buffer size, sample rate, instances and voices of the result, each
+    one when the benchmark runs several of them and it is not excluded, e.g.
+    because it is the x axis of a plot
+    """
+    run = result.run
+    settings = [('buffer_size', benchmark.buffer_sizes, f'{run.buffer_size} frames'),
+                ('sample_rate', benchmark.sample_rates, f'{run.sample_rate} Hz'),
+                ('instances', benchmark.instances, f'{run.instances} instances'),
+                ('voices', benchmark.voices, f'{run.voices} voices')]
+    return ''.join(f', {label}' for name, values, label in settings
+                   if len(values) > 1 and name not in exclude)
 
 
 def line_color(event: PerfEvent) -> str:
@@ -142,8 +191,16 @@ def setup_matplotlib(output: Optional[str]):
         plt.rcParams['figure.dpi'] = 512
 
 
+def loop_numbers(run_result: FaustBenchmarkResult) -> np.typing.NDArray:
+    """
+    The loop of each measure of a result, from 1: every loop, or one loop
+    every trace_step() of streamed runs, whose measures are a decimated trace
+    """
+    return np.arange(len(run_result.times)) * run_result.trace_step() + 1
+
+
 def plot_stalls(run_result: FaustBenchmarkResult, ax: Axes):
-    x = np.arange(1, run_result.loops + 1)
+    x = loop_numbers(run_result)
     lw = 0.5
 
     instructions = run_result.events[PerfEvent.instructions()] / 4
@@ -167,11 +224,11 @@ def plot_stalls(run_result: FaustBenchmarkResult, ax: Axes):
 
     ax.plot(x, run_result.events[PerfEvent.cycles()], lw=lw, label="cycles", color="black")
 
-    ax.set_xlim(xmin=1, xmax=len(x))
+    ax.set_xlim(xmin=1, xmax=x[-1])
 
 
 def plot_uops(run_result: FaustBenchmarkResult, ax: Axes):
-    x = np.arange(1, run_result.loops + 1)
+    x = loop_numbers(run_result)
     lw = 0.5
 
     ax.fill_between(x, 0, run_result.events[PerfEvent.uops_ge_1()],
@@ -194,28 +251,30 @@ def plot_uops(run_result: FaustBenchmarkResult, ax: Axes):
                     color=line_color(PerfEvent.uops_ge_3()),
                     label="cycles with 4 uops")
 
-    ax.set_xlim(xmin=1, xmax=len(x))
+    ax.set_xlim(xmin=1, xmax=x[-1])
 
 
 def plot_events(run_result: FaustBenchmarkResult, ax: Axes):
-    x = np.arange(1, run_result.loops + 1)
+    x = loop_numbers(run_result)
     lw = 1
 
     for ev, y in run_result.events.items():
         ax.plot(x, y, lw=lw, label=ev)
 
-    ax.set_xlim(xmin=1, xmax=len(x))
+    ax.set_xlim(xmin=1, xmax=x[-1])
 
 
 def plot_benchmark_loops(
         benchmark: FaustBenchmark,
+        results: Optional[List[FaustBenchmarkResult]] = None,
         *,
         plot_type: Optional[PlotType] = None,
         output_directory: Optional[str] = None
 ):
     setup_matplotlib(output_directory)
 
-    results = benchmark.run()
+    if results is None:
+        results = benchmark.run()
 
     print(f'PLOT   {benchmark.program.src}')
 
@@ -227,7 +286,10 @@ def plot_benchmark_loops(
 
     ymax = max([np.max(run.events[k]) for run in results for k in run.events.keys()]) * 1.1
 
-    nvariants = len(benchmark.compilation_strategies)
+    # Every run of a FAUST strategy, see FaustBenchmark.run
+    nvariants = len(benchmark.compilation_strategies) * len(benchmark.buffer_sizes) \
+        * len(benchmark.sample_rates) * len(benchmark.instances) \
+        * len(benchmark.parameter_sets) * len(benchmark.voices)
     if nvariants == 1:
         figsize = (6, 6)
     elif nvariants == 2:
@@ -251,12 +313,15 @@ def plot_benchmark_loops(
         squeeze=False,
     )
 
-    for result, ax in zip(results, (axes.T if nvariants >= 4 else axes).flatten()):
+    # Results come by FAUST strategy, one per column when there are several variants
+    for result, ax in zip(results, axes.T.flatten()):
         plot_fn(result, ax)
-        compilation_strategy = result.run.compilation_strategy
         ax.set_title(
-            f"{compilation_strategy.compiler} {compilation_strategy.architecture}, "
+            f"{compilation_strategy_label(result.run.compilation_strategy)}, "
             f"{faust_strategy_label_short(result.run.faust_strategy)}"
+            f"{equivalents_label(result)}"
+            f"{settings_label(benchmark, result)}"
+            f"{controls_label(benchmark, result)}"
         )
         ax.set_ylim(ymin=0, ymax=ymax)
 
@@ -302,11 +367,13 @@ def plot_broken_bar(ax, y, height, sections: list[tuple[np.typing.NDArray, str,
 
 def plot_benchmark_summary(
         benchmark: FaustBenchmark, 
-        output_directory: Optional[str]
+        results: Optional[List[FaustBenchmarkResult]] = None,
+        output_directory: Optional[str] = None
 ):
     setup_matplotlib(output_directory)
 
-    results = benchmark.run()
+    if results is None:
+        results = benchmark.run()
 
     print(f'PLOT   {benchmark.program.src}')
 
@@ -368,7 +435,10 @@ def plot_benchmark_summary(
 
     ax.invert_yaxis()
     yticks = [f'{compilation_strategy_label(r.run.compilation_strategy)}, '
-              f'{faust_strategy_label_short(r.run.faust_strategy)}' 
+              f'{faust_strategy_label_short(r.run.faust_strategy)}'
+              f'{equivalents_label(r)}'
+              f'{settings_label(benchmark, r)}'
+              f'{controls_label(benchmark, r)}'
               for r in results]
     ax.set_yticks(y + height * (nlines / 2 - 0.5), yticks)
     ax.margins(x=0.2)
@@ -389,17 +459,312 @@ def plot_benchmark_summary(
     plt.close()
 
 
-def plot_times( 
-        benchmarks: List[FaustBenchmark], 
-        output_file: Optional[str]):
+# Values of a quantity by strategy label, as x -> value
+Curves = Dict[str, Dict[float, float]]
+
+
+def strategy_label(benchmark: FaustBenchmark, result: FaustBenchmarkResult,
+                   exclude: Iterable[str] = ()) -> str:
+    """
+    Short label of the strategy of a result, with its compilation strategy
+    and settings_label, when the benchmark has several of them
+    """
+    label = faust_strategy_label_short(result.run.faust_strategy)
+    if len(benchmark.compilation_strategies) > 1:
+        label += f', {compilation_strategy_label(result.run.compilation_strategy)}'
+    return label + settings_label(benchmark, result, exclude) + controls_label(benchmark, result)
+
+
+def per_sample_unit(results: List[FaustBenchmarkResult]) -> tuple[Optional[PerfEvent], str]:
+    """Cycles when every result measured them, or else times"""
+    if all(PerfEvent.cycles() in r.events for r in results):
+        return PerfEvent.cycles(), 'cycles'
+    return None, 'ns'
+
+
+def per_sample(result: FaustBenchmarkResult, event: Optional[PerfEvent]) -> float:
+    measures = result.times if event is None else result.events[event]
+    return float(denoise(measures)) / result.run.buffer_size
+
+
+def plot_curves(ax: Axes, curves: Curves, ticks: List[int], ylabel: str,
+                **kwargs) -> Dict[str, Line2D]:
+    """Plots the curve of every strategy over a log2 axis, and returns their lines"""
+    lines = {}
+    for strategy, curve in curves.items():
+        xs = sorted(curve.keys())
+        lines[strategy], = ax.plot(xs, [curve[x] for x in xs], marker='o', label=strategy,
+                                   **kwargs)
+    ax.set_xscale('log', base=2)
+    ax.set_xticks(ticks, [str(x) for x in ticks])
+    ax.set_ylabel(ylabel)
+    return lines
+
+
+def curves_figure(count: int, height: float) -> tuple[Figure, np.ndarray]:
+    """A figure of count subplots above each other, sharing their x axis"""
+    return plt.subplots(count, 1, figsize=(8, height * count), sharex=True, squeeze=False)
+
+
+def save_curves_figure(fig: Figure, axes: np.ndarray, xlabel: str, title: str,
+                       output_directory: Optional[str], filename: str):
+    """Labels a figure of curves_figure, and saves it to the output directory or shows it"""
+    axes[-1, 0].set_xlabel(xlabel)
+
+    handles, labels = axes[0, 0].get_legend_handles_labels()
+    fig.legend(handles, labels, ncols=4, loc='lower center')
+    fig.suptitle(title)
+
+    plt.subplots_adjust(hspace=0.3)
+
+    if output_directory:
+        os.makedirs(output_directory, mode=0o755, exist_ok=True)
+        plt.savefig(os.path.join(output_directory, filename), bbox_inches="tight")
+    else:
+        plt.show()
+
+    plt.close()
+
+
+def curves_filename(benchmark: FaustBenchmark, name: str, kind: str) -> str:
+    return f'{name}_{benchmark.bench_type.value}_{benchmark.loops}_{kind}.png'
+
+
+def plot_sweep(
+        benchmark: FaustBenchmark,
+        results: Optional[List[FaustBenchmarkResult]] = None,
+        output_directory: Optional[str] = None
+):
+    """
+    Plots the cycles per sample of every strategy over the buffer sizes of
+    the benchmark, one subplot per sample rate, and prints the best strategy
+    for each buffer size. Times per sample are plotted when cycles were not
+    measured.
+    """
+    setup_matplotlib(output_directory)
 
-    relative_performance: Dict[FaustStrategy, List[np.floating]] = defaultdict(list)
-    for benchmark in benchmarks:
+    if results is None:
         results = benchmark.run()
+
+    print(f'PLOT   {benchmark.program.src}')
+
+    event, unit = per_sample_unit(results)
+
+    # Curves by sample rate, as buffer size -> value per sample
+    curves: Dict[int, Curves] = defaultdict(lambda: defaultdict(dict))
+    for result in results:
+        label = strategy_label(benchmark, result, exclude=('buffer_size', 'sample_rate'))
+        curves[result.run.sample_rate][label][result.run.buffer_size] = \
+            per_sample(result, event)
+
+    sample_rates = sorted(curves.keys())
+    buffer_sizes = sorted(set(r.run.buffer_size for r in results))
+
+    fig, axes = curves_figure(len(sample_rates), 4)
+    for ax, sample_rate in zip(axes[:, 0], sample_rates):
+        plot_curves(ax, curves[sample_rate], buffer_sizes, f'{unit} per sample')
+        ax.set_title(f'{sample_rate} Hz')
+
+        for buffer_size in buffer_sizes:
+            values = {s: c[buffer_size] for s, c in curves[sample_rate].items()
+                      if buffer_size in c}
+            best = min(values, key=lambda s: values[s])
+            print(f'BEST   {benchmark.program.src} [{sample_rate} Hz, {buffer_size} frames]: '
+                  f'{best} ({values[best]:.2f} {unit}/sample)')
+
+    save_curves_figure(fig, axes, 'buffer size (frames)', benchmark.program.name,
+                       output_directory, curves_filename(benchmark, benchmark.program.name,
+                                                         'sweep'))
+
+
+def plot_concurrency(
+        benchmark: FaustBenchmark,
+        results: Optional[List[FaustBenchmarkResult]] = None,
+        output_directory: Optional[str] = None
+):
+    """
+    Plots the aggregate throughput of every strategy over the number of
+    instances running at the same time, with the LLC misses and stalled
+    cycles per sample of its instances, and prints the throughput of each
+    instance.
+    """
+    setup_matplotlib(output_directory)
+
+    if results is None:
+        results = benchmark.run()
+
+    print(f'PLOT   {benchmark.program.src}')
+
+    events = [e for e in [PerfEvent.llc_load_misses(), PerfEvent.stalls_total()]
+              if all(e in r.events for r in results)]
+
+    # Curves by plotted quantity, as instances -> value
+    curves: Dict[str, Curves] = defaultdict(lambda: defaultdict(dict))
+    for result in results:
+        label = strategy_label(benchmark, result, exclude=('instances',))
+        instances = result.instances()
+        buffer_size = result.run.buffer_size
+        throughputs = [buffer_size * 1e9 / denoise(i.times) for i in instances]
+        aggregate = result.aggregate_throughput()
+
+        curves['aggregate throughput (Msamples/s)'][label][len(instances)] = aggregate / 1e6
+        line = f'CONC   {benchmark.program.src} [{label}, {len(instances)} instances]: ' \
+               f'aggregate {aggregate / 1e6:.2f} Msamples/s, per instance ' \
+               f'{min(throughputs) / 1e6:.2f}-{max(throughputs) / 1e6:.2f} Msamples/s'
+        for event in events:
+            value = float(np.mean([per_sample(i, event) for i in instances]))
+            curves[f'{event} per sample'][label][len(instances)] = value
+            line += f', {event} {value:.3f}/sample'
+        print(line)
+
+    instance_counts = sorted(set(r.run.instances for r in results))
+
+    fig, axes = curves_figure(len(curves), 3)
+    for ax, (quantity, quantity_curves) in zip(axes[:, 0], curves.items()):
+        plot_curves(ax, quantity_curves, instance_counts, quantity)
+
+    save_curves_figure(fig, axes, 'instances', benchmark.program.name, output_directory,
+                       curves_filename(benchmark, benchmark.program.name, 'concurrency'))
+
+
+def plot_voices(
+        benchmark: FaustBenchmark,
+        results: Optional[List[FaustBenchmarkResult]] = None,
+        output_directory: Optional[str] = None
+):
+    """
+    Plots the cycles per sample of every strategy over the number of active
+    voices of the program run as a polyphonic instrument, with the time spent
+    allocating voices, and prints the cost of each voice and the share of the
+    real-time budget of a buffer used. Times per sample are plotted when
+    cycles were not measured.
+    """
+    setup_matplotlib(output_directory)
+
+    if results is None:
+        results = benchmark.run()
+
+    print(f'PLOT   {benchmark.program.src}')
+
+    event, unit = per_sample_unit(results)
+
+    # Curves by plotted quantity, as active voices -> value
+    curves: Dict[str, Curves] = defaultdict(lambda: defaultdict(dict))
+    for result in results:
+        label = strategy_label(benchmark, result, exclude=('voices',))
+        value = per_sample(result, event)
+        active = result.active_voices()
+        allocation = result.allocation_time()
+        budget = result.run.buffer_size * 1e9 / result.run.sample_rate
+        load = (float(denoise(result.times)) + allocation) / budget
+
+        curves[f'{unit} per sample'][label][active] = value
+        curves['allocation (ns per loop)'][label][active] = allocation
+        print(f'VOICES {benchmark.program.src} [{label}, {result.run.voices} voices]: '
+              f'{active:.1f} active, {value:.2f} {unit}/sample, '
+              f'{value / max(active, 1):.2f} {unit}/sample per voice, '
+              f'allocation {allocation:.0f}ns/loop, {load * 100:.1f}% of real-time')
+
+    voice_counts = sorted(set(r.run.voices for r in results))
+
+    fig, axes = curves_figure(len(curves), 3)
+    for ax, (quantity, quantity_curves) in zip(axes[:, 0], curves.items()):
+        plot_curves(ax, quantity_curves, voice_counts, quantity)
+
+    save_curves_figure(fig, axes, 'active voices', benchmark.program.name, output_directory,
+                       curves_filename(benchmark, benchmark.program.name, 'voices'))
+
+
+def plot_scaling(
+        family: ProgramFamily,
+        measured: Dict[int, List[FaustBenchmarkResult]],
+        predicted_sizes: List[int] = [],
+        output_directory: Optional[str] = None
+):
+    """
+    Fits the cycles and LLC misses per sample of every strategy as functions
+    of the size of the programs of a family, plots them, and prints the
+    fitted curves, the sizes where a strategy overtakes another, the fastest
+    strategy over each range of sizes, and the strategy predicted fastest at
+    each of the predicted sizes. Times per sample are fitted when cycles were
+    not measured.
+    """
+    setup_matplotlib(output_directory)
+
+    print(f'PLOT   {family.name}')
+
+    results = [r for size_results in measured.values() for r in size_results]
+    benchmark = results[0].run.benchmark
+    event, unit = per_sample_unit(results)
+    quantities = {f'{unit} per sample': event}
+    if all(PerfEvent.llc_load_misses() in r.events for r in results):
+        quantities[f'{PerfEvent.llc_load_misses()} per sample'] = PerfEvent.llc_load_misses()
+
+    # Curves by quantity, as size -> value per sample
+    curves: Dict[str, Curves] = defaultdict(lambda: defaultdict(dict))
+    for size, size_results in measured.items():
+        for result in size_results:
+            for quantity, event in quantities.items():
+                curves[quantity][strategy_label(benchmark, result)][size] = \
+                    per_sample(result, event)
+
+    sizes = sorted(measured.keys())
+    low, high = min(sizes), max(sizes + predicted_sizes)
+    grid = size_grid(low, high)
+
+    fig, axes = curves_figure(len(curves), 4)
+    for ax, (quantity, quantity_curves) in zip(axes[:, 0], curves.items()):
+        quantity_curves = {s: c for s, c in quantity_curves.items() if len(c) >= SCALE_MIN_SIZES}
+        fits: Dict[str, CurveFit] = {}
+        for strategy, curve in quantity_curves.items():
+            fits[strategy] = fit_curve(sorted(curve.keys()),
+                                       [curve[n] for n in sorted(curve.keys())])
+            print(f'FIT    {family.name} [{strategy}, {quantity}]: {fits[strategy]}')
+
+        lines = plot_curves(ax, quantity_curves, sorted(set(sizes + predicted_sizes)), quantity,
+                            linestyle='none')
+        for strategy, line in lines.items():
+            ax.plot(grid, fits[strategy](grid), color=line.get_color())
+        for size in predicted_sizes:
+            ax.axvline(size, color='gray', linestyle=':')
+
+        if len(fits) < 2:
+            continue
+        for crossover in crossovers(fits, low, high):
+            print(f'CROSS  {family.name} [{quantity}]: {crossover.faster} overtakes '
+                  f'{crossover.slower} at N={crossover.size:.1f}')
+        for start, end, strategy in best_ranges(fits, low, high):
+            print(f'BEST   {family.name} [N={start:.0f}-{end:.0f}, {quantity}]: {strategy}')
+        for size in predicted_sizes:
+            values = {s: float(f(size)[0]) for s, f in fits.items()}
+            ranked = sorted(values, key=lambda s: values[s])
+            extrapolated = any(f.is_extrapolated(size) for f in fits.values())
+            print(f'PREDCT {family.name} [N={size}, {quantity}]: {ranked[0]} '
+                  f'({values[ranked[0]]:.2f}/sample'
+                  + (', extrapolated' if extrapolated else '') + ')'
+                  + f', then {ranked[1]} ({values[ranked[1]]:.2f}/sample)')
+
+    save_curves_figure(fig, axes, 'size N', family.name, output_directory,
+                       curves_filename(benchmark, os.path.basename(family.name), 'scaling'))
+
+
+def plot_times(
+        measured: Iterable[tuple[FaustBenchmark, List[FaustBenchmarkResult]]],
+        output_file: Optional[str]):
+
+    # Benchmarks may come in any order, e.g. as soon as they are measured
+    measured = sorted(measured,
+                      key=lambda m: m[0].program.src.lower())
+    benchmarks = [b for b, _ in measured]
+
+    relative_performance: Dict[str, List[np.floating]] = defaultdict(list)
+    for benchmark, results in measured:
         times = np.array([denoise(r.times) for r in results])
         # times /= np.average(times)
         for i, result in enumerate(results):
-            relative_performance[result.run.faust_strategy].append(times[i])
+            label = faust_strategy_label(result.run.faust_strategy) \
+                + settings_label(benchmark, result) + controls_label(benchmark, result)
+            relative_performance[label].append(times[i])
 
     print('PLOT')
 
@@ -417,9 +782,9 @@ def plot_times(
     offset = 0
     for strategy, times in relative_performance.items():
         ax.plot(x, np.asarray(times),
-                label=faust_strategy_label(strategy))
+                label=strategy)
         offset += width
-        print(f'Strategy {faust_strategy_label(strategy)} average performance: {np.mean(np.asarray(times))}')
+        print(f'Strategy {strategy} average performance: {np.mean(np.asarray(times))}')
 
     fig.legend()
 
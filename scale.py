@@ -0,0 +1,276 @@
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Dict, List, Optional, Sequence
+
+import math
+import os
+import re
+
+import numpy
+
+from build import FaustProgram
+
+
+# Sizes generated from a library when none are given
+SCALE_SIZES = [2, 4, 8, 16, 32, 64]
+
+# Sizes needed to fit a curve: a model is only fitted on more sizes than it
+# has parameters, so that it leaves residuals to compare, and 3 sizes tell the
+# constant model from the 2-parameter ones. The quadratic model, with 3
+# parameters, is only fitted on 4 sizes or more.
+SCALE_MIN_SIZES = 3
+
+# Points of the grid curves are compared on when looking for crossovers
+SCALE_GRID = 512
+
+FAMILY_PATTERN = re.compile(r'^(.*\D)(\d+)$')
+
+
+@dataclass
+class ProgramFamily:
+    """Programs computing the same thing for increasing sizes N, e.g.
+    mixer/mixer04.dsp to mixer/mixer64.dsp
+
+    Attributes:
+        name -- path of the programs without their size, e.g. mixer/mixer
+        programs -- programs by size
+    """
+    name: str
+    programs: Dict[int, FaustProgram]
+
+    def sizes(self) -> List[int]:
+        return sorted(self.programs.keys())
+
+
+def find_families(programs: List[FaustProgram]) \
+        -> tuple[List[ProgramFamily], List[FaustProgram]]:
+    """
+    Groups programs of the same directory whose names only differ by a
+    trailing number, the size of the program. Returns the families of at
+    least SCALE_MIN_SIZES programs, and the programs of no family.
+    """
+    groups: Dict[str, Dict[int, FaustProgram]] = defaultdict(dict)
+    others = []
+    for program in programs:
+        match = FAMILY_PATTERN.match(program.name)
+        if match is None:
+            others.append(program)
+            continue
+        name = os.path.join(program.directory, match.group(1))
+        groups[name][int(match.group(2))] = program
+
+    families = []
+    for name, members in sorted(groups.items()):
+        if len(members) < SCALE_MIN_SIZES:
+            others.extend(members.values())
+        else:
+            families.append(ProgramFamily(name, members))
+    return families, others
+
+
+def generate_family(library: str, function: Optional[str], sizes: List[int]) -> ProgramFamily:
+    """
+    Writes a program for each size in the build directory of a FAUST library:
+    the given function of the library, e.g. karplus(N), or else the process of
+    the library as a component, e.g. component("mixer.lib")(N). Programs find
+    the library and its neighbours through their library directory, and are
+    only written when their source changes, so that they are not built again.
+    """
+    directory, filename = os.path.split(library)
+    stem, _ = os.path.splitext(filename)
+    if function is None:
+        template = f'process = component("{filename}")({{n}});\n'
+    else:
+        template = f'import("{filename}");\n\nprocess = {function}({{n}});\n'
+
+    build_directory = os.path.join(directory, f'{stem}.fcsched')
+    os.makedirs(build_directory, mode=0o755, exist_ok=True)
+
+    programs = {}
+    for n in sizes:
+        path = os.path.join(build_directory, f'{stem}{n:03d}.dsp')
+        source = template.format(n=n)
+        current = None
+        if os.path.exists(path):
+            with open(path) as f:
+                current = f.read()
+        if current != source:
+            with open(path, 'w') as f:
+                f.write(source)
+        programs[n] = FaustProgram(path, library_directory=directory)
+    return ProgramFamily(os.path.join(build_directory, stem), programs)
+
+
+class Complexity(StrEnum):
+    CONSTANT = '1'
+    LINEAR = 'N'
+    N_LOG_N = 'N log N'
+    QUADRATIC = 'N^2'
+    POWER = 'N^k'
+
+    def parameters(self) -> int:
+        return {Complexity.CONSTANT: 1, Complexity.QUADRATIC: 3}.get(self, 2)
+
+    def basis(self, n: numpy.ndarray) -> numpy.ndarray:
+        """Columns of the linear least squares problem of the model"""
+        match self:
+            case Complexity.CONSTANT:
+                return numpy.ones((len(n), 1))
+            case Complexity.LINEAR:
+                return numpy.column_stack([numpy.ones(len(n)), n])
+            case Complexity.N_LOG_N:
+                return numpy.column_stack([numpy.ones(len(n)), n * numpy.log2(n)])
+            case Complexity.QUADRATIC:
+                return numpy.column_stack([numpy.ones(len(n)), n, n ** 2])
+            case Complexity.POWER:
+                return numpy.column_stack([numpy.ones(len(n)), numpy.log(n)])
+
+
+@dataclass(frozen=True)
+class CurveFit:
+    """A quantity of a program family as a function of its size N
+
+    Attributes:
+        complexity -- the model, chosen by the Akaike criterion
+        coefficients -- constant term first; for N^k, the factor and k
+        error -- root mean square of the relative residuals
+        sizes -- the measured sizes
+    """
+    complexity: Complexity
+    coefficients: tuple[float, ...]
+    error: float
+    sizes: tuple[int, ...]
+
+    def __call__(self, n: numpy.typing.ArrayLike) -> numpy.ndarray:
+        n = numpy.atleast_1d(numpy.asarray(n, dtype=float))
+        if self.complexity == Complexity.POWER:
+            factor, exponent = self.coefficients
+            return factor * n ** exponent
+        return self.complexity.basis(n) @ numpy.array(self.coefficients)
+
+    def is_extrapolated(self, n: float) -> bool:
+        return n < min(self.sizes) or n > max(self.sizes)
+
+    def __str__(self) -> str:
+        c = self.coefficients
+        match self.complexity:
+            case Complexity.CONSTANT:
+                formula = f'{c[0]:.4g}'
+            case Complexity.LINEAR:
+                formula = f'{c[0]:.4g} {c[1]:+.4g}*N'
+            case Complexity.N_LOG_N:
+                formula = f'{c[0]:.4g} {c[1]:+.4g}*N*log2(N)'
+            case Complexity.QUADRATIC:
+                formula = f'{c[0]:.4g} {c[1]:+.4g}*N {c[2]:+.4g}*N^2'
+            case Complexity.POWER:
+                formula = f'{c[0]:.4g}*N^{c[1]:.3f}'
+        return f'O({self.complexity}): {formula} (error {self.error:.1%})'
+
+
+def fit_curve(sizes: Sequence[int], values: Sequence[float]) -> CurveFit:
+    """
+    Fits every model with fewer parameters than there are sizes, minimizing
+    relative residuals so that small sizes weigh as much as large ones, and
+    keeps the model with the lowest corrected Akaike criterion, or the plain
+    criterion for models with one parameter less than there are sizes.
+    """
+    n = numpy.asarray(sizes, dtype=float)
+    y = numpy.asarray(values, dtype=float)
+    if len(n) < SCALE_MIN_SIZES:
+        raise ValueError(f'at least {SCALE_MIN_SIZES} sizes are needed to fit a curve')
+
+    best: Optional[tuple[float, CurveFit]] = None
+    for complexity in Complexity:
+        p = complexity.parameters()
+        if p >= len(n):
+            continue
+        if complexity == Complexity.POWER:
+            if numpy.any(y <= 0):
+                continue
+            solution, *_ = numpy.linalg.lstsq(complexity.basis(n), numpy.log(y), rcond=None)
+            coefficients = (math.exp(solution[0]), float(solution[1]))
+        else:
+            weights = 1 / numpy.maximum(numpy.abs(y), 1e-12)
+            solution, *_ = numpy.linalg.lstsq(complexity.basis(n) * weights[:, None],
+                                              y * weights, rcond=None)
+            coefficients = tuple(float(c) for c in solution)
+
+        fit = CurveFit(complexity, coefficients, 0, tuple(int(s) for s in sizes))
+        residuals = (fit(n) - y) / numpy.maximum(numpy.abs(y), 1e-12)
+        rss = max(float(numpy.sum(residuals ** 2)), 1e-12)
+        fit = CurveFit(complexity, coefficients, math.sqrt(rss / len(n)), fit.sizes)
+
+        criterion = len(n) * math.log(rss / len(n)) + 2 * p
+        if len(n) - p - 1 > 0:
+            criterion += 2 * p * (p + 1) / (len(n) - p - 1)
+        if best is None or criterion < best[0]:
+            best = (criterion, fit)
+
+    assert best is not None
+    return best[1]
+
+
+@dataclass(frozen=True)
+class Crossover:
+    """A size above which a strategy becomes faster than another
+
+    Attributes:
+        size -- the size N where the fitted curves cross
+        faster -- the strategy faster above the crossover
+        slower -- the strategy faster below the crossover
+    """
+    size: float
+    faster: str
+    slower: str
+
+
+def size_grid(low: float, high: float) -> numpy.ndarray:
+    return numpy.geomspace(low, high, SCALE_GRID)
+
+
+def crossovers(fits: Dict[str, CurveFit], low: float, high: float) -> List[Crossover]:
+    """
+    Sizes between low and high where the fitted curves of two strategies
+    cross, refined by bisection, in increasing order of size
+    """
+    grid = size_grid(low, high)
+    found = []
+    strategies = list(fits.keys())
+    for i, a in enumerate(strategies):
+        for b in strategies[i + 1:]:
+            def difference(n: float) -> float:
+                return float(fits[a](n)[0] - fits[b](n)[0])
+
+            signs = numpy.sign(fits[a](grid) - fits[b](grid))
+            for k in numpy.nonzero(signs[:-1] * signs[1:] < 0)[0]:
+                lo, hi = float(grid[k]), float(grid[k + 1])
+                for _ in range(50):
+                    mid = (lo + hi) / 2
+                    if numpy.sign(difference(mid)) == signs[k]:
+                        lo = mid
+                    else:
+                        hi = mid
+                # a was slower below the crossover if it had the larger value
+                faster, slower = (a, b) if signs[k] > 0 else (b, a)
+                found.append(Crossover((lo + hi) / 2, faster, slower))
+    return sorted(found, key=lambda c: c.size)
+
+
+def best_ranges(fits: Dict[str, CurveFit], low: float, high: float) \
+        -> List[tuple[float, float, str]]:
+    """Ranges of sizes between low and high, with the strategy fitted fastest on each"""
+    grid = size_grid(low, high)
+    strategies = list(fits.keys())
+    values = numpy.array([fits[s](grid) for s in strategies])
+    best = numpy.argmin(values, axis=0)
+
+    ranges = []
+    start = 0
+    for k in range(1, len(grid) + 1):
+        if k == len(grid) or best[k] != best[start]:
+            ranges.append((float(grid[start]), float(grid[min(k, len(grid) - 1)]),
+                           strategies[best[start]]))
+            start = k
+    return ranges
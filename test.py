@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from typing import List
+from typing import Iterable, List
 
 import numpy
 
@@ -70,9 +70,20 @@ def compare_outputs(test_result: FaustTestResult):
     print('\033[22m', end='')
 
 
-def run_tests(tests: List[FaustTest]):
-    runs = [FaustTestRun(t) for t in tests]
+def print_equivalent_strategies(test_result: FaustTestResult):
+    variants = test_result.test.variants
+    groups = [variants.equivalents(s) for s in test_result.test.faust_strategies
+              if variants.is_representative(s)]
+    groups = [g for g in groups if len(g) > 1]
+    if len(groups) > 0:
+        print(f'\033[2mIdentical generated code: '
+              f'{", ".join("=".join(s.scheduling for s in g) for g in groups)}\033[22m')
+
+
+def run_tests(tests: Iterable[FaustTest], *, isolated: bool = False):
+    runs = (FaustTestRun(t, isolated) for t in tests)
     for test_run in runs:
         print(f'TEST   {test_run.test.program.src}... ', end='', flush=True)
         test_result = test_run.run()
         compare_outputs(test_result)
+        print_equivalent_strategies(test_result)
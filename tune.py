@@ -0,0 +1,185 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import json
+import math
+import os
+import tempfile
+
+import numpy
+
+from build import (FaustProgram, FaustStrategy, CompilationStrategy, FaustBenchmark,
+                   FaustBenchmarkRun, FaustBenchmarkResult, ParameterSet, run_benchmarks)
+
+if TYPE_CHECKING:
+    from history import HistoryStore
+
+
+TUNE_DATABASE = 'fcsched-tune.json'
+TUNE_DATABASE_VERSION = 2
+
+# Each round keeps the fastest 1/TUNE_ETA of the strategies, and runs them for
+# TUNE_ETA times as many loops as the previous round
+TUNE_ETA = 2
+TUNE_QUANTILE = 0.2
+
+
+@dataclass
+class TuneResult:
+    """The outcome of a race between the strategies of a program
+
+    Attributes:
+        program -- the raced program
+        best -- the fastest run of the last round
+        runner_up -- the second fastest run of the last round, if any
+        time -- 20% quantile of the times of the best run, in nanoseconds
+        runner_up_time -- the same quantile for the runner-up
+        rounds -- number of rounds run
+    """
+    program: FaustProgram
+    best: FaustBenchmarkRun
+    runner_up: Optional[FaustBenchmarkRun]
+    time: float
+    runner_up_time: Optional[float]
+    rounds: int
+
+    def margin(self) -> Optional[float]:
+        """How much slower the runner-up is than the best strategy, relatively"""
+        if self.runner_up_time is None:
+            return None
+        return self.runner_up_time / self.time - 1
+
+    def to_json(self) -> dict:
+        def strategy(run: FaustBenchmarkRun) -> dict:
+            return {
+                'scheduling': run.faust_strategy.scheduling.value,
+                'faust_options': ' '.join(run.faust_strategy.options()),
+                'compiler': run.compilation_strategy.compiler.value,
+                'architecture': run.compilation_strategy.architecture.value,
+                'flags': ' '.join(run.compilation_strategy.flags()),
+                'pgo': run.compilation_strategy.options.pgo,
+            }
+
+        entry = {
+            'src': self.program.src,
+            **strategy(self.best),
+            'equivalents': [s.scheduling.value
+                            for s in self.best.benchmark.variants.equivalents(
+                                self.best.faust_strategy)
+                            if s != self.best.faust_strategy],
+            'time_ns': self.time,
+            'margin': self.margin(),
+            'runner_up': None,
+            'loops': self.best.loops,
+            'rounds': self.rounds,
+            'buffer_size': self.best.buffer_size,
+            'sample_rate': self.best.sample_rate,
+            'controls': self.best.controls(),
+            'tuned_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        if self.runner_up is not None:
+            entry['runner_up'] = {**strategy(self.runner_up), 'time_ns': self.runner_up_time}
+        return entry
+
+
+def race(benchmark: FaustBenchmark, parameters: ParameterSet = ParameterSet(), *,
+         min_loops: int = 100, history: Optional[HistoryStore] = None) -> TuneResult:
+    """
+    Successive halving over the strategies of a built benchmark: every round
+    measures the remaining strategies, and only the fastest ones run again for
+    more loops, until two are left for a final round. Strategies that generate
+    the same code only race once. Every run has the given controls, and the
+    results of every round are recorded in the history store, if any.
+    """
+    arms: List[tuple[FaustStrategy, CompilationStrategy]] = []
+    for f in benchmark.faust_strategies:
+        for c in benchmark.compilation_strategies:
+            arm = (benchmark.variants.representative(f), c)
+            if arm not in arms:
+                arms.append(arm)
+
+    loops = min_loops
+    rounds = 0
+    while True:
+        runs = [FaustBenchmarkRun(benchmark, f, c, loops, benchmark.events, benchmark.bench_type,
+                                  buffer_size=benchmark.buffer_sizes[0],
+                                  sample_rate=benchmark.sample_rates[0],
+                                  signal=benchmark.signal,
+                                  parameters=parameters)
+                for f, c in arms]
+        results = run_benchmarks(runs, override=benchmark.override)
+        if history is not None:
+            history.record(results)
+        rounds += 1
+
+        ranked = sorted(results, key=quantile)
+        controls = f', {runs[0].controls()}' if runs[0].controls() != '' else ''
+        print(f'RACE   {benchmark.program.src} [round {rounds}, {loops} loops{controls}]: '
+              + ', '.join(f'{r.run.faust_strategy.suffix()} {r.run.compilation_strategy.suffix()} '
+                          f'{quantile(r):.0f}ns' for r in ranked))
+
+        if len(ranked) <= 2:
+            runner_up = ranked[1] if len(ranked) == 2 else None
+            return TuneResult(benchmark.program, ranked[0].run,
+                              runner_up.run if runner_up else None,
+                              quantile(ranked[0]),
+                              quantile(runner_up) if runner_up else None,
+                              rounds)
+
+        keep = max(2, math.ceil(len(ranked) / TUNE_ETA))
+        arms = [(r.run.faust_strategy, r.run.compilation_strategy) for r in ranked[:keep]]
+        loops *= TUNE_ETA
+
+
+def quantile(result: FaustBenchmarkResult) -> float:
+    return float(numpy.quantile(result.times, TUNE_QUANTILE))
+
+
+class TuneDatabase:
+    """The best strategy of each tuned program, stored as JSON
+
+    Programs are keyed by the hash of their source, so that a build system can
+    look up the strategy of a program wherever it is checked out, and a
+    program is tuned again when it changes. Each program has an entry per set
+    of controls it was tuned with, see FaustBenchmarkRun.controls, the empty
+    string standing for its default controls. Databases of the first version,
+    with one entry per program, are read as entries for the default controls.
+    Databases of other versions are not read, nor overwritten.
+
+    Attributes:
+        path -- the JSON file
+        programs -- entries by source hash then controls, see TuneResult.to_json
+    """
+    path: str
+    programs: Dict[str, Dict[str, dict]]
+
+    def __init__(self, path: str = TUNE_DATABASE):
+        self.path = path
+        self.programs = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            version = data.get('version')
+            if version == 1:
+                self.programs = {source_hash: {'': {**entry, 'controls': ''}}
+                                 for source_hash, entry in data['programs'].items()}
+            elif version == TUNE_DATABASE_VERSION:
+                self.programs = data['programs']
+            else:
+                raise ValueError(f'{path}: unsupported tune database version {version}')
+
+    def lookup(self, program: FaustProgram, controls: str = '') -> Optional[dict]:
+        return self.programs.get(program.source_hash(), {}).get(controls)
+
+    def update(self, result: TuneResult):
+        entries = self.programs.setdefault(result.program.source_hash(), {})
+        entries[result.best.controls()] = result.to_json()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+            json.dump({'version': TUNE_DATABASE_VERSION, 'programs': self.programs}, f,
+                      indent=2, sort_keys=True)
+        os.replace(f.name, self.path)